@@ -1,26 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from datetime import datetime, timedelta
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 import logging
 
 from app.models.schemas import LoginRequest, Token
-from app.core.auth import authenticate_user, create_access_token
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.auth import authenticate_user_async, create_access_token, revoke_token_async, security
 from app.core.config import settings
+from app.core.rate_limit import rate_limit
 
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"]
 )
 
-limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger(__name__)
 
 @router.post("/login", response_model=Token)
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
+@rate_limit("login")
 async def login(request: Request, login_data: LoginRequest):
     """Autenticar usuario y obtener token"""
-    user = authenticate_user(login_data.username, login_data.password)
+    user = await authenticate_user_async(login_data.username, login_data.password)
     if not user:
         logger.warning(f"Intento de login fallido desde {request.client.host}")
         raise HTTPException(
@@ -36,3 +35,15 @@ async def login(request: Request, login_data: LoginRequest):
     
     logger.info(f"Login exitoso para usuario {user.username} desde {request.client.host}")
     return {"access_token": access_token, "token_type": "bearer"}
+
+# Sin límite: un cliente que agotó su presupuesto debe poder revocar su token
+@router.post("/logout")
+async def logout(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Revocar el token actual"""
+    if not await revoke_token_async(credentials.credentials):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return {"message": "Sesión cerrada"}
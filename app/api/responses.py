@@ -0,0 +1,267 @@
+import os
+import json
+import stat
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from secrets import token_hex
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from fastapi.responses import ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.metrics import SERVED_BYTES
+
+try:
+    import orjson
+except ImportError:  # Opcional: sin orjson se usa el json de la biblioteca estándar
+    orjson = None
+
+# Tipos que mimetypes no conoce en todas las plataformas
+mimetypes.add_type('audio/mp4', '.m4a')
+mimetypes.add_type('video/webm', '.webm')
+mimetypes.add_type('audio/webm', '.weba')
+mimetypes.add_type('video/x-matroska', '.mkv')
+mimetypes.add_type('audio/ogg', '.opus')
+
+
+def guess_media_type(filename: str) -> str:
+    """Tipo MIME según la extensión del archivo"""
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+# Respuesta JSON serializada con orjson si está instalado
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def ndjson_line(item) -> bytes:
+    """Una línea NDJSON (con orjson si está instalado)"""
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(item, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+class ArtifactResponse(Response):
+    """Respuesta de archivo con Range/206 (incluido multi-rango), ETag fuerte,
+    Last-Modified y peticiones condicionales (If-None-Match, If-Modified-Since,
+    If-Range).
+
+    El contenido se lee por bloques grandes fuera del event loop (uvicorn no
+    ofrece la extensión zerocopysend de ASGI, así que no hay sendfile).
+    """
+
+    chunk_size = 1024 * 1024
+
+    def __init__(self, path: str, filename: str, etag: str, media_type: Optional[str] = None,
+                 background: Optional[BackgroundTask] = None):
+        self.path = path
+        self.filename = filename
+        self.etag = f'"{etag}"'
+        self.status_code = 200
+        self.media_type = media_type or guess_media_type(filename)
+        self.background = background
+        self.init_headers(None)
+
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["etag"] = self.etag
+        quoted = quote(filename)
+        if quoted != filename:
+            self.headers["content-disposition"] = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            self.headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # La tarea de fondo se ejecuta también si el envío falla o se corta
+        try:
+            await self._respond(scope, send)
+        finally:
+            if self.background is not None:
+                await self.background()
+
+    async def _respond(self, scope: Scope, send: Send) -> None:
+        stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+        file_size = stat_result.st_size
+        self.last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        self.headers["last-modified"] = self.last_modified
+
+        request_headers = Headers(scope=scope)
+        header_only = scope["method"].upper() == "HEAD"
+
+        if self._not_modified(request_headers, stat_result.st_mtime):
+            await self._send_not_modified(send)
+            return
+
+        ranges = None
+        http_range = request_headers.get("range")
+        if http_range is not None and self._if_range_matches(request_headers.get("if-range")):
+            ranges = self._parse_range(http_range, file_size)
+            if ranges == []:
+                await self._send_unsatisfiable(send, file_size)
+                return
+
+        if not ranges:
+            self.headers["content-length"] = str(file_size)
+            await send({"type": "http.response.start", "status": 200, "headers": self.raw_headers})
+            await self._send_file(send, [(0, file_size)], header_only)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{file_size}"
+            self.headers["content-length"] = str(end - start)
+            await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+            await self._send_file(send, ranges, header_only)
+        else:
+            await self._send_multipart(send, ranges, file_size, header_only)
+
+    def _not_modified(self, request_headers: Headers, mtime: float) -> bool:
+        """Evaluar If-None-Match (prioritario) o If-Modified-Since"""
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            # Comparación débil: W/"x" coincide con "x"
+            return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def _if_range_matches(self, if_range: Optional[str]) -> bool:
+        """If-Range: el rango solo vale si el archivo no ha cambiado"""
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            # Comparación fuerte: las etiquetas débiles nunca coinciden
+            return if_range == self.etag
+        return if_range == self.last_modified
+
+    @staticmethod
+    def _parse_range(http_range: str, file_size: int) -> Optional[List[Tuple[int, int]]]:
+        """Interpretar "bytes=a-b, c-, -n" como intervalos [inicio, fin).
+
+        Devuelve None si la cabecera es inválida (se ignora y se sirve el
+        archivo completo) y [] si ningún rango es satisfacible.
+        """
+        units, _, spec = http_range.partition("=")
+        if units.strip().lower() != "bytes" or not spec:
+            return None
+
+        ranges = []
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            first, sep, last = part.partition("-")
+            if not sep:
+                return None
+            try:
+                if first == "":
+                    # Sufijo: los últimos N bytes
+                    length = int(last)
+                    if length == 0:
+                        continue
+                    start, end = max(file_size - length, 0), file_size
+                else:
+                    start = int(first)
+                    end = int(last) + 1 if last else file_size
+                    if end <= start and last:
+                        return None
+                    end = min(end, file_size)
+            except ValueError:
+                return None
+            if start < file_size:
+                ranges.append((start, end))
+
+        # Fusionar rangos solapados o contiguos
+        ranges.sort()
+        merged: List[Tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    async def _send_file(self, send: Send, ranges: List[Tuple[int, int]],
+                         header_only: bool) -> None:
+        if header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        start, end = ranges[0]
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(start)
+            remaining = end - start
+            while True:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining -= len(chunk)
+                more_body = bool(chunk) and remaining > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                SERVED_BYTES.inc(len(chunk), kind="file")
+                if not more_body:
+                    break
+
+    async def _send_multipart(self, send: Send, ranges: List[Tuple[int, int]],
+                              file_size: int, header_only: bool) -> None:
+        boundary = token_hex(13)
+        part_headers = [
+            (
+                f"--{boundary}\r\n"
+                f"Content-Type: {self.media_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{file_size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        content_length = (
+            sum(len(h) for h in part_headers)
+            + sum(end - start for start, end in ranges)
+            + 2 * (len(ranges) - 1)  # CRLF entre partes
+            + len(closing)
+        )
+
+        self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+        self.headers["content-length"] = str(content_length)
+        await send({"type": "http.response.start", "status": 206, "headers": self.raw_headers})
+        if header_only:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for n, ((start, end), header) in enumerate(zip(ranges, part_headers)):
+                prefix = b"\r\n" + header if n else header
+                await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                await file.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    SERVED_BYTES.inc(len(chunk), kind="file")
+        await send({"type": "http.response.body", "body": closing, "more_body": False})
+
+    async def _send_not_modified(self, send: Send) -> None:
+        headers = [
+            (b"etag", self.etag.encode("latin-1")),
+            (b"last-modified", self.last_modified.encode("latin-1")),
+        ]
+        await send({"type": "http.response.start", "status": 304, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_unsatisfiable(self, send: Send, file_size: int) -> None:
+        headers = [(b"content-range", f"bytes */{file_size}".encode("latin-1")),
+                   (b"content-length", b"0")]
+        await send({"type": "http.response.start", "status": 416, "headers": headers})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,27 +1,70 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import JSONResponse, Response
 from datetime import datetime
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import asyncio
 import os
 import logging
 
-from app.models.schemas import HealthResponse
+from app.models.schemas import HealthResponse, ReadinessResponse
 from app.services.downloader import downloader
-from app.core.auth import get_current_user
+from app.services.jobs import job_manager
+from app.services.bandwidth import bandwidth_scheduler
+from app.services.transcode import transcoder
+from app.services.storage import storage_manager
+from app.services.tiering import tiered_storage
+from app.services.popularity import prefetcher
+from app.services.warmup import warmup
+from app.core.auth import get_current_user, token_cache, auth_executor
+from app.core.metrics import Gauge, shared_metrics, CONTENT_TYPE
 from app.core.config import settings
+from app.core.rate_limit import rate_limit
 
 router = APIRouter(tags=["system"])
 
-limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger(__name__)
 
+def _jobs_by_status():
+    """Trabajos de este proceso por estado"""
+    counts = {}
+    for job in list(job_manager.jobs.values()):
+        key = (job['status'],)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+# Valores instantáneos: se calculan al exponer /metrics
+Gauge("ytdl_downloads_in_flight", "Descargas en curso",
+      lambda: len(downloader.in_flight_keys()))
+Gauge("ytdl_jobs", "Trabajos conocidos por este proceso según su estado",
+      _jobs_by_status, labelnames=("status",))
+Gauge("ytdl_job_queue_depth", "Trabajos esperando en la cola",
+      lambda: job_manager.queue_depth)
+Gauge("ytdl_transcode_queue_depth", "Conversiones esperando en la cola",
+      lambda: transcoder.queue_depth)
+Gauge("ytdl_executor_queue_depth", "Tareas esperando hilo en cada pool",
+      lambda: {
+          **{(pool,): depth for pool, depth in downloader.executor_queue_depths().items()},
+          ("auth",): auth_executor._work_queue.qsize(),
+      },
+      labelnames=("pool",))
+Gauge("ytdl_storage_usage_bytes", "Bytes ocupados por el directorio de descargas",
+      lambda: storage_manager.stats()['usage_bytes'])
+Gauge("ytdl_storage_free_bytes", "Bytes libres en el disco de descargas",
+      lambda: storage_manager.stats()['free_bytes'])
+Gauge("ytdl_cache_hit_ratio", "Proporción de aciertos de cada caché",
+      lambda: {
+          ("info",): downloader.info_cache.stats()['hit_ratio'],
+          ("token",): token_cache.stats()['hit_ratio'],
+      },
+      labelnames=("cache",))
+
 @router.get("/", include_in_schema=False)
 async def root():
     """Endpoint raíz"""
     return {"message": "YouTube Downloader API", "version": "1.0.0"}
 
+# Sondas y scrapes sin límite: no se les responde 429 ni gastan el
+# presupuesto de la IP desde la que llegan
 @router.get("/health", response_model=HealthResponse)
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
 async def health_check(request: Request):
     """Verificar estado del servidor"""
     return HealthResponse(
@@ -30,14 +73,56 @@ async def health_check(request: Request):
         download_dir_exists=os.path.exists(settings.download_dir)
     )
 
+@router.get("/ready", response_model=ReadinessResponse)
+async def readiness_check(request: Request):
+    """Verificar si el servidor terminó de calentarse (503 mientras tanto)"""
+    readiness = ReadinessResponse(**warmup.status())
+    if not warmup.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content=readiness.model_dump()
+        )
+    return readiness
+
+@router.get("/stats")
+@rate_limit("default")
+async def get_stats(request: Request, current_user: str = Depends(get_current_user)):
+    """Contadores internos (cachés, descargas, conversiones, almacenamiento, almacén de objetos, prefetch y ancho de banda)"""
+    return {
+        "info_cache": downloader.info_cache.stats(),
+        "downloads": downloader.download_stats(),
+        "storage": storage_manager.stats(),
+        "object_store": tiered_storage.stats(),
+        "prefetch": prefetcher.stats(),
+        "bandwidth": bandwidth_scheduler.stats(),
+        "transcode": transcoder.stats(),
+        "token_cache": token_cache.stats()
+    }
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Métricas en formato de texto de Prometheus (contadores e histogramas
+    sumados entre workers)"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    content = await asyncio.get_running_loop().run_in_executor(None, shared_metrics.render)
+    return Response(content=content, media_type=CONTENT_TYPE)
+
 @router.delete("/cleanup")
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
+@rate_limit("default")
 async def cleanup_files(request: Request, current_user: str = Depends(get_current_user)):
     """Limpiar archivos antiguos (solo para administradores)"""
     try:
-        downloader.cleanup_old_files()
+        # Recorrer el directorio fuera del event loop
+        removed = await asyncio.get_running_loop().run_in_executor(
+            None,
+            downloader.cleanup_old_files,
+            24,
+            storage_manager.protected(),
+            downloader.in_flight_keys()
+        )
         logger.info(f"Usuario {current_user} ejecutó limpieza de archivos")
-        return {"message": "Limpieza completada"}
+        return {"message": "Limpieza completada", "removed": removed}
     except Exception as e:
         logger.error(f"Error en limpieza: {str(e)}")
         raise HTTPException(
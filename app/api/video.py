@@ -1,43 +1,139 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.responses import FileResponse
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from pathlib import Path
+from fastapi.responses import StreamingResponse, RedirectResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+import json
+import asyncio
 import logging
 
-from app.models.schemas import DownloadRequest, VideoInfo, DownloadResponse
-from app.services.downloader import downloader
+from app.api.responses import ArtifactResponse, FastJSONResponse, guess_media_type, ndjson_line
+from app.models.schemas import DownloadRequest, InfoRequest, BatchRequest, VideoInfo, DownloadResponse, JobResponse, FormatPlan
+from app.services.downloader import downloader, ExtractionTimeoutError, INFO_FIELDS
+from app.services.streaming import DownloadStream
+from app.services.batch import fan_out
+from app.services.storage import storage_manager
+from app.services.tiering import tiered_storage
+from app.services.popularity import popularity_tracker
+from app.services.jobs import job_manager, JobQueueFullError, JOB_FAILED
+from app.services.transcode import (
+    AUDIO_FORMATS, MIN_AUDIO_BITRATE, MAX_AUDIO_BITRATE, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+)
+from app.services.formats import ffmpeg_available
 from app.core.auth import get_current_user
 from app.core.config import settings
+from app.core.rate_limit import rate_limit, charge, units_per_window
 
 router = APIRouter(
     prefix="/video",
     tags=["video"]
 )
 
-limiter = Limiter(key_func=get_remote_address)
 logger = logging.getLogger(__name__)
 
+VALID_QUALITIES = ['worst', 'best', '720p', '480p', '360p', 'audio']
+
+def _validate_audio_options(quality: str, audio_format: Optional[str], audio_bitrate: Optional[int]):
+    """Validar la conversión de audio pedida"""
+    if audio_format is None:
+        if audio_bitrate is not None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="audio_bitrate requiere audio_format"
+            )
+        return
+    if quality != 'audio':
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="audio_format solo se admite con quality=audio"
+        )
+    if audio_format not in AUDIO_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato de audio no válido. Opciones: {', '.join(AUDIO_FORMATS)}"
+        )
+    if audio_bitrate is not None and not MIN_AUDIO_BITRATE <= audio_bitrate <= MAX_AUDIO_BITRATE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"audio_bitrate debe estar entre {MIN_AUDIO_BITRATE} y {MAX_AUDIO_BITRATE} kbps"
+        )
+    if not ffmpeg_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Conversión de audio no disponible (falta ffmpeg)"
+        )
+
+def _validate_download_request(download_request: DownloadRequest):
+    """Validar calidad y URL antes de encolar la descarga"""
+    if download_request.quality not in VALID_QUALITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Calidad no válida. Opciones: {', '.join(VALID_QUALITIES)}"
+        )
+    _validate_audio_options(
+        download_request.quality, download_request.audio_format, download_request.audio_bitrate
+    )
+    if not downloader.validate_youtube_url(download_request.url):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="URL de YouTube no válida"
+        )
+
+def _submit_job(download_request: DownloadRequest, current_user: str,
+                priority: int = PRIORITY_BACKGROUND) -> dict:
+    """Encolar un trabajo de descarga"""
+    popularity_tracker.record(download_request.url, download_request.quality)
+    try:
+        return job_manager.submit(
+            download_request.url,
+            download_request.quality,
+            current_user,
+            audio_format=download_request.audio_format,
+            audio_bitrate=download_request.audio_bitrate,
+            priority=priority
+        )
+    except JobQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cola de descargas llena, inténtalo más tarde"
+        )
+
 @router.post("/info", response_model=VideoInfo)
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
+@rate_limit("info")
 async def get_video_info(
     request: Request,
-    video_request: DownloadRequest,
+    video_request: InfoRequest,
     current_user: str = Depends(get_current_user)
 ):
-    """Obtener información del video sin descargarlo"""
+    """Obtener información del video sin descargarlo (solo los campos pedidos)"""
     try:
         logger.info(f"Usuario {current_user} solicitando info de: {video_request.url}")
         
-        info = downloader.get_video_info(video_request.url)
+        if not downloader.validate_youtube_url(video_request.url):
+            raise ValueError("URL de YouTube no válida")
+        unknown = [field for field in video_request.fields or [] if field not in INFO_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"Campos no válidos: {', '.join(unknown)}. Disponibles: {', '.join(INFO_FIELDS)}"
+            )
+        popularity_tracker.record(video_request.url)
+        
+        # Sin duplicados y en el orden pedido
+        fields = list(dict.fromkeys(video_request.fields)) if video_request.fields else None
+        info = await downloader.get_video_info_async(video_request.url, fields)
         if not info:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No se pudo obtener información del video"
             )
         
-        return VideoInfo(**info)
-        
+    except HTTPException:
+        raise
+    except ExtractionTimeoutError as e:
+        logger.error(f"Timeout obteniendo info del video: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Tiempo de espera agotado obteniendo información del video"
+        )
     except ValueError as e:
         logger.error(f"Error de validación: {str(e)}")
         raise HTTPException(
@@ -50,74 +146,301 @@ async def get_video_info(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
         )
+    
+    # Se valida contra VideoInfo (como haría response_model) y se serializa
+    # con FastJSONResponse solo con los campos pedidos; fuera del try, un
+    # error aquí es del servidor y no de la petición
+    validated = VideoInfo.model_validate(info)
+    return FastJSONResponse(content=validated.model_dump(exclude_unset=True))
 
-@router.post("/download", response_model=DownloadResponse)
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
-async def download_video(
+@router.post("/plan", response_model=FormatPlan)
+@rate_limit("info")
+async def plan_download(
     request: Request,
     download_request: DownloadRequest,
     current_user: str = Depends(get_current_user)
 ):
-    """Descargar video de YouTube"""
+    """Formatos que se descargarían, tamaño y postproceso esperados"""
+    _validate_download_request(download_request)
     try:
-        logger.info(f"Usuario {current_user} descargando: {download_request.url}")
-        
-        # Validar calidad
-        valid_qualities = ['worst', 'best', '720p', '480p', '360p', 'audio']
-        if download_request.quality not in valid_qualities:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Calidad no válida. Opciones: {', '.join(valid_qualities)}"
+        plan = await downloader.plan_download(download_request.url, download_request.quality)
+    except ExtractionTimeoutError as e:
+        logger.error(f"Timeout obteniendo info del video: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Tiempo de espera agotado obteniendo información del video"
+        )
+    except Exception as e:
+        logger.error(f"Error planificando descarga: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No se pudo obtener información del video"
+        )
+    return FormatPlan(**plan)
+
+def _split_batch(batch_request: BatchRequest):
+    """Separar URLs inválidas y quitar duplicados por id de video"""
+    if len(batch_request.urls) > settings.batch_max_urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.batch_max_urls} URLs por lote"
+        )
+    errors, unique = [], {}
+    for url in batch_request.urls:
+        video_id = downloader.extract_video_id(url)
+        if video_id is None:
+            errors.append({'url': url, 'ok': False, 'error': "URL de YouTube no válida"})
+        elif video_id not in unique:
+            unique[video_id] = url
+    return errors, list(unique.items())
+
+def _check_batch_budget(items: list, item_kind: str, base_kind: str):
+    """Rechazar lotes que no caben en el presupuesto de una ventana (serían
+    un 429 seguro) antes de cobrar nada"""
+    max_items = units_per_window(item_kind, base_kind)
+    if max_items is not None and len(items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {max_items} videos por lote con el límite de peticiones actual"
+        )
+
+def _ndjson_response(errors: list, results) -> StreamingResponse:
+    """Enviar errores de validación y resultados, un objeto JSON por línea"""
+    async def lines():
+        for item in errors:
+            yield ndjson_line(item)
+        async for item in results:
+            yield ndjson_line(item)
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/info/batch")
+@rate_limit("info")
+async def get_video_info_batch(
+    request: Request,
+    batch_request: BatchRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Obtener información de varios videos (NDJSON en orden de llegada)"""
+    errors, items = _split_batch(batch_request)
+    _check_batch_budget(items, "batch_info_item", "info")
+    charge(request, "batch_info_item", len(items))
+    logger.info(f"Usuario {current_user} solicitando info de {len(items)} videos")
+    
+    async def info_item(item):
+        video_id, url = item
+        try:
+            info = await downloader.get_video_info_async(url)
+        except ExtractionTimeoutError:
+            return {'video_id': video_id, 'url': url, 'ok': False,
+                    'error': "Tiempo de espera agotado"}
+        if not info:
+            return {'video_id': video_id, 'url': url, 'ok': False,
+                    'error': "No se pudo obtener información del video"}
+        return {'video_id': video_id, 'url': url, 'ok': True, 'info': info}
+    
+    return _ndjson_response(errors, fan_out(items, info_item, settings.batch_concurrency))
+
+@router.post("/download/batch")
+@rate_limit("default")
+async def download_video_batch(
+    request: Request,
+    batch_request: BatchRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Descargar varios videos (NDJSON en orden de finalización)"""
+    if batch_request.quality not in VALID_QUALITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Calidad no válida. Opciones: {', '.join(VALID_QUALITIES)}"
+        )
+    _validate_audio_options(batch_request.quality, batch_request.audio_format, batch_request.audio_bitrate)
+    errors, items = _split_batch(batch_request)
+    # El decorador cobra solo el peso base; cada video válido y distinto se
+    # cobra aparte (nada si no hay ninguno)
+    _check_batch_budget(items, "batch_download_item", "default")
+    charge(request, "batch_download_item", len(items))
+    logger.info(f"Usuario {current_user} descargando {len(items)} videos")
+    
+    async def download_item(item):
+        video_id, url = item
+        try:
+            job = job_manager.submit(
+                url, batch_request.quality, current_user,
+                audio_format=batch_request.audio_format,
+                audio_bitrate=batch_request.audio_bitrate
             )
-        
-        result = await downloader.download_video(
-            download_request.url,
-            download_request.quality
+        except JobQueueFullError:
+            return {'video_id': video_id, 'url': url, 'ok': False,
+                    'error': "Cola de descargas llena"}
+        job = await job_manager.wait(job['job_id'])
+        if job['status'] == JOB_FAILED:
+            return {'video_id': video_id, 'url': url, 'ok': False,
+                    'job_id': job['job_id'], 'error': job['error']}
+        return {'video_id': video_id, 'url': url, 'ok': True,
+                'job_id': job['job_id'], 'result': job['result']}
+    
+    return _ndjson_response(errors, fan_out(items, download_item, settings.batch_concurrency))
+
+@router.post("/download", response_model=DownloadResponse)
+@rate_limit("download")
+async def download_video(
+    request: Request,
+    download_request: DownloadRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Descargar video de YouTube (espera a que termine el trabajo)"""
+    _validate_download_request(download_request)
+    logger.info(f"Usuario {current_user} descargando: {download_request.url}")
+    # El cliente espera la respuesta: su conversión pasa delante de los trabajos
+    job = _submit_job(download_request, current_user, priority=PRIORITY_INTERACTIVE)
+
+    job = await job_manager.wait(job['job_id'])
+    if job['status'] == JOB_FAILED:
+        logger.error(f"Error en descarga: {job['error']}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error interno del servidor"
         )
-        
-        logger.info(f"Descarga exitosa: {result['title']}")
-        return DownloadResponse(**result)
-        
-    except ValueError as e:
-        logger.error(f"Error de validación: {str(e)}")
+
+    result = job['result']
+    logger.info(f"Descarga exitosa: {result['title']}")
+    return DownloadResponse(**result)
+
+@router.post("/stream")
+@rate_limit("stream")
+async def stream_video(
+    request: Request,
+    download_request: DownloadRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Descargar y enviar el video a la vez, sin esperar a que termine"""
+    _validate_download_request(download_request)
+    if download_request.audio_format is not None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=str(e)
+            detail="La conversión de audio no está disponible en streaming"
+        )
+    logger.info(f"Usuario {current_user} descargando en streaming: {download_request.url}")
+    
+    stream = DownloadStream(download_request.url, download_request.quality)
+    try:
+        filename = await stream.start()
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="La descarga no empezó a tiempo"
         )
     except Exception as e:
-        logger.error(f"Error en descarga: {str(e)}")
+        logger.error(f"Error en descarga en streaming: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error interno del servidor"
         )
+    
+    return StreamingResponse(
+        stream.iter_bytes(),
+        media_type=guess_media_type(filename),
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/jobs", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+@rate_limit("download")
+async def create_download_job(
+    request: Request,
+    download_request: DownloadRequest,
+    current_user: str = Depends(get_current_user)
+):
+    """Encolar una descarga y devolver el id del trabajo inmediatamente"""
+    _validate_download_request(download_request)
+    job = _submit_job(download_request, current_user)
+    logger.info(f"Usuario {current_user} encoló trabajo {job['job_id']}: {download_request.url}")
+    return JobResponse(**job)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+@rate_limit("default")
+async def get_download_job(
+    request: Request,
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    """Consultar estado, archivo resultante o error de un trabajo"""
+    job = job_manager.get(job_id)
+    if job is None or job['user'] != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return JobResponse(**job)
 
-@router.get("/download/{filename}")
-@limiter.limit(f"{settings.rate_limit_requests}/minute")
+@router.api_route("/download/{filename}", methods=["GET", "HEAD"])
+@rate_limit("file")
 async def get_downloaded_file(
     request: Request,
     filename: str,
     current_user: str = Depends(get_current_user)
 ):
-    """Descargar archivo ya procesado"""
+    """Descargar archivo ya procesado (los que están en el almacén de
+    objetos se sirven con una redirección a una URL firmada)"""
     try:
-        file_path = Path(settings.download_dir) / filename
-        
-        if not file_path.exists():
+        artifact = downloader.get_artifact(filename)
+        if artifact is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Archivo no encontrado"
             )
         
         logger.info(f"Usuario {current_user} descargando archivo: {filename}")
-        return FileResponse(
-            path=file_path,
+        if not artifact['local']:
+            url = await tiered_storage.presigned_url(artifact)
+            return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+        # Fijar el archivo para que no se desaloje mientras se envía
+        storage_manager.pin(filename)
+        return ArtifactResponse(
+            path=artifact['filepath'],
             filename=filename,
-            media_type='application/octet-stream'
+            etag=artifact['checksum'],
+            background=BackgroundTask(storage_manager.unpin, filename)
         )
         
+    except HTTPException:
+        raise
+    except FileNotFoundError:
+        # Solo está en el almacén de objetos y el almacén no está disponible
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Archivo no encontrado"
+        )
     except Exception as e:
         logger.error(f"Error sirviendo archivo: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error sirviendo archivo"
         )
+
+@router.get("/jobs/{job_id}/events")
+@rate_limit("default")
+async def get_download_job_events(
+    request: Request,
+    job_id: str,
+    current_user: str = Depends(get_current_user)
+):
+    """Progreso de un trabajo en tiempo real (Server-Sent Events)"""
+    job = job_manager.get(job_id)
+    if job is None or job['user'] != current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    
+    async def events():
+        async for state in job_manager.subscribe(job_id):
+            if state is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,18 +1,142 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Optional, Dict, Any, Tuple
 from pydantic import BaseModel
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
+from app.core.users import get_pwd_context, user_store
+from app.core.state import state_store
 
-# Configuración de hash de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Pool acotado para bcrypt: el login no bloquea el event loop y una ráfaga
+# de logins no ocupa más de auth_workers núcleos
+auth_executor = ThreadPoolExecutor(
+    max_workers=settings.auth_workers,
+    thread_name_prefix="auth"
+)
 
 # Security
 security = HTTPBearer()
 
+class TokenCache:
+    """Caché LRU de tokens ya verificados (token -> usuario).
+
+    Cada entrada caduca en el exp del propio token, así que un acierto evita
+    volver a verificar la firma sin alargar la validez. Los tokens revocados
+    se guardan por jti hasta su exp; con un store compartido una tarea en
+    segundo plano trae cada sync_interval segundos, fuera del event loop,
+    las revocaciones de los demás workers (las peticiones no leen SQLite).
+    """
+
+    sync_interval = 1.0
+
+    def __init__(self, max_entries: int, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[str, float, Optional[str]]]" = OrderedDict()
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def start(self):
+        if self.store is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self._sync)
+            except Exception as e:
+                logger.error(f"Error sincronizando tokens revocados: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+    def _sync(self):
+        """Traer las revocaciones hechas en otros workers"""
+        revoked = self.store.revoked_tokens()
+        with self._lock:
+            # Se conservan las de este proceso hechas mientras se leía
+            now = time.time()
+            self._revoked = {
+                **{jti: exp for jti, exp in self._revoked.items() if exp > now},
+                **revoked,
+            }
+            for token in [t for t, entry in self._entries.items() if entry[2] in revoked]:
+                del self._entries[token]
+
+    def get(self, token: str) -> Optional[str]:
+        """Usuario de un token verificado y vigente, o None"""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            username, expires_at, _ = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return username
+
+    def set(self, token: str, username: str, expires_at: float, jti: Optional[str]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (username, expires_at, jti)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def revoke(self, jti: str, expires_at: float):
+        """Revocar un token por su jti hasta que caduque"""
+        if self.store is not None:
+            self.store.revoke_token(jti, expires_at)
+        with self._lock:
+            now = time.time()
+            self._revoked = {k: exp for k, exp in self._revoked.items() if exp > now}
+            self._revoked[jti] = expires_at
+            for token in [t for t, entry in self._entries.items() if entry[2] == jti]:
+                del self._entries[token]
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso del caché"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'revoked': len(self._revoked),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+token_cache = TokenCache(settings.token_cache_size, store=state_store)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -28,42 +152,70 @@ class UserInDB(User):
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar contraseña"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Obtener hash de contraseña"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def authenticate_user(username: str, password: str) -> Optional[User]:
     """Autenticar usuario"""
-    # En producción, esto debería consultar una base de datos
-    if username == settings.api_username:
-        hashed_password = get_password_hash(settings.api_password)
-        if verify_password(password, hashed_password):
-            return User(username=username)
+    if user_store.verify(username, password):
+        return User(username=username)
     return None
 
+async def authenticate_user_async(username: str, password: str) -> Optional[User]:
+    """Autenticar usuario fuera del event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, authenticate_user, username, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crear token de acceso JWT"""
+    # jose se importa al primer uso (acelera el arranque)
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-def verify_token(token: str) -> Optional[str]:
-    """Verificar token JWT"""
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """Verificar firma y expiración de un token JWT y devolver su payload"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
     except JWTError:
         return None
+    if payload.get("sub") is None or token_cache.is_revoked(payload.get("jti")):
+        return None
+    return payload
+
+def verify_token(token: str) -> Optional[str]:
+    """Verificar token JWT (con caché de tokens ya verificados)"""
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    token_cache.set(token, payload["sub"], float(payload["exp"]), payload.get("jti"))
+    return payload["sub"]
+
+def revoke_token(token: str) -> bool:
+    """Revocar un token hasta su expiración"""
+    payload = decode_token(token)
+    if payload is None or payload.get("jti") is None:
+        return False
+    token_cache.revoke(payload["jti"], float(payload["exp"]))
+    return True
+
+async def revoke_token_async(token: str) -> bool:
+    """Revocar un token fuera del event loop (escribe en el estado compartido)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, revoke_token, token)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verificar token JWT"""
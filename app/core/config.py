@@ -7,22 +7,128 @@ class Settings(BaseSettings):
     secret_key: str = "tu_clave_secreta_muy_segura_aqui_cambiar_en_produccion"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Tokens verificados que se mantienen en caché
+    token_cache_size: int = 4096
     
     # Credenciales de la API
     api_username: str = "admin"
     api_password: str = "password123"
+    # Hash bcrypt de la contraseña (si se define, API_PASSWORD se ignora)
+    api_password_hash: str = ""
+    # Archivo JSON con usuarios adicionales {"usuario": "hash bcrypt"}
+    users_file: str = "./data/users.json"
+    # Hilos dedicados a verificar contraseñas
+    auth_workers: int = 2
     
     # Servidor
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = False
+    # Procesos worker (más de 1 requiere RATE_LIMIT_STORAGE_URI=sqlite:///...)
+    workers: int = 1
     
     # Directorios
     download_dir: str = "./data/downloads"
+    index_db_path: str = "./data/downloads.db"
+    # Estado compartido entre workers (trabajos, caché, tokens revocados)
+    state_db_path: str = "./data/state.db"
     
-    # Rate limiting
-    rate_limit_requests: int = 10
+    # Cola de descargas
+    download_workers: int = 2
+    job_queue_size: int = 100
+    job_retention_seconds: int = 3600
+    # Veces que se retoma un trabajo interrumpido por un reinicio antes de
+    # darlo por fallido (evita bucles si el trabajo tumba el proceso)
+    job_max_attempts: int = 3
+    # Intervalo mínimo (segundos) entre eventos de progreso de un trabajo
+    progress_interval: float = 0.5
+    
+    # Extracción de información (pool propio y tiempo máximo por consulta)
+    extract_workers: int = 4
+    extract_timeout: int = 30
+    # Motor de extracción: "thread" (hilos) o "process" (pool de procesos
+    # con yt-dlp precargado, reciclados tras N extracciones)
+    extract_engine: str = "thread"
+    extract_max_tasks_per_child: int = 200
+    
+    # Peticiones por lotes (URLs máximas por lote y concurrencia por lote)
+    batch_max_urls: int = 500
+    batch_concurrency: int = 8
+    
+    # Segundos máximos hasta el primer byte en /video/stream
+    stream_start_timeout: int = 60
+    
+    # Caché de información de videos
+    info_cache_size: int = 512
+    info_cache_ttl: int = 1800
+    
+    # Presupuesto del directorio de descargas (0 = sin límite de tamaño);
+    # se desalojan los archivos menos usados recientemente
+    storage_max_bytes: int = 10 * 1024 ** 3
+    storage_min_free_bytes: int = 1024 ** 3
+    storage_check_interval: int = 30
+    storage_scan_batch: int = 500
+    # Segundos sin modificarse tras los que un archivo parcial (.part,
+    # fragmentos) se considera huérfano y se borra
+    partial_file_ttl: int = 6 * 3600
+    # Segundos tras su último cambio (o renombrado) durante los que un archivo
+    # sin indexar no se desaloja: puede estar aún calculando su checksum
+    storage_untracked_grace: int = 600
+    
+    # Prefetch por popularidad (count-min sketch con vida media en segundos):
+    # sin tráfico de usuarios, renueva la información de los top_k videos
+    # antes de que caduque y los descarga en las prefetch_qualities calidades
+    # más pedidas (0 = solo información)
+    prefetch_enabled: bool = False
+    prefetch_interval: int = 15
+    prefetch_top_k: int = 10
+    prefetch_min_score: float = 3.0
+    prefetch_half_life: int = 3600
+    prefetch_qualities: int = 1
+    prefetch_refresh_margin: int = 300
+    
+    # Almacén de objetos compatible con S3 (boto3, opcional) para archivos
+    # fríos: se suben tras object_store_cold_after segundos sin usarse, se
+    # borran del disco y se sirven con una redirección a una URL firmada
+    object_store_enabled: bool = False
+    object_store_endpoint_url: str = ""
+    object_store_region: str = "us-east-1"
+    object_store_bucket: str = "yt-downloader"
+    object_store_prefix: str = "downloads/"
+    object_store_access_key: str = ""
+    object_store_secret_key: str = ""
+    object_store_cold_after: int = 3600
+    object_store_check_interval: int = 60
+    object_store_part_size: int = 16 * 1024 * 1024
+    object_store_concurrency: int = 4
+    object_store_url_ttl: int = 900
+    
+    # Ancho de banda de descarga: límite total en bytes/s (0 = sin límite) y
+    # conexiones para fragmentos HLS/DASH, repartidos entre las descargas
+    bandwidth_limit: int = 0
+    bandwidth_max_connections: int = 16
+    bandwidth_max_fragments: int = 8
+    
+    # Conversión de audio (ffmpeg): procesos simultáneos y nice base
+    transcode_workers: int = os.cpu_count() or 2
+    transcode_nice: int = 10
+    
+    # Endpoint /metrics (formato de Prometheus, sin autenticación)
+    metrics_enabled: bool = True
+    # Segundos entre publicaciones de los totales de cada worker (varios
+    # workers), que /metrics suma en cualquiera de ellos
+    metrics_share_interval: int = 5
+    
+    # Rate limiting: presupuesto de unidades por ventana, compartido por
+    # todas las rutas; cada endpoint consume según su peso
+    rate_limit_requests: int = 120
     rate_limit_window: int = 60
+    rate_limit_costs: str = (
+        "default=1,login=5,info=2,file=5,download=10,stream=10,"
+        "batch_info_item=1,batch_download_item=1"
+    )
+    # memory:// (un proceso), sqlite:///ruta.db (varios procesos) o redis://...
+    rate_limit_storage_uri: str = "memory://"
     
     # CORS
     allowed_origins: str = "http://localhost:3000"
@@ -0,0 +1,320 @@
+import math
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.state import state_store
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Registry:
+    """Conjunto de métricas que se exponen en /metrics"""
+
+    def __init__(self):
+        self._metrics: List = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List[list]]:
+        """Totales de contadores e histogramas de este proceso"""
+        return {
+            metric.name: metric.snapshot()
+            for metric in list(self._metrics) if isinstance(metric, _ShardedMetric)
+        }
+
+    def render(self, others: Iterable[Dict[str, List[list]]] = ()) -> str:
+        """Formato de texto de Prometheus (0.0.4), sumando a los contadores e
+        histogramas las instantáneas de otros procesos"""
+        others = list(others)
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect([other.get(metric.name, ()) for other in others]))
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def merge_snapshots(*snapshots: Dict[str, List[list]]) -> Dict[str, List[list]]:
+    """Sumar instantáneas de Registry.snapshot()"""
+    merged: Dict[str, Dict[tuple, list]] = {}
+    for snapshot in snapshots:
+        for name, samples in snapshot.items():
+            totals = merged.setdefault(name, {})
+            for key, values in samples:
+                _add(totals, tuple(key), values)
+    return {
+        name: [[list(key), values] for key, values in totals.items()]
+        for name, totals in merged.items()
+    }
+
+
+def _add(totals: Dict[tuple, list], key: tuple, values: list):
+    total = totals.get(key)
+    if total is None:
+        totals[key] = list(values)
+    else:
+        for n, value in enumerate(values):
+            total[n] += value
+
+
+class _ShardedMetric:
+    """Base de contadores e histogramas con un acumulador por hilo.
+
+    Cada hilo escribe solo en su propio acumulador, así que registrar un
+    valor no toma ningún lock (solo la primera vez que un hilo usa una
+    combinación de etiquetas). Al exponer se suman los acumuladores de
+    todos los hilos; los de hilos terminados se conservan para que los
+    totales nunca bajen.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Tuple[tuple, list]] = []
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _new_shard(self) -> list:
+        raise NotImplementedError
+
+    def _shard(self, labels: Dict[str, str]) -> list:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        shards = getattr(self._local, "shards", None)
+        if shards is None:
+            shards = self._local.shards = {}
+        shard = shards.get(key)
+        if shard is None:
+            shard = shards[key] = self._new_shard()
+            with self._lock:
+                self._shards.append((key, shard))
+        return shard
+
+    def _merged(self, others: Iterable[Iterable[list]] = ()) -> Dict[tuple, list]:
+        merged: Dict[tuple, list] = {}
+        with self._lock:
+            shards = list(self._shards)
+        for key, shard in shards:
+            _add(merged, key, shard)
+        for samples in others:
+            for key, values in samples:
+                _add(merged, tuple(key), values)
+        return merged
+
+    def snapshot(self) -> List[list]:
+        """Totales de este proceso como [[valores de etiquetas], valores]"""
+        return [[list(key), values] for key, values in self._merged().items()]
+
+
+class Counter(_ShardedMetric):
+    """Contador monotónico"""
+
+    kind = "counter"
+
+    def _new_shard(self) -> list:
+        return [0.0]
+
+    def inc(self, amount: float = 1, **labels):
+        self._shard(labels)[0] += amount
+
+    def collect(self, others: Iterable[Iterable[list]] = ()) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(shard[0])}"
+            for key, shard in sorted(self._merged(others).items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    """Histograma acumulativo (buckets, suma y número de observaciones)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_shard(self) -> list:
+        # Un hueco por bucket, otro para +Inf, y al final suma y cuenta
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value: float, **labels):
+        shard = self._shard(labels)
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-2] += value
+        shard[-1] += 1
+
+    def collect(self, others: Iterable[Iterable[list]] = ()) -> List[str]:
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for key, shard in sorted(self._merged(others).items()):
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(bounds, shard):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(shard[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {shard[-1]}")
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo que se calcula al exponer.
+
+    La función devuelve un número o, con etiquetas, un dict
+    {tupla de valores de etiquetas: número}. Es siempre el valor del proceso
+    que responde: no se suma entre workers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str,
+                 func: Callable[[], Union[float, Dict[tuple, float]]],
+                 labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def collect(self, others: Iterable[Any] = ()) -> List[str]:
+        value = self.func()
+        if not self.labelnames:
+            return [f"{self.name} {_format_value(value)}"]
+        return [
+            f"{self.name}{_format_labels(zip(self.labelnames, key))} {_format_value(sample)}"
+            for key, sample in sorted(value.items())
+        ]
+
+
+# Métricas de la aplicación
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ytdl_http_request_duration_seconds",
+    "Duración de las peticiones HTTP por ruta",
+    labelnames=("method", "route"),
+)
+
+STAGE_SECONDS = Histogram(
+    "ytdl_stage_duration_seconds",
+    "Duración de cada etapa: extract, download, postprocess, checksum, index, transcode, offload, fetch",
+    labelnames=("stage",),
+)
+
+DOWNLOADED_BYTES = Counter(
+    "ytdl_downloaded_bytes_total",
+    "Bytes descargados desde el origen",
+)
+
+SERVED_BYTES = Counter(
+    "ytdl_served_bytes_total",
+    "Bytes enviados a clientes (file: archivos, stream: streaming)",
+    labelnames=("kind",),
+)
+
+
+class SharedMetrics:
+    """Contadores e histogramas sumados entre los workers.
+
+    Cada proceso publica sus totales en el estado compartido cada
+    METRICS_SHARE_INTERVAL segundos (y al detenerse), y /metrics suma a los
+    propios las últimas instantáneas de los demás, así que cualquier worker
+    que atienda el scrape devuelve los totales de todos. Las de procesos que
+    dejaron de publicar se acumulan en una sola fila para que los totales
+    nunca bajen. Los gauges son siempre los del proceso que responde.
+
+    Con un solo worker no se publica nada.
+    """
+
+    # Intervalos sin publicar tras los que un proceso se da por terminado
+    stale_intervals = 60
+
+    def __init__(self, registry: Registry, store=None, interval: int = 5):
+        self.registry = registry
+        self.store = store
+        self.interval = interval
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.store is not None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await asyncio.get_running_loop().run_in_executor(None, self.publish)
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.publish)
+            except Exception as e:
+                logger.error(f"Error publicando métricas: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def publish(self):
+        """Guardar los totales de este proceso y archivar los de procesos
+        que ya no publican"""
+        self.store.save_metrics(self.owner, self.registry.snapshot())
+        self.store.archive_metrics(
+            time.time() - self.interval * self.stale_intervals, merge_snapshots
+        )
+
+    def render(self) -> str:
+        """Métricas de este proceso más los totales de los demás"""
+        if self.store is None:
+            return self.registry.render()
+        return self.registry.render(self.store.metrics_snapshots(exclude_owner=self.owner))
+
+
+shared_metrics = SharedMetrics(
+    registry,
+    store=state_store if settings.workers > 1 else None,
+    interval=settings.metrics_share_interval,
+)
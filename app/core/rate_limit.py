@@ -0,0 +1,167 @@
+import time
+import sqlite3
+from typing import Dict, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from limits import parse
+from limits.storage import Storage
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+from app.core.config import settings
+from app.core.auth import verify_token
+from app.core.sqlite import SQLiteStore
+
+# Todas las rutas comparten un único presupuesto por cliente
+API_SCOPE = "api"
+API_LIMIT = f"{settings.rate_limit_requests} per {settings.rate_limit_window} second"
+
+
+COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL,
+    expiry REAL NOT NULL
+);
+"""
+
+
+class SQLiteStorage(SQLiteStore, Storage):
+    """Almacenamiento de contadores en SQLite para compartir los límites
+    entre varios procesos de la misma máquina.
+
+    URI: sqlite:///ruta/relativa.db o sqlite:////ruta/absoluta.db
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+    SCHEMA = COUNTERS_SCHEMA
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        Storage.__init__(self, uri, wrap_exceptions=wrap_exceptions, **options)
+        SQLiteStore.__init__(self, uri[len("sqlite:///"):])
+        self._writes = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, expiry FROM counters WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row['expiry'] <= now:
+                    value = amount
+                    conn.execute(
+                        "INSERT OR REPLACE INTO counters (key, value, expiry) VALUES (?, ?, ?)",
+                        (key, value, now + expiry)
+                    )
+                else:
+                    value = row['value'] + amount
+                    new_expiry = now + expiry if elastic_expiry else row['expiry']
+                    conn.execute(
+                        "UPDATE counters SET value = ?, expiry = ? WHERE key = ?",
+                        (value, new_expiry, key)
+                    )
+                # Purgar ventanas vencidas de vez en cuando
+                self._writes += 1
+                if self._writes % 1000 == 0:
+                    conn.execute("DELETE FROM counters WHERE expiry <= ?", (now,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def get(self, key: str) -> int:
+        rows = self._query(
+            "SELECT value FROM counters WHERE key = ? AND expiry > ?", (key, time.time())
+        )
+        return rows[0]['value'] if rows else 0
+
+    def get_expiry(self, key: str) -> float:
+        rows = self._query("SELECT expiry FROM counters WHERE key = ?", (key,))
+        return rows[0]['expiry'] if rows else time.time()
+
+    def check(self) -> bool:
+        try:
+            self._query("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._execute("DELETE FROM counters")
+
+    def clear(self, key: str) -> None:
+        self._execute("DELETE FROM counters WHERE key = ?", (key,))
+
+
+def rate_limit_key(request: Request) -> str:
+    """Clave del cliente: usuario del JWT si lo hay, si no la IP"""
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        username = verify_token(token)
+        if username is not None:
+            return f"user:{username}"
+    return f"ip:{get_remote_address(request)}"
+
+
+def _parse_costs(value: str) -> Dict[str, int]:
+    costs = {}
+    for item in value.split(","):
+        name, _, cost = item.partition("=")
+        if name.strip() and cost.strip():
+            costs[name.strip()] = int(cost)
+    return costs
+
+
+ENDPOINT_COSTS = _parse_costs(settings.rate_limit_costs)
+
+
+def endpoint_cost(kind: str) -> int:
+    """Peso de una petición según el tipo de endpoint"""
+    return ENDPOINT_COSTS.get(kind, ENDPOINT_COSTS.get("default", 1))
+
+
+# Configurar rate limiting (una única instancia para toda la aplicación)
+limiter = Limiter(
+    key_func=rate_limit_key,
+    storage_uri=settings.rate_limit_storage_uri,
+)
+
+
+def rate_limit(kind: str) -> Callable:
+    """Decorador de límite compartido con el peso del tipo de endpoint"""
+    return limiter.shared_limit(API_LIMIT, scope=API_SCOPE, cost=endpoint_cost(kind))
+
+
+def units_per_window(kind: str, base_kind: str) -> Optional[int]:
+    """Cuántos elementos de un tipo caben en el presupuesto de una ventana
+    junto con la petición que los trae (None = sin límite)"""
+    cost = endpoint_cost(kind)
+    if cost <= 0:
+        return None
+    return max(0, settings.rate_limit_requests - endpoint_cost(base_kind)) // cost
+
+
+def charge(request: Request, kind: str, units: int):
+    """Cobrar un coste adicional (p. ej. por elemento de un lote) al
+    presupuesto compartido del cliente"""
+    cost = endpoint_cost(kind) * units
+    if cost <= 0:
+        return
+    limit = parse(API_LIMIT)
+    key = rate_limit_key(request)
+    # Se comprueba antes de cobrar: un cobro rechazado no gasta presupuesto
+    if not (limiter.limiter.test(limit, key, API_SCOPE, cost=cost)
+            and limiter.limiter.hit(limit, key, API_SCOPE, cost=cost)):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {API_LIMIT}"
+        )
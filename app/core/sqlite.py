@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+
+class SQLiteStore:
+    """Base de los almacenes SQLite que comparten los workers de la misma
+    máquina (modo WAL).
+
+    Cada proceso abre su propia conexión (no sobreviven a un fork), así que
+    da igual si el servidor de aplicaciones importa la app antes o después
+    de crear los workers. Al abrirla se crea el esquema (SCHEMA) y se añaden
+    las columnas de MIGRATIONS que falten en bases de datos existentes.
+    """
+
+    SCHEMA = ""
+    # (tabla, columna, tipo) añadidas después de crear la tabla
+    MIGRATIONS: Tuple[Tuple[str, str, str], ...] = ()
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(
+                str(self.db_path), timeout=5, check_same_thread=False, isolation_level=None
+            )
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._migrate(self._conn)
+            self._pid = os.getpid()
+        return self._conn
+
+    def _migrate(self, conn: sqlite3.Connection):
+        for table, column, kind in self.MIGRATIONS:
+            columns = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    # Otro worker la añadió a la vez
+                    pass
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def _execute(self, sql: str, params: tuple = ()) -> int:
+        with self._lock:
+            return self._connection().execute(sql, params).rowcount
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
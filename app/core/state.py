@@ -0,0 +1,268 @@
+import json
+import time
+from typing import Optional, Dict, Any, Callable, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.sqlite import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    user TEXT NOT NULL,
+    status TEXT NOT NULL,
+    url TEXT NOT NULL,
+    quality TEXT NOT NULL,
+    audio_format TEXT,
+    audio_bitrate INTEGER,
+    priority INTEGER NOT NULL DEFAULT 10,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    result TEXT,
+    error TEXT,
+    progress TEXT,
+    finished_ts REAL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS info_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    owner TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_pins (
+    filename TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (filename, owner)
+);
+"""
+
+# Columnas añadidas después de crear la tabla en bases de datos existentes
+MIGRATIONS = (
+    ('jobs', 'audio_format', 'TEXT'),
+    ('jobs', 'audio_bitrate', 'INTEGER'),
+    ('jobs', 'priority', 'INTEGER NOT NULL DEFAULT 10'),
+    ('jobs', 'attempts', 'INTEGER NOT NULL DEFAULT 0'),
+    ('jobs', 'owner', 'TEXT'),
+)
+
+# Fila con los totales de métricas de procesos que ya no publican
+ARCHIVED_METRICS_OWNER = "archived"
+
+JOB_FIELDS = (
+    'job_id', 'user', 'status', 'url', 'quality', 'audio_format', 'audio_bitrate',
+    'created_at', 'started_at', 'finished_at', 'error',
+)
+
+
+class StateStore(SQLiteStore):
+    """Estado compartido entre los workers de la misma máquina (SQLite en
+    modo WAL): trabajos, segundo nivel del caché de información, tokens
+    revocados, archivos fijados contra el desalojo y totales de métricas de
+    cada worker.
+
+    La tabla de trabajos hace de diario: cada trabajo aceptado se escribe
+    antes de encolarlo, con el proceso que lo atiende (owner), así que los
+    que no terminaron se pueden retomar tras un reinicio.
+    """
+
+    SCHEMA = SCHEMA
+    MIGRATIONS = MIGRATIONS
+
+    # Trabajos
+
+    def save_job(self, job: Dict[str, Any], owner: Optional[str] = None):
+        """Guardar el estado de un trabajo (sin tocar su progreso ni su dueño)"""
+        self._execute(
+            "INSERT INTO jobs (job_id, user, status, url, quality, audio_format, audio_bitrate, "
+            "created_at, started_at, finished_at, error, result, finished_ts, updated_at, "
+            "priority, attempts, owner) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET status = excluded.status, "
+            "started_at = excluded.started_at, finished_at = excluded.finished_at, "
+            "error = excluded.error, result = excluded.result, "
+            "finished_ts = excluded.finished_ts, updated_at = excluded.updated_at",
+            tuple(job[field] for field in JOB_FIELDS) + (
+                json.dumps(job['result']) if job['result'] is not None else None,
+                job['_finished_ts'],
+                time.time(),
+                job['_priority'],
+                job['_attempts'],
+                owner,
+            )
+        )
+
+    def save_job_progress(self, job_id: str, progress: Dict[str, Any]):
+        """Guardar el último estado de progreso de un trabajo"""
+        self._execute(
+            "UPDATE jobs SET progress = ?, updated_at = ? WHERE job_id = ?",
+            (json.dumps(progress), time.time(), job_id)
+        )
+
+    def get_job(self, job_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any], float]]:
+        """Trabajo, último progreso y fecha de actualización, o None"""
+        rows = self._query("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        progress = json.loads(row['progress']) if row['progress'] else {}
+        return self._job_from_row(row), progress, row['updated_at']
+
+    @staticmethod
+    def _job_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        job = {field: row[field] for field in JOB_FIELDS}
+        job['result'] = json.loads(row['result']) if row['result'] else None
+        job['_finished_ts'] = row['finished_ts']
+        job['_priority'] = row['priority']
+        job['_attempts'] = row['attempts']
+        return job
+
+    def unfinished_jobs(self) -> List[Tuple[Dict[str, Any], Optional[str]]]:
+        """Trabajos en cola o en curso (por orden de llegada) y su dueño"""
+        rows = self._query(
+            "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        )
+        return [(self._job_from_row(row), row['owner']) for row in rows]
+
+    def claim_job(self, job_id: str, previous_owner: Optional[str], owner: str) -> bool:
+        """Pasar un trabajo a otro dueño, de vuelta a la cola y con un intento
+        más; solo gana un proceso aunque varios lo intenten a la vez"""
+        return self._execute(
+            "UPDATE jobs SET owner = ?, status = 'queued', started_at = NULL, "
+            "attempts = attempts + 1, updated_at = ? WHERE job_id = ? AND owner IS ? "
+            "AND status IN ('queued', 'running')",
+            (owner, time.time(), job_id, previous_owner)
+        ) == 1
+
+    def prune_jobs(self, finished_before: float) -> int:
+        return self._execute(
+            "DELETE FROM jobs WHERE finished_ts IS NOT NULL AND finished_ts < ?",
+            (finished_before,)
+        )
+
+    # Caché de información
+
+    def cache_get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Valor vigente y su caducidad (tiempo de pared), o None"""
+        rows = self._query(
+            "SELECT value, expires_at FROM info_cache WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        )
+        if not rows:
+            return None
+        return json.loads(rows[0]['value']), rows[0]['expires_at']
+
+    def cache_set(self, key: str, value: Dict[str, Any], expires_at: float):
+        # Las claves con callables (p. ej. __post_extractor) no se pueden
+        # serializar; el resto se convierte a texto si hace falta
+        data = json.dumps({k: v for k, v in value.items() if not callable(v)}, default=str)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO info_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, data, expires_at)
+            )
+            conn.execute("DELETE FROM info_cache WHERE expires_at <= ?", (time.time(),))
+
+    # Tokens revocados
+
+    def revoke_token(self, jti: str, expires_at: float):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                (jti, expires_at)
+            )
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (time.time(),))
+
+    def revoked_tokens(self) -> Dict[str, float]:
+        """Tokens revocados que aún no han caducado (jti -> exp)"""
+        rows = self._query(
+            "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > ?", (time.time(),)
+        )
+        return {row['jti']: row['expires_at'] for row in rows}
+
+    # Archivos fijados
+
+    def pin_files(self, owner: str, filenames: List[str], expires_at: float):
+        """Fijar (o renovar) archivos a nombre de un proceso hasta expires_at"""
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_pins (filename, owner, expires_at) VALUES (?, ?, ?)",
+                [(filename, owner, expires_at) for filename in filenames]
+            )
+            conn.execute("DELETE FROM file_pins WHERE expires_at <= ?", (time.time(),))
+
+    def unpin_file(self, owner: str, filename: str):
+        self._execute(
+            "DELETE FROM file_pins WHERE filename = ? AND owner = ?", (filename, owner)
+        )
+
+    def pinned_files(self) -> Set[str]:
+        """Archivos fijados por cualquier proceso cuyo plazo no ha vencido"""
+        rows = self._query(
+            "SELECT DISTINCT filename FROM file_pins WHERE expires_at > ?", (time.time(),)
+        )
+        return {row['filename'] for row in rows}
+
+    # Métricas
+
+    def save_metrics(self, owner: str, snapshot: Dict[str, Any]):
+        """Guardar los totales de métricas de un proceso"""
+        self._execute(
+            "INSERT OR REPLACE INTO metrics (owner, data, updated_at) VALUES (?, ?, ?)",
+            (owner, json.dumps(snapshot), time.time())
+        )
+
+    def metrics_snapshots(self, exclude_owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Totales de métricas de los demás procesos (y de los archivados)"""
+        rows = self._query("SELECT data FROM metrics WHERE owner IS NOT ?", (exclude_owner,))
+        return [json.loads(row['data']) for row in rows]
+
+    def archive_metrics(self, updated_before: float,
+                        merge: Callable[..., Dict[str, Any]]) -> int:
+        """Sumar a la fila archivada los totales de los procesos que no
+        publican desde updated_before y borrar sus filas"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stale = conn.execute(
+                    "SELECT owner, data FROM metrics WHERE owner != ? AND updated_at < ?",
+                    (ARCHIVED_METRICS_OWNER, updated_before)
+                ).fetchall()
+                if stale:
+                    archived = conn.execute(
+                        "SELECT data FROM metrics WHERE owner = ?", (ARCHIVED_METRICS_OWNER,)
+                    ).fetchone()
+                    snapshots = [json.loads(row['data']) for row in stale]
+                    if archived is not None:
+                        snapshots.append(json.loads(archived['data']))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO metrics (owner, data, updated_at) VALUES (?, ?, ?)",
+                        (ARCHIVED_METRICS_OWNER, json.dumps(merge(*snapshots)), time.time())
+                    )
+                    conn.executemany(
+                        "DELETE FROM metrics WHERE owner = ?", [(row['owner'],) for row in stale]
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return len(stale)
+
+
+# Instancia global
+state_store = StateStore(settings.state_db_path)
@@ -0,0 +1,92 @@
+import json
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Configuración de hash de contraseñas (passlib se importa al primer uso)
+_pwd_context = None
+
+
+def get_pwd_context():
+    """Contexto de passlib para bcrypt"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
+class UserStore:
+    """Usuarios y hashes bcrypt, calculados o leídos una sola vez.
+
+    Los usuarios se leen de un archivo JSON {"usuario": "$2b$..."} (ver
+    scripts/create_user.py) que se recarga si cambia. El usuario de
+    API_USERNAME se añade siempre: con API_PASSWORD_HASH si está definido o
+    con el hash de API_PASSWORD calculado al cargar, no en cada login.
+    """
+
+    def __init__(self, users_file: str):
+        self.users_file = Path(users_file)
+        self._lock = threading.Lock()
+        self._users: Optional[Dict[str, str]] = None
+        self._file_mtime: Optional[float] = None
+        self._dummy_hash: Optional[str] = None
+        self._env_hash: Optional[str] = None
+
+    def _load(self) -> Dict[str, str]:
+        users: Dict[str, str] = {}
+        if self.users_file.is_file():
+            with open(self.users_file, encoding="utf-8") as f:
+                users.update(json.load(f))
+        if settings.api_username and settings.api_username not in users:
+            if self._env_hash is None:
+                self._env_hash = (
+                    settings.api_password_hash or get_pwd_context().hash(settings.api_password)
+                )
+            users[settings.api_username] = self._env_hash
+        logger.info(f"Usuarios cargados: {len(users)}")
+        return users
+
+    def _file_changed(self) -> bool:
+        try:
+            mtime = os.stat(self.users_file).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        changed = mtime != self._file_mtime
+        self._file_mtime = mtime
+        return changed
+
+    def users(self) -> Dict[str, str]:
+        """Usuarios actuales (recargando el archivo si cambió)"""
+        with self._lock:
+            changed = self._file_changed()
+            if self._users is None or changed:
+                self._users = self._load()
+            return self._users
+
+    def get_hash(self, username: str) -> Optional[str]:
+        return self.users().get(username)
+
+    def dummy_hash(self) -> str:
+        """Hash de referencia para no revelar por tiempos si un usuario existe"""
+        if self._dummy_hash is None:
+            self._dummy_hash = get_pwd_context().hash("dummy-password")
+        return self._dummy_hash
+
+    def verify(self, username: str, password: str) -> bool:
+        """Verificar credenciales (un único bcrypt por llamada)"""
+        hashed_password = self.get_hash(username)
+        if hashed_password is None:
+            get_pwd_context().verify(password, self.dummy_hash())
+            return False
+        return get_pwd_context().verify(password, hashed_password)
+
+
+# Instancia global
+user_store = UserStore(settings.users_file)
@@ -1,9 +1,9 @@
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.security import HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
 from datetime import datetime
 import logging
 import sys
@@ -13,7 +13,17 @@ import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.config import settings
+from app.core.rate_limit import limiter
+from app.core.metrics import HTTP_REQUEST_SECONDS, shared_metrics
 from app.api import auth, video, system
+from app.core.auth import auth_executor, token_cache
+from app.services.downloader import downloader
+from app.services.jobs import job_manager
+from app.services.storage import storage_manager
+from app.services.transcode import transcoder
+from app.services.tiering import tiered_storage
+from app.services.popularity import prefetcher
+from app.services.warmup import warmup
 
 # Configurar logging
 logging.basicConfig(
@@ -22,8 +32,35 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Configurar rate limiting
-limiter = Limiter(key_func=get_remote_address)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arrancar y detener los servicios en segundo plano"""
+    if settings.workers > 1 and settings.rate_limit_storage_uri.startswith("memory://"):
+        logger.warning(
+            "Varios workers con RATE_LIMIT_STORAGE_URI=memory://: "
+            "cada proceso aplicará su propio límite"
+        )
+    # Cargar en segundo plano lo que es lento la primera vez (hashes de
+    # contraseñas, yt-dlp): el servidor acepta conexiones sin esperarlo
+    warmup.start()
+    await job_manager.start()
+    await storage_manager.start()
+    await transcoder.start()
+    await tiered_storage.start()
+    await prefetcher.start()
+    await shared_metrics.start()
+    await token_cache.start()
+    yield
+    await token_cache.stop()
+    await warmup.stop()
+    await shared_metrics.stop()
+    await prefetcher.stop()
+    await storage_manager.stop()
+    await tiered_storage.stop()
+    await job_manager.stop()
+    await transcoder.stop()
+    downloader.shutdown()
+    auth_executor.shutdown(wait=False)
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -31,7 +68,8 @@ app = FastAPI(
     description="API segura para descargar videos de YouTube",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Agregar rate limiting
@@ -56,6 +94,9 @@ async def log_requests(request: Request, call_next):
     start_time = datetime.now()
     response = await call_next(request)
     process_time = datetime.now() - start_time
+    # Plantilla de la ruta (no la URL) para no crear una serie por archivo
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    HTTP_REQUEST_SECONDS.observe(process_time.total_seconds(), method=request.method, route=route)
     
     logger.info(
         f"{request.client.host} - {request.method} {request.url.path} - "
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Dict, Any
 
 class LoginRequest(BaseModel):
     """Modelo para request de login"""
@@ -10,15 +10,39 @@ class DownloadRequest(BaseModel):
     """Modelo para request de descarga"""
     url: str
     quality: str = "best"
+    # Conversión de audio (solo con quality="audio"): mp3, opus o m4a
+    audio_format: Optional[str] = None
+    audio_bitrate: Optional[int] = None
+
+class BatchRequest(BaseModel):
+    """Modelo para request por lotes"""
+    urls: List[str]
+    quality: str = "best"
+    audio_format: Optional[str] = None
+    audio_bitrate: Optional[int] = None
+
+class InfoRequest(BaseModel):
+    """Modelo para request de información"""
+    url: str
+    # Campos a devolver; sin indicar, los seis de siempre (sin formats)
+    fields: Optional[List[str]] = None
+
+class FormatsTable(BaseModel):
+    """Formatos disponibles: nombres de columna y una fila por formato"""
+    columns: List[str]
+    rows: List[List[Any]]
 
 class VideoInfo(BaseModel):
-    """Información del video"""
-    title: str
-    duration: int
-    uploader: str
-    view_count: int
-    upload_date: str
-    description: str
+    """Información del video (solo vienen los campos pedidos)"""
+    video_id: Optional[str] = None
+    title: Optional[str] = None
+    duration: Optional[int] = None
+    uploader: Optional[str] = None
+    view_count: Optional[int] = None
+    upload_date: Optional[str] = None
+    description: Optional[str] = None
+    thumbnail: Optional[str] = None
+    formats: Optional[FormatsTable] = None
 
 class DownloadResponse(BaseModel):
     """Respuesta de descarga"""
@@ -29,6 +53,33 @@ class DownloadResponse(BaseModel):
     filename: str
     message: str
 
+class FormatPlan(BaseModel):
+    """Formatos elegidos para una calidad y coste esperado"""
+    quality: str
+    format: str
+    mode: str
+    container: Optional[str] = None
+    height: Optional[int] = None
+    vcodec: Optional[str] = None
+    acodec: Optional[str] = None
+    estimated_bytes: Optional[int] = None
+    cpu_cost: str
+    estimated_cpu_seconds: float
+
+class JobResponse(BaseModel):
+    """Estado de un trabajo de descarga"""
+    job_id: str
+    status: str
+    url: str
+    quality: str
+    audio_format: Optional[str] = None
+    audio_bitrate: Optional[int] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[DownloadResponse] = None
+    error: Optional[str] = None
+
 class Token(BaseModel):
     """Token de autenticación"""
     access_token: str
@@ -52,6 +103,12 @@ class HealthResponse(BaseModel):
     timestamp: str
     download_dir_exists: bool
 
+class ReadinessResponse(BaseModel):
+    """Respuesta de readiness (calentamiento tras el arranque)"""
+    status: str
+    warmup_ms: Dict[str, float]
+    error: Optional[str] = None
+
 class ErrorResponse(BaseModel):
     """Respuesta de error"""
     detail: str
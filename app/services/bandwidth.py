@@ -0,0 +1,172 @@
+import time
+import threading
+from typing import Optional, Dict, Any, Set
+
+from app.core.config import settings
+
+# Protocolos que yt-dlp descarga por fragmentos (HLS/DASH nativos)
+FRAGMENTED_PROTOCOLS = {'m3u8_native', 'http_dash_segments', 'http_dash_segments_generator'}
+
+
+def is_fragmented(fmt: Dict[str, Any]) -> bool:
+    """Si un formato se descarga por fragmentos"""
+    protocols = (fmt.get('protocol') or '').split('+')
+    return bool(fmt.get('fragments')) or any(p in FRAGMENTED_PROTOCOLS for p in protocols)
+
+
+class BandwidthLease:
+    """Parte del presupuesto asignada a una descarga activa.
+
+    Las descargas HTTP se regulan desde el hook de progreso (se llama en cada
+    bloque) con un reloj virtual: un reparto nuevo afecta solo a los bytes
+    siguientes. El ratelimit propio de yt-dlp promedia desde el inicio del
+    archivo y, al bajar la parte de una descarga, la pararía hasta compensar
+    lo ya bajado, dejando el enlace infrautilizado. Para fragmentos sí se usa
+    ratelimit (cada fragmento es corto), dividido entre las conexiones.
+    """
+
+    # Ráfaga máxima que se acumula estando por debajo de la parte asignada
+    burst_seconds = 0.5
+
+    def __init__(self):
+        self.fragments = 1
+        self.ratelimit: Optional[int] = None
+        self.fragmented = False
+        self._params: Optional[dict] = None
+        self._file: Optional[str] = None
+        self._done = 0
+        self._next = 0.0
+
+    def attach(self, params: dict):
+        self._params = params
+        self.apply()
+
+    def apply(self):
+        """Escribir el reparto en las opciones vivas de yt-dlp (las
+        descargas por fragmentos las copian al empezar cada formato)"""
+        params = self._params
+        if params is None:
+            return
+        params['concurrent_fragment_downloads'] = self.fragments
+        ratelimit = None
+        if self.ratelimit is not None and self.fragmented:
+            # Cada conexión aplica ratelimit por su cuenta
+            ratelimit = max(1, self.ratelimit // self.fragments)
+        params['ratelimit'] = ratelimit
+
+    def on_progress(self, d: Dict[str, Any]):
+        """Hook de progreso de yt-dlp: esperar lo necesario para no pasar
+        de la parte asignada"""
+        if d.get('status') != 'downloading' or self.fragmented:
+            return
+        path = d.get('tmpfilename') or d.get('filename')
+        done = d.get('downloaded_bytes') or 0
+        if path != self._file or done < self._done:
+            # Archivo nuevo (o reanudado): la primera muestra es la base
+            self._file, self._done = path, done
+            self._next = time.monotonic()
+            return
+        delta, self._done = done - self._done, done
+        rate = self.ratelimit
+        now = time.monotonic()
+        if rate is None or delta <= 0:
+            self._next = now
+            return
+        self._next = max(self._next, now - self.burst_seconds) + delta / rate
+        if self._next > now:
+            time.sleep(self._next - now)
+
+
+class BandwidthScheduler:
+    """Reparte el ancho de banda y las conexiones entre las descargas activas.
+
+    Cada descarga recibe una parte igual del límite total y de las
+    conexiones para fragmentos (concurrent_fragment_downloads), con un
+    máximo por descarga; el reparto se recalcula cada vez que una descarga
+    empieza o termina.
+
+    Con varios workers el límite y las conexiones se dividen a partes iguales
+    entre WORKERS procesos, sin coordinarse: la parte de un worker sin
+    descargas activas queda sin usar, así que el total real puede quedar por
+    debajo de BANDWIDTH_LIMIT cuando la carga no está repartida.
+    """
+
+    def __init__(self, limit: int, max_connections: int, max_fragments: int, workers: int = 1):
+        self.limit = limit // max(1, workers) if limit else 0
+        self.max_connections = max(1, max_connections // max(1, workers))
+        self.max_fragments = max(1, max_fragments)
+        self._leases: Set[BandwidthLease] = set()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> BandwidthLease:
+        """Registrar una descarga que empieza"""
+        lease = BandwidthLease()
+        with self._lock:
+            self._leases.add(lease)
+            self._rebalance()
+        return lease
+
+    def release(self, lease: BandwidthLease):
+        """Devolver su parte al terminar"""
+        with self._lock:
+            if lease not in self._leases:
+                return
+            self._leases.discard(lease)
+            lease._params = None
+            self._rebalance()
+
+    def _rebalance(self):
+        active = len(self._leases)
+        if not active:
+            return
+        fragments = max(1, min(self.max_fragments, self.max_connections // active))
+        ratelimit = max(1, self.limit // active) if self.limit else None
+        for lease in self._leases:
+            lease.fragments = fragments
+            lease.ratelimit = ratelimit
+            lease.apply()
+
+    def postprocessor(self, lease: BandwidthLease):
+        """Postprocesador before_dl de yt-dlp que anota si los formatos
+        elegidos van por fragmentos antes de que empiece la descarga"""
+        from yt_dlp.postprocessor.common import PostProcessor
+        scheduler = self
+
+        class BandwidthPP(PostProcessor):
+            def __init__(self):
+                super().__init__(None)
+                # Paso interno: no se notifica a los hooks de progreso
+                self._progress_hooks = []
+
+            def set_downloader(self, downloader):
+                self._downloader = downloader
+
+            def run(self, info):
+                formats = info.get('requested_formats') or [info]
+                with scheduler._lock:
+                    lease.fragmented = any(is_fragmented(f) for f in formats)
+                    lease.apply()
+                return [], info
+
+        return BandwidthPP()
+
+    def stats(self) -> Dict[str, Any]:
+        """Reparto actual"""
+        with self._lock:
+            lease = next(iter(self._leases), None)
+            return {
+                'active': len(self._leases),
+                'limit_bytes_per_s': self.limit,
+                'max_connections': self.max_connections,
+                'fragments_per_job': lease.fragments if lease else self.max_fragments,
+                'ratelimit_per_job': lease.ratelimit if lease else None,
+            }
+
+
+# Instancia global
+bandwidth_scheduler = BandwidthScheduler(
+    limit=settings.bandwidth_limit,
+    max_connections=settings.bandwidth_max_connections,
+    max_fragments=settings.bandwidth_max_fragments,
+    workers=settings.workers,
+)
@@ -0,0 +1,30 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+async def fan_out(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[Any]],
+    concurrency: int
+) -> AsyncIterator[Any]:
+    """Ejecutar worker sobre cada elemento con concurrencia acotada y
+    devolver los resultados en orden de finalización.
+
+    Si el consumidor deja de iterar (p. ej. el cliente se desconecta) se
+    cancelan las tareas pendientes.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(item: T) -> Any:
+        async with semaphore:
+            return await worker(item)
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,96 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+
+class InfoCache:
+    """Caché LRU con expiración (TTL) para resultados de extract_info.
+
+    Con un store compartido (ver app.core.state) actúa como primer nivel en
+    memoria: los fallos se buscan en el store y las escrituras se copian a
+    él, así que lo extraído por un worker lo aprovechan los demás.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, store=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Obtener una entrada vigente o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        
+        shared = self.store.cache_get(key) if self.store is not None else None
+        with self._lock:
+            if shared is None:
+                self.misses += 1
+                return None
+            value, expires_at = shared
+            # Conservar la caducidad original, convertida a reloj monotónico
+            self._put(key, value, time.monotonic() + (expires_at - time.time()))
+            self.shared_hits += 1
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        """Guardar una entrada, desalojando la menos usada si hace falta"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._put(key, value, time.monotonic() + self.ttl_seconds)
+        if self.store is not None:
+            self.store.cache_set(key, value, time.time() + self.ttl_seconds)
+
+    def _put(self, key: str, value: Dict[str, Any], expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def ttl_remaining(self, key: str) -> Optional[float]:
+        """Segundos de vigencia que le quedan a una entrada (None si no hay)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                remaining = entry[0] - time.monotonic()
+                if remaining > 0:
+                    return remaining
+        shared = self.store.cache_get(key) if self.store is not None else None
+        if shared is None:
+            return None
+        return shared[1] - time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso del caché"""
+        with self._lock:
+            hits = self.hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,78 +1,397 @@
 import re
 import os
+import time
+import copy
 import asyncio
+import hashlib
 import logging
-from typing import Optional, Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Tuple, Callable, List
 from pathlib import Path
-import yt_dlp
 from app.core.config import settings
+from app.services.cache import InfoCache
+from app.services.index import DownloadIndex
+from app.services.locks import KeyLocks
+from app.services.bandwidth import bandwidth_scheduler
+from app.services.formats import negotiate, fallback_plan, formats_table
+from app.services.extraction import ProcessExtractor, extract_raw, ydl_options, preload
+from app.core.state import state_store
+from app.core.metrics import STAGE_SECONDS, DOWNLOADED_BYTES
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+YOUTUBE_REGEX = re.compile(
+    r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/'
+    r'(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
+)
+
+MAX_FILESIZE = 500 * 1024 * 1024  # 500MB máximo
+
+def _description(info: Dict[str, Any]) -> str:
+    description = info.get('description') or ''
+    return description[:500] + '...' if description else ''
+
+# Campos que puede pedir /video/info y cómo se obtienen de extract_info;
+# solo se calculan los pedidos
+INFO_FIELDS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    'video_id': lambda info: info.get('id'),
+    'title': lambda info: info.get('title', 'Unknown'),
+    'duration': lambda info: info.get('duration', 0),
+    'uploader': lambda info: info.get('uploader', 'Unknown'),
+    'view_count': lambda info: info.get('view_count', 0),
+    'upload_date': lambda info: info.get('upload_date', 'Unknown'),
+    'description': _description,
+    'thumbnail': lambda info: info.get('thumbnail'),
+    'formats': formats_table,
+}
+DEFAULT_INFO_FIELDS = ('title', 'duration', 'uploader', 'view_count', 'upload_date', 'description')
+
+# Archivos intermedios de yt-dlp: descargas parciales (.part), fragmentos
+# HLS/DASH y su estado (.part-FragN, .ytdl) y uniones a medias (.temp.ext)
+PARTIAL_FILE_REGEX = re.compile(r'\.(part|ytdl)$|\.part-Frag\d+|\.temp\.[^.]+$')
+
+def is_partial_file(name: str) -> bool:
+    """Si un archivo es una descarga o unión sin terminar"""
+    return PARTIAL_FILE_REGEX.search(name) is not None
+
+class ExtractionTimeoutError(Exception):
+    """La extracción de información superó el tiempo máximo"""
+
+class DownloadAborted(Exception):
+    """Un callback de progreso pidió detener la descarga"""
+    # Callback que la pidió (lo anota _notify_progress)
+    listener: Optional[Callable[[dict], None]] = None
+
 class YouTubeDownloader:
     def __init__(self):
         self.download_dir = Path(settings.download_dir)
-        self.download_dir.mkdir(exist_ok=True)
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        # Pool propio para descargas: su tamaño fija la concurrencia máxima
+        self._download_executor = ThreadPoolExecutor(
+            max_workers=settings.download_workers,
+            thread_name_prefix="download"
+        )
+        # Pool separado para extracción: las consultas de información no
+        # compiten con las descargas por hilos (ni al revés)
+        self._extract_executor = ThreadPoolExecutor(
+            max_workers=settings.extract_workers,
+            thread_name_prefix="extract"
+        )
+        # Motor "process": los hilos de extracción solo esperan al pool de
+        # procesos, que hace el trabajo de CPU fuera del GIL de este proceso
+        self._process_extractor: Optional[ProcessExtractor] = None
+        if settings.extract_engine == "process":
+            self._process_extractor = ProcessExtractor(
+                workers=settings.extract_workers,
+                max_tasks_per_child=settings.extract_max_tasks_per_child,
+                socket_timeout=settings.extract_timeout
+            )
+        # Caché compartido de extract_info para /video/info y las descargas
+        # (con segundo nivel en el estado compartido entre workers)
+        self.info_cache = InfoCache(
+            max_entries=settings.info_cache_size,
+            ttl_seconds=settings.info_cache_ttl,
+            store=state_store
+        )
+        # Índice persistente de archivos descargados
+        self.index = DownloadIndex(settings.index_db_path)
+        # Cerrojos entre procesos por descarga (varios workers)
+        self.locks = KeyLocks(self.download_dir / '.locks')
+        # Descargas en curso por (id de video, selector de formato)
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Callbacks de progreso por descarga (se invocan desde el hilo de yt-dlp)
+        self._listeners: Dict[Tuple[str, str], List[Callable[[dict], None]]] = {}
+        # Peticiones esperando cada descarga en curso
+        self._waiters: Counter = Counter()
+        # Extracciones en curso o en cola (solo se modifica en el event loop)
+        self.active_extractions = 0
+        self.coalesced_downloads = 0
+        self.reused_downloads = 0
         
     def validate_youtube_url(self, url: str) -> bool:
         """Validar que la URL sea de YouTube"""
-        youtube_regex = re.compile(
-            r'(https?://)?(www\.)?(youtube|youtu|youtube-nocookie)\.(com|be)/'
-            r'(watch\?v=|embed/|v/|.+\?v=)?([^&=%\?]{11})'
-        )
-        return bool(youtube_regex.match(url))
+        return bool(YOUTUBE_REGEX.match(url))
+    
+    def extract_video_id(self, url: str) -> Optional[str]:
+        """Obtener el id canónico (11 caracteres) de una URL de YouTube"""
+        match = YOUTUBE_REGEX.match(url)
+        return match.group(6) if match else None
+    
+    def _extract_info(self, url: str, refresh: bool = False) -> Dict[str, Any]:
+        """Extraer información sin procesar formatos, usando el caché (con
+        refresh se vuelve a extraer y se renueva la entrada)"""
+        video_id = self.extract_video_id(url)
+        if video_id and not refresh:
+            info = self.info_cache.get(video_id)
+            if info is not None:
+                return info
+        
+        start = time.perf_counter()
+        if self._process_extractor is not None:
+            info = self._process_extractor.extract(url)
+        else:
+            # yt_dlp se importa al primer uso (o en el calentamiento), no
+            # al importar la aplicación
+            import yt_dlp
+            with yt_dlp.YoutubeDL(ydl_options(settings.extract_timeout)) as ydl:
+                info = extract_raw(ydl, url)
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='extract')
+        
+        if video_id:
+            self.info_cache.set(video_id, info)
+        return info
+    
+    async def extract_info_async(self, url: str, timeout: Optional[float] = None,
+                                 refresh: bool = False) -> Dict[str, Any]:
+        """Extraer información en el pool de extracción con tiempo máximo"""
+        timeout = timeout or settings.extract_timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._extract_executor, self._extract_info, url, refresh)
+        self.active_extractions += 1
+        try:
+            # Al vencer el tiempo se cancela el futuro: si aún estaba en cola
+            # no llega a ejecutarse
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise ExtractionTimeoutError(
+                f"Tiempo de extracción agotado ({timeout}s)"
+            )
+        finally:
+            self.active_extractions -= 1
     
-    def get_video_info(self, url: str) -> Optional[Dict[str, Any]]:
+    def _summarize_info(self, info: Dict[str, Any],
+                        fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Campos de información que expone la API (los pedidos, o los de
+        siempre si no se indica ninguno)"""
+        return {field: INFO_FIELDS[field](info) for field in fields or DEFAULT_INFO_FIELDS}
+    
+    def get_video_info(self, url: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
         """Obtener información del video sin descargarlo"""
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                return {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'view_count': info.get('view_count', 0),
-                    'upload_date': info.get('upload_date', 'Unknown'),
-                    'description': info.get('description', '')[:500] + '...' if info.get('description', '') else ''
-                }
+            return self._summarize_info(self._extract_info(url), fields)
+        except Exception as e:
+            logger.error(f"Error obteniendo información del video: {str(e)}")
+            return None
+    
+    async def get_video_info_async(self, url: str,
+                                   fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Obtener información del video sin bloquear el event loop"""
+        try:
+            info = await self.extract_info_async(url)
+        except ExtractionTimeoutError:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo información del video: {str(e)}")
             return None
+        return self._summarize_info(info, fields)
     
-    async def download_video(self, url: str, quality: str = 'best') -> Dict[str, Any]:
-        """Descargar video de YouTube"""
+    async def download_video(
+        self,
+        url: str,
+        quality: str = 'best',
+        on_progress: Optional[Callable[[dict], None]] = None,
+        single_file: bool = False
+    ) -> Dict[str, Any]:
+        """Descargar video de YouTube.
+        
+        on_progress recibe los diccionarios de progress_hooks y
+        postprocessor_hooks de yt-dlp y se llama desde el hilo de descarga,
+        no desde el event loop. single_file limita la descarga a formatos
+        que ya traen video y audio (sin unir nada), como necesita el
+        streaming.
+        """
+        key = None
         try:
             # Validar URL
             if not self.validate_youtube_url(url):
                 raise ValueError("URL de YouTube no válida")
             
-            # Configurar opciones de descarga
-            ydl_opts = {
-                'format': self._get_format_selector(quality),
-                'outtmpl': str(self.download_dir / '%(title)s.%(ext)s'),
-                'restrictfilenames': True,
-                'noplaylist': True,
-                'max_filesize': 500 * 1024 * 1024,  # 500MB máximo
-            }
+            key = (self.extract_video_id(url), self._format_key(quality, single_file))
             
-            # Ejecutar descarga en un hilo separado para no bloquear
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, self._download_with_ydl, url, ydl_opts
-            )
+            # Archivo ya descargado: se devuelve sin volver a consultar YouTube
+            result = self.completed_download(key)
+            if result is not None:
+                self.reused_downloads += 1
+                return dict(result)
             
-            return result
+            if on_progress is not None:
+                self._listeners.setdefault(key, []).append(on_progress)
             
+            retry = False
+            while True:
+                # Descarga idéntica en curso: se espera a la misma en vez de repetirla
+                task = self._inflight.get(key)
+                if task is None:
+                    task = asyncio.ensure_future(self._download(url, quality, key, single_file))
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda t: self._finish_download(key, t))
+                elif not retry:
+                    self.coalesced_downloads += 1
+                
+                # shield: si un cliente cancela, la descarga sigue para los demás
+                self._waiters[key] += 1
+                try:
+                    return dict(await asyncio.shield(task))
+                except DownloadAborted as e:
+                    # La cortó el callback de otra petición (un prefetch que
+                    # cede): se retoma desde el .part para las que esperaban
+                    if e.listener is None or e.listener is on_progress:
+                        raise
+                    retry = True
+                finally:
+                    self._waiters[key] -= 1
+                    if self._waiters[key] <= 0:
+                        del self._waiters[key]
+            
+        except DownloadAborted:
+            raise
         except Exception as e:
             logger.error(f"Error descargando video: {str(e)}")
             raise Exception(f"Error en la descarga: {str(e)}")
+        finally:
+            if on_progress is not None and key in self._listeners:
+                listeners = self._listeners[key]
+                if on_progress in listeners:
+                    listeners.remove(on_progress)
+                if not listeners:
+                    del self._listeners[key]
+    
+    def _notify_progress(self, key: Tuple[str, str], progress: dict):
+        """Reenviar un evento de yt-dlp a los callbacks registrados"""
+        for listener in list(self._listeners.get(key, ())):
+            try:
+                listener(progress)
+            except DownloadAborted as e:
+                # Llega hasta yt-dlp, que corta la descarga (el .part se conserva)
+                e.listener = listener
+                raise
+            except Exception as e:
+                logger.error(f"Error en callback de progreso: {str(e)}")
+    
+    async def _download(self, url: str, quality: str, key: Tuple[str, str],
+                        single_file: bool = False) -> Dict[str, Any]:
+        """Descargar una sola vez por clave también entre procesos: el
+        cerrojo de archivo serializa a los workers y el que llega después
+        encuentra el archivo ya indexado"""
+        lock = self.locks.for_key(key)
+        await lock.acquire_async()
+        try:
+            result = self.completed_download(key)
+            if result is not None:
+                self.reused_downloads += 1
+                return result
+            return await self._download_locked(url, quality, key, single_file)
+        finally:
+            lock.release()
+    
+    async def _download_locked(self, url: str, quality: str, key: Tuple[str, str],
+                               single_file: bool = False) -> Dict[str, Any]:
+        """Extraer información y descargar"""
+        # Configurar opciones de descarga; la calidad forma parte del nombre
+        # para que distintas calidades del mismo video no se pisen (y los
+        # formatos negociados, de los de archivo único)
+        suffix = quality if single_file else f'{quality}-%(format_id)s'
+        ydl_opts = {
+            'format': self._get_format_selector(quality),
+            'outtmpl': str(self.download_dir / f'%(title)s-%(id)s-{suffix}.%(ext)s'),
+            'restrictfilenames': True,
+            'noplaylist': True,
+            'max_filesize': MAX_FILESIZE,
+            # Retomar los .part y fragmentos que dejó una descarga
+            # interrumpida (el nombre de archivo es determinista)
+            'continuedl': True,
+            'progress_hooks': [lambda d: self._notify_progress(key, d)],
+            'postprocessor_hooks': [lambda d: self._notify_progress(key, d)],
+        }
+        
+        # Obtener información primero (pool de extracción, con caché)
+        info = await self.extract_info_async(url)
+        
+        # Verificar duración (máximo 1 hora)
+        duration = info.get('duration') or 0
+        if duration > 3600:  # 1 hora en segundos
+            raise ValueError("Video demasiado largo (máximo 1 hora)")
+        
+        # Formatos que no necesitan recodificar (como mucho, unir con copia)
+        plan = negotiate(info, quality, single_file=single_file, max_bytes=MAX_FILESIZE)
+        if plan is not None:
+            ydl_opts['format'] = plan['format']
+            if plan['mode'] == 'remux':
+                ydl_opts['merge_output_format'] = plan['container']
+        
+        # Ejecutar descarga en el pool de descargas para no bloquear
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._download_executor, self._download_with_ydl, info, ydl_opts, key[1]
+        )
+    
+    def _finish_download(self, key: Tuple[str, str], task: asyncio.Task):
+        """Cerrar una descarga en curso"""
+        self._inflight.pop(key, None)
+    
+    def completed_download(self, key: Tuple[str, str]) -> Optional[Dict[str, Any]]:
+        """Resultado de una descarga previa cuyo archivo sigue en disco (o en
+        el almacén de objetos)"""
+        record = self.index.get(*key)
+        if record is None or not self._available(record):
+            return None
+        return self.result_from_record(record)
+    
+    def _available(self, record: Dict[str, Any]) -> bool:
+        """Si un archivo indexado se puede servir; corrige el índice si el
+        archivo ya no está en disco"""
+        if record['local'] and Path(record['filepath']).is_file():
+            return True
+        if record['remote_key']:
+            if record['local']:
+                self.index.mark_remote(record['filename'], record['remote_key'])
+                record['local'] = 0
+            return settings.object_store_enabled
+        self.index.remove(record['filename'])
+        return False
+    
+    def result_from_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'success': True,
+            'title': record['title'],
+            'duration': record['duration'],
+            'uploader': record['uploader'],
+            'filename': record['filename'],
+            'message': 'Video descargado exitosamente'
+        }
+    
+    def get_artifact(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Buscar en el índice un archivo descargado y marcar su acceso"""
+        record = self.index.get_by_filename(filename)
+        if record is None or not self._available(record):
+            return None
+        self.index.touch(filename)
+        return record
+    
+    def file_checksum(self, filepath: str) -> str:
+        """SHA-256 del archivo, leído por bloques"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _format_key(self, quality: str, single_file: bool) -> str:
+        """Formato con el que se indexa una descarga: el selector de archivo
+        único o la negociación de formatos de la calidad"""
+        if single_file:
+            return self._get_format_selector(quality)
+        return f'negotiated:{quality}'
+    
+    async def plan_download(self, url: str, quality: str, single_file: bool = False) -> Dict[str, Any]:
+        """Formatos que se descargarían para una calidad, con el tamaño y
+        el postproceso esperados, sin descargar nada"""
+        info = await self.extract_info_async(url)
+        plan = negotiate(info, quality, single_file=single_file, max_bytes=MAX_FILESIZE)
+        return plan or fallback_plan(quality, self._get_format_selector(quality))
     
     def _get_format_selector(self, quality: str) -> str:
         """Obtener selector de formato según calidad"""
@@ -86,49 +405,176 @@ class YouTubeDownloader:
         }
         return quality_map.get(quality, 'best')
     
-    def _download_with_ydl(self, url: str, ydl_opts: dict) -> Dict[str, Any]:
-        """Ejecutar descarga con yt-dlp"""
+    def _download_with_ydl(self, info: Dict[str, Any], ydl_opts: dict, index_format: str) -> Dict[str, Any]:
+        """Ejecutar descarga con yt-dlp a partir de información ya extraída"""
+        import yt_dlp
+        
+        # Tiempos por etapa a partir de los hooks: la descarga termina con el
+        # último evento "finished" y cada postprocesador marca su inicio y fin
+        start = time.perf_counter()
+        marks = {'downloaded': None, 'postprocess': 0.0, 'pp_started': None}
+        
+        def on_progress(d):
+            if d.get('status') == 'finished':
+                marks['downloaded'] = time.perf_counter()
+                # Sin 'elapsed' el archivo ya estaba en disco: no hubo tráfico
+                if 'elapsed' in d:
+                    DOWNLOADED_BYTES.inc(d.get('downloaded_bytes') or d.get('total_bytes') or 0)
+        
+        def on_postprocess(d):
+            if d.get('status') == 'started':
+                marks['pp_started'] = time.perf_counter()
+            elif d.get('status') == 'finished' and marks['pp_started'] is not None:
+                marks['postprocess'] += time.perf_counter() - marks['pp_started']
+                marks['pp_started'] = None
+        
+        ydl_opts = {
+            **ydl_opts,
+            'progress_hooks': [*ydl_opts.get('progress_hooks', ()), on_progress],
+            'postprocessor_hooks': [*ydl_opts.get('postprocessor_hooks', ()), on_postprocess],
+        }
+        # Parte del ancho de banda y de las conexiones mientras dure
+        lease = bandwidth_scheduler.acquire()
+        ydl_opts['progress_hooks'].append(lease.on_progress)
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Obtener información primero
-                info = ydl.extract_info(url, download=False)
-                
-                # Verificar duración (máximo 1 hora)
-                duration = info.get('duration', 0)
-                if duration > 3600:  # 1 hora en segundos
-                    raise ValueError("Video demasiado largo (máximo 1 hora)")
-                
-                # Descargar
-                ydl.download([url])
-                
-                # Buscar el archivo descargado
-                title = info.get('title', 'unknown')
-                safe_title = re.sub(r'[^\w\s-]', '', title).strip()
+                lease.attach(ydl.params)
+                ydl.add_post_processor(bandwidth_scheduler.postprocessor(lease), when='before_dl')
+                # Descargar reutilizando la información ya extraída;
+                # process_ie_result modifica el dict, por eso se copia
+                processed = ydl.process_ie_result(copy.deepcopy(info), download=True)
                 
-                return {
-                    'success': True,
-                    'title': title,
-                    'duration': duration,
-                    'uploader': info.get('uploader', 'Unknown'),
-                    'filename': f"{safe_title}.{info.get('ext', 'mp4')}",
-                    'message': 'Video descargado exitosamente'
-                }
+                # Ruta real del archivo escrito por yt-dlp
+                downloads = processed.get('requested_downloads') or [{}]
+                filepath = downloads[0].get('filepath') or ydl.prepare_filename(processed)
+            
+            finished = time.perf_counter()
+            downloaded = marks['downloaded'] or finished
+            STAGE_SECONDS.observe(downloaded - start, stage='download')
+            if marks['postprocess']:
+                STAGE_SECONDS.observe(marks['postprocess'], stage='postprocess')
+            
+            checksum = self.file_checksum(filepath)
+            checksummed = time.perf_counter()
+            STAGE_SECONDS.observe(checksummed - finished, stage='checksum')
+            
+            record = {
+                'video_id': info.get('id'),
+                'format': index_format,
+                'filename': Path(filepath).name,
+                'filepath': str(Path(filepath).resolve()),
+                'size': os.path.getsize(filepath),
+                'checksum': checksum,
+                'title': info.get('title', 'unknown'),
+                'duration': info.get('duration') or 0,
+                'uploader': info.get('uploader', 'Unknown'),
+            }
+            self.index.add(record)
+            STAGE_SECONDS.observe(time.perf_counter() - checksummed, stage='index')
+            return self.result_from_record(record)
                 
+        except DownloadAborted:
+            raise
         except Exception as e:
             raise Exception(f"Error en yt-dlp: {str(e)}")
+        finally:
+            bandwidth_scheduler.release(lease)
+    
+    def warm_up(self):
+        """Cargar yt-dlp y su extractor de YouTube (o arrancar el pool de
+        procesos) antes de la primera extracción"""
+        if self._process_extractor is not None:
+            self._process_extractor.warm_up()
+        else:
+            preload(settings.extract_timeout)
     
-    def cleanup_old_files(self, max_age_hours: int = 24):
-        """Limpiar archivos antiguos"""
+    def executor_queue_depths(self) -> Dict[str, int]:
+        """Tareas esperando hilo en cada pool"""
+        return {
+            'download': self._download_executor._work_queue.qsize(),
+            'extract': self._extract_executor._work_queue.qsize(),
+        }
+    
+    def has_download(self, url: str, quality: str) -> bool:
+        """Si una calidad de un video ya está descargada o descargándose"""
+        key = (self.extract_video_id(url), self._format_key(quality, False))
+        return key in self._inflight or self.completed_download(key) is not None
+    
+    def waiters(self, url: str, quality: str) -> int:
+        """Peticiones esperando la descarga en curso de una calidad de un video"""
+        return self._waiters.get((self.extract_video_id(url), self._format_key(quality, False)), 0)
+    
+    def in_flight_keys(self) -> set:
+        """Claves (id de video, formato) de las descargas en curso"""
+        return set(self._inflight)
+    
+    def download_stats(self) -> Dict[str, Any]:
+        """Contadores de descargas compartidas y reutilizadas"""
+        return {
+            **self.index.stats(),
+            'in_flight': len(self._inflight),
+            'coalesced': self.coalesced_downloads,
+            'reused': self.reused_downloads,
+        }
+    
+    def shutdown(self):
+        """Liberar los pools de hilos (y de procesos)"""
+        self._download_executor.shutdown(wait=False, cancel_futures=True)
+        self._extract_executor.shutdown(wait=False, cancel_futures=True)
+        if self._process_extractor is not None:
+            self._process_extractor.shutdown()
+        self.index.close()
+    
+    def cleanup_old_files(self, max_age_hours: int = 24, protected: Optional[set] = None,
+                          busy: Optional[set] = None) -> int:
+        """Limpiar archivos antiguos (sin tocar descargas en curso ni
+        archivos protegidos). Devuelve el número de archivos borrados."""
+        protected = protected or set()
+        busy = busy or set()
+        removed = 0
         try:
-            now = asyncio.get_event_loop().time()
-            for file_path in self.download_dir.iterdir():
-                if file_path.is_file():
-                    file_age = now - file_path.stat().st_mtime
-                    if file_age > max_age_hours * 3600:
-                        file_path.unlink()
-                        logger.info(f"Archivo eliminado: {file_path.name}")
+            # st_mtime es tiempo de pared: comparar con time.time()
+            cutoff = time.time() - max_age_hours * 3600
+            with os.scandir(self.download_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False) or entry.name in protected:
+                        continue
+                    # Los parciales se retoman o los borra el gestor de
+                    # almacenamiento cuando caducan
+                    if is_partial_file(entry.name):
+                        continue
+                    record = self.index.get_by_filename(entry.name)
+                    if record is not None and (record['video_id'], record['format']) in busy:
+                        continue
+                    if entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        # Si tiene copia en el almacén de objetos se sigue sirviendo desde allí
+                        if record is not None and record['remote_key']:
+                            self.index.mark_remote(entry.name, record['remote_key'])
+                        else:
+                            self.index.remove(entry.name)
+                        removed += 1
+                        logger.info(f"Archivo eliminado: {entry.name}")
         except Exception as e:
             logger.error(f"Error limpiando archivos: {str(e)}")
+        return removed
+
+    def touch_partial_files(self, video_ids: set) -> int:
+        """Renovar la fecha de los parciales de unos videos (trabajos que se
+        van a retomar) para que no caduquen antes de reanudarlos"""
+        touched = 0
+        with os.scandir(self.download_dir) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False) or not is_partial_file(entry.name):
+                    continue
+                # Los nombres siguen la plantilla título-id-calidad...
+                if any(f'-{video_id}-' in entry.name for video_id in video_ids):
+                    try:
+                        os.utime(entry.path)
+                        touched += 1
+                    except FileNotFoundError:
+                        pass
+        return touched
 
 # Instancia global
 downloader = YouTubeDownloader()
@@ -0,0 +1,126 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import yt_dlp
+
+logger = logging.getLogger(__name__)
+
+# Campos voluminosos que ni la API ni la descarga usan: no se envían entre
+# procesos (los subtítulos automáticos de YouTube ocupan cientos de KB)
+BULKY_FIELDS = (
+    'automatic_captions', 'subtitles', 'requested_subtitles',
+    'thumbnails', 'heatmap', 'chapters',
+)
+
+# yt_dlp tarda en importarse: se carga al primer uso o con preload()
+# YoutubeDL del proceso worker (solo en el motor de procesos)
+_worker_ydl: Optional["yt_dlp.YoutubeDL"] = None
+
+
+def ydl_options(socket_timeout: int) -> Dict[str, Any]:
+    return {
+        'quiet': True,
+        'no_warnings': True,
+        'noplaylist': True,
+        'socket_timeout': socket_timeout,
+    }
+
+
+def extract_raw(ydl: "yt_dlp.YoutubeDL", url: str) -> Dict[str, Any]:
+    """Extraer información sin procesar formatos"""
+    # process=False: la selección de formatos se hace al descargar
+    info = ydl.extract_info(url, download=False, process=False)
+    # Resolver redirecciones (p. ej. watch?v=...&list=... con noplaylist)
+    while info.get('_type') in ('url', 'url_transparent'):
+        info = ydl.extract_info(
+            info['url'], download=False, process=False,
+            ie_key=info.get('ie_key')
+        )
+    return info
+
+
+def compact_info(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Info dict sin campos voluminosos ni valores que no se pueden
+    serializar (p. ej. __post_extractor)"""
+    return {
+        key: value for key, value in info.items()
+        if key not in BULKY_FIELDS and not callable(value)
+    }
+
+
+def preload(socket_timeout: int) -> "yt_dlp.YoutubeDL":
+    """Importar yt_dlp y cargar el extractor de YouTube (el único que se
+    usa) para que la primera extracción no pague ese coste"""
+    import yt_dlp
+    ydl = yt_dlp.YoutubeDL(ydl_options(socket_timeout))
+    ydl.get_info_extractor('Youtube')
+    return ydl
+
+
+def _init_worker(socket_timeout: int):
+    """Inicializar un proceso worker: yt_dlp ya importado y un YoutubeDL
+    que conserva sus extractores entre trabajos"""
+    global _worker_ydl
+    _worker_ydl = preload(socket_timeout)
+
+
+def _ping() -> bool:
+    return _worker_ydl is not None
+
+
+def _extract_in_worker(url: str) -> Dict[str, Any]:
+    return compact_info(extract_raw(_worker_ydl, url))
+
+
+class ProcessExtractor:
+    """Extracción en un pool de procesos.
+
+    La firma, el parseo de JSON y la ordenación de formatos de yt-dlp son
+    Python puro; en procesos no compiten por el GIL con el event loop ni
+    entre sí. Cada worker se recicla tras max_tasks_per_child extracciones
+    para acotar el crecimiento de memoria, y si un worker muere el pool se
+    vuelve a crear.
+    """
+
+    def __init__(self, workers: int, max_tasks_per_child: int, socket_timeout: int):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.socket_timeout = socket_timeout
+        self._lock = threading.Lock()
+        self._pool = self._create_pool()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            # spawn: obligatorio con max_tasks_per_child y seguro con hilos
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.socket_timeout,),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+
+    def extract(self, url: str) -> Dict[str, Any]:
+        """Extraer en un proceso worker (bloquea el hilo que llama)"""
+        pool = self._pool
+        try:
+            return pool.submit(_extract_in_worker, url).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    logger.error("Pool de extracción roto, creando uno nuevo")
+                    self._pool = self._create_pool()
+            raise
+
+    def warm_up(self):
+        """Arrancar todos los procesos worker (cada uno ejecuta el initializer)"""
+        futures = [self._pool.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,200 @@
+import shutil
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
+
+# Altura máxima por calidad (None = sin límite)
+QUALITY_HEIGHTS = {'best': None, '720p': 720, '480p': 480, '360p': 360, 'worst': None}
+
+# Contenedores de salida y códecs que admiten sin recodificar
+CONTAINERS = {
+    'mp4': {
+        'video_ext': ('mp4',), 'audio_ext': ('m4a', 'mp4'),
+        'vcodecs': ('avc1', 'av01', 'hev1', 'hvc1', 'vp09'), 'acodecs': ('mp4a', 'ac-3', 'ec-3'),
+    },
+    'webm': {
+        'video_ext': ('webm',), 'audio_ext': ('webm',),
+        'vcodecs': ('vp8', 'vp9', 'vp09', 'av01'), 'acodecs': ('opus', 'vorbis'),
+    },
+}
+
+# Velocidad aproximada de un remux (copia de streams con ffmpeg), en bytes/s
+REMUX_BYTES_PER_SECOND = 150 * 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def ffmpeg_available() -> bool:
+    """Si hay ffmpeg para unir video y audio"""
+    return shutil.which('ffmpeg') is not None
+
+
+def _has_video(fmt: Dict[str, Any]) -> bool:
+    return fmt.get('vcodec') != 'none'
+
+
+def _has_audio(fmt: Dict[str, Any]) -> bool:
+    return fmt.get('acodec') != 'none'
+
+
+def _codec_matches(codec: Optional[str], accepted: tuple) -> bool:
+    # Códec desconocido: se confía en la extensión
+    return not codec or codec.split('.')[0].lower() in accepted
+
+
+def _container_for(video: Dict[str, Any], audio: Dict[str, Any]) -> Optional[str]:
+    """Contenedor en el que se pueden unir video y audio con copia de streams"""
+    for name, spec in CONTAINERS.items():
+        if (video.get('ext') in spec['video_ext'] and audio.get('ext') in spec['audio_ext']
+                and _codec_matches(video.get('vcodec'), spec['vcodecs'])
+                and _codec_matches(audio.get('acodec'), spec['acodecs'])):
+            return name
+    return None
+
+
+def estimate_size(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[int]:
+    """Tamaño del formato: el anunciado o, si no, bitrate × duración"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 125 * duration)
+    return None
+
+
+def _plan(quality: str, formats: List[Dict[str, Any]], duration: Optional[float],
+          container: str) -> Dict[str, Any]:
+    sizes = [estimate_size(f, duration) for f in formats]
+    estimated = sum(sizes) if all(size is not None for size in sizes) else None
+    remux = len(formats) > 1
+    video = next((f for f in formats if _has_video(f)), None)
+    audio = next((f for f in formats if _has_audio(f)), None)
+    return {
+        'quality': quality,
+        'format': '+'.join(str(f['format_id']) for f in formats),
+        'mode': 'remux' if remux else 'single',
+        'container': container,
+        'height': video.get('height') if video else None,
+        'vcodec': video.get('vcodec') if video else None,
+        'acodec': audio.get('acodec') if audio else None,
+        'estimated_bytes': estimated,
+        'cpu_cost': 'remux' if remux else 'none',
+        'estimated_cpu_seconds': round(estimated / REMUX_BYTES_PER_SECOND, 2)
+        if remux and estimated else 0.0,
+    }
+
+
+def negotiate(info: Dict[str, Any], quality: str, single_file: bool = False,
+              max_bytes: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Elegir los formatos a descargar para una calidad.
+
+    Solo se consideran archivos que ya traen video y audio, o parejas de
+    video y audio que se unen en un contenedor común copiando los streams
+    (nunca recodificando). Gana la mayor altura dentro de la calidad pedida;
+    a igual altura se prefiere un archivo único (sin postproceso) y luego
+    mp4. Con single_file (streaming) o sin ffmpeg no se usan parejas.
+    Devuelve None si la información no permite decidir.
+    """
+    formats = [f for f in info.get('formats') or [] if f.get('format_id')]
+    if not formats:
+        return None
+    duration = info.get('duration')
+
+    def fits(plan: Dict[str, Any]) -> bool:
+        return max_bytes is None or plan['estimated_bytes'] is None or plan['estimated_bytes'] <= max_bytes
+
+    if quality == 'audio':
+        audios = [f for f in formats if _has_audio(f) and not _has_video(f)]
+        plans = [_plan(quality, [f], duration, f.get('ext')) for f in audios]
+        ranked = sorted(
+            zip(plans, audios),
+            key=lambda item: (item[1].get('abr') or item[1].get('tbr') or 0, item[1].get('ext') == 'm4a'),
+            reverse=True
+        )
+        return next((plan for plan, _ in ranked if fits(plan)), None)
+
+    max_height = QUALITY_HEIGHTS.get(quality)
+
+    def within(fmt: Dict[str, Any]) -> bool:
+        return max_height is None or (fmt.get('height') or 0) <= max_height
+
+    candidates = [
+        _plan(quality, [f], duration, f.get('ext'))
+        for f in formats if _has_video(f) and _has_audio(f) and within(f)
+    ]
+    if not single_file and ffmpeg_available():
+        # Mejor audio de cada contenedor, para no combinar todos con todos
+        best_audio: Dict[str, Dict[str, Any]] = {}
+        for audio in formats:
+            if _has_video(audio) or not _has_audio(audio):
+                continue
+            for name, spec in CONTAINERS.items():
+                if audio.get('ext') not in spec['audio_ext']:
+                    continue
+                current = best_audio.get(name)
+                if current is None or (audio.get('abr') or 0) > (current.get('abr') or 0):
+                    best_audio[name] = audio
+        for video in formats:
+            if _has_audio(video) or not _has_video(video) or not within(video):
+                continue
+            for audio in best_audio.values():
+                container = _container_for(video, audio)
+                if container is not None:
+                    candidates.append(_plan(quality, [video, audio], duration, container))
+
+    candidates = [plan for plan in candidates if fits(plan)]
+    if not candidates:
+        return None
+    if quality == 'worst':
+        return min(candidates, key=lambda plan: (plan['height'] or 0, plan['estimated_bytes'] or 0))
+    return max(candidates, key=lambda plan: (
+        plan['height'] or 0,
+        plan['mode'] == 'single',
+        plan['container'] == 'mp4',
+        plan['estimated_bytes'] or 0,
+    ))
+
+
+# Columnas de la tabla compacta de formatos de /video/info
+FORMAT_COLUMNS = ('format_id', 'ext', 'resolution', 'fps', 'vcodec', 'acodec', 'filesize', 'tbr')
+
+
+def formats_table(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Formatos disponibles como tabla (columnas y una fila por formato),
+    sin los que no traen ni video ni audio (storyboards)"""
+    duration = info.get('duration')
+    rows = []
+    for fmt in info.get('formats') or []:
+        if not fmt.get('format_id') or not (_has_video(fmt) or _has_audio(fmt)):
+            continue
+        if not _has_video(fmt):
+            resolution = 'audio only'
+        elif fmt.get('height'):
+            resolution = f"{fmt.get('width') or '?'}x{fmt['height']}"
+        else:
+            resolution = fmt.get('resolution')
+        rows.append([
+            str(fmt['format_id']),
+            fmt.get('ext'),
+            resolution,
+            fmt.get('fps'),
+            fmt.get('vcodec') if _has_video(fmt) else None,
+            fmt.get('acodec') if _has_audio(fmt) else None,
+            estimate_size(fmt, duration),
+            fmt.get('tbr'),
+        ])
+    return {'columns': list(FORMAT_COLUMNS), 'rows': rows}
+
+
+def fallback_plan(quality: str, selector: str) -> Dict[str, Any]:
+    """Plan sin información de formatos: el selector de archivo único"""
+    return {
+        'quality': quality,
+        'format': selector,
+        'mode': 'single',
+        'container': None,
+        'height': None,
+        'vcodec': None,
+        'acodec': None,
+        'estimated_bytes': None,
+        'cpu_cost': 'none',
+        'estimated_cpu_seconds': 0.0,
+    }
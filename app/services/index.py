@@ -0,0 +1,121 @@
+import time
+from typing import Optional, Dict, Any, List
+
+from app.core.sqlite import SQLiteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    video_id TEXT NOT NULL,
+    format TEXT NOT NULL,
+    filename TEXT NOT NULL UNIQUE,
+    filepath TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    checksum TEXT NOT NULL,
+    title TEXT,
+    duration INTEGER,
+    uploader TEXT,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    remote_key TEXT,
+    local INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (video_id, format)
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_last_access ON downloads (last_access);
+"""
+
+# Columnas añadidas después de crear la tabla en índices existentes
+MIGRATIONS = (
+    ('downloads', 'remote_key', 'TEXT'),
+    ('downloads', 'local', 'INTEGER NOT NULL DEFAULT 1'),
+)
+
+
+class DownloadIndex(SQLiteStore):
+    """Índice persistente (SQLite en modo WAL) de los archivos descargados.
+
+    Cada archivo puede estar en disco (local), en el almacén de objetos
+    (remote_key) o en ambos; los que solo están en el almacén conservan su
+    entrada para servirlos desde allí.
+    """
+
+    SCHEMA = SCHEMA
+    MIGRATIONS = MIGRATIONS
+
+    def get(self, video_id: str, fmt: str) -> Optional[Dict[str, Any]]:
+        """Buscar un archivo por (id de video, selector de formato)"""
+        rows = self._query(
+            "SELECT * FROM downloads WHERE video_id = ? AND format = ?",
+            (video_id, fmt)
+        )
+        return rows[0] if rows else None
+
+    def get_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Buscar un archivo por su nombre"""
+        rows = self._query("SELECT * FROM downloads WHERE filename = ?", (filename,))
+        return rows[0] if rows else None
+
+    def add(self, record: Dict[str, Any]):
+        """Registrar (o reemplazar) un archivo descargado"""
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO downloads (video_id, format, filename, filepath, "
+            "size, checksum, title, duration, uploader, created_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record['video_id'], record['format'], record['filename'],
+                record['filepath'], record['size'], record['checksum'],
+                record.get('title'), record.get('duration'), record.get('uploader'),
+                now, now
+            )
+        )
+
+    def touch(self, filename: str):
+        """Actualizar la fecha de último acceso"""
+        self._execute(
+            "UPDATE downloads SET last_access = ? WHERE filename = ?",
+            (time.time(), filename)
+        )
+
+    def mark_remote(self, filename: str, remote_key: str, keep_local: bool = False):
+        """Anotar que el archivo está en el almacén de objetos (y si sigue en disco)"""
+        self._execute(
+            "UPDATE downloads SET remote_key = ?, local = ? WHERE filename = ?",
+            (remote_key, int(keep_local), filename)
+        )
+
+    def mark_local(self, filename: str):
+        """Anotar que el archivo vuelve a estar en disco"""
+        self._execute(
+            "UPDATE downloads SET local = 1, last_access = ? WHERE filename = ?",
+            (time.time(), filename)
+        )
+
+    def offload_candidates(self, accessed_before: float, limit: int = 100) -> List[Dict[str, Any]]:
+        """Archivos en disco sin usar desde accessed_before, del más antiguo al más nuevo"""
+        return self._query(
+            "SELECT * FROM downloads WHERE local = 1 AND last_access < ? "
+            "ORDER BY last_access ASC LIMIT ?",
+            (accessed_before, limit)
+        )
+
+    def remove(self, filename: str) -> bool:
+        """Quitar un archivo del índice"""
+        return self._execute("DELETE FROM downloads WHERE filename = ?", (filename,)) > 0
+
+    def least_recently_used(self, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Archivos en disco ordenados del menos al más recientemente usado"""
+        return self._query(
+            "SELECT * FROM downloads WHERE local = 1 ORDER BY last_access ASC LIMIT ? OFFSET ?",
+            (limit, offset)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Número de archivos y bytes indexados en disco y en el almacén de objetos"""
+        rows = self._query(
+            "SELECT COALESCE(SUM(local), 0) AS files, "
+            "COALESCE(SUM(CASE WHEN local = 1 THEN size ELSE 0 END), 0) AS bytes, "
+            "COUNT(remote_key) AS remote_files, "
+            "COALESCE(SUM(CASE WHEN remote_key IS NOT NULL THEN size ELSE 0 END), 0) AS remote_bytes "
+            "FROM downloads"
+        )
+        return rows[0]
@@ -0,0 +1,334 @@
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+from app.core.config import settings
+from app.core.state import state_store
+from app.services.downloader import downloader
+from app.services.progress import ProgressChannel
+from app.services.transcode import transcoder, PRIORITY_BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class JobQueueFullError(Exception):
+    """La cola de descargas no admite más trabajos"""
+
+
+class JobManager:
+    """Cola de trabajos de descarga atendida por un pool fijo de workers.
+
+    Cada proceso atiende su propia cola, pero el estado y el último progreso
+    de cada trabajo se guardan también en el store compartido: cualquier
+    worker puede consultarlo o seguirlo aunque lo ejecute otro.
+
+    El store es además el diario de trabajos: un trabajo se escribe antes de
+    encolarlo, a nombre del proceso (owner) que lo atiende, y cada proceso
+    mantiene un cerrojo de archivo propio mientras vive. Al arrancar se
+    retoman los trabajos sin terminar cuyo dueño ya no tiene el cerrojo
+    (murió o se detuvo); la descarga continúa desde los .part existentes.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retention_seconds: int, store=None,
+                 max_attempts: int = 3):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention_seconds = retention_seconds
+        self.store = store
+        self.max_attempts = max_attempts
+        self.owner = uuid.uuid4().hex
+        self._owner_lock = downloader.locks.named(f"owner-{self.owner}")
+        self._stopping = False
+        self.recovered_jobs = 0
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._channels: Dict[str, ProgressChannel] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Arrancar los workers (se llama al iniciar la aplicación)"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._owner_lock.acquire()
+        self._tasks = [
+            asyncio.create_task(self._worker(n)) for n in range(self.workers)
+        ]
+        logger.info(f"Cola de descargas iniciada con {self.workers} workers")
+        try:
+            await self._recover()
+        except Exception as e:
+            logger.error(f"Error retomando trabajos interrumpidos: {str(e)}")
+
+    async def stop(self):
+        """Detener los workers; los trabajos sin terminar quedan en el diario
+        para el próximo proceso que arranque"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._owner_lock.release()
+        self._owner_lock.path.unlink(missing_ok=True)
+
+    def _owner_alive(self, owner: Optional[str]) -> bool:
+        """Si el proceso dueño de un trabajo sigue vivo (tiene su cerrojo)"""
+        if owner is None:
+            return False
+        lock = downloader.locks.named(f"owner-{owner}")
+        if not lock.acquire(blocking=False):
+            return True
+        lock.release()
+        lock.path.unlink(missing_ok=True)
+        return False
+
+    async def _recover(self):
+        """Retomar los trabajos sin terminar de procesos que ya no existen"""
+        if self.store is None:
+            return
+        loop = asyncio.get_running_loop()
+        pending = await loop.run_in_executor(None, self.store.unfinished_jobs)
+        video_ids = set()
+        for job, owner in pending:
+            # Los que no caben se quedan en el diario para otro worker
+            if self._queue.full():
+                break
+            if owner == self.owner or self._owner_alive(owner):
+                continue
+            # Varios workers pueden arrancar a la vez: solo uno lo reclama
+            if not self.store.claim_job(job['job_id'], owner, self.owner):
+                continue
+            job['_attempts'] += 1
+            job['started_at'] = None
+            if job['_attempts'] > self.max_attempts:
+                job['status'] = JOB_FAILED
+                job['error'] = "Trabajo interrumpido demasiadas veces"
+                job['finished_at'] = datetime.now().isoformat()
+                job['_finished_ts'] = time.time()
+                self._save(job)
+                logger.warning(f"Trabajo {job['job_id']} descartado tras {self.max_attempts} reintentos")
+                continue
+            job['status'] = JOB_QUEUED
+            self._enqueue(job, {'job_id': job['job_id'], 'status': JOB_QUEUED, 'resumed': True})
+            self.recovered_jobs += 1
+            video_id = downloader.extract_video_id(job['url'])
+            if video_id:
+                video_ids.add(video_id)
+        if video_ids:
+            await loop.run_in_executor(None, downloader.touch_partial_files, video_ids)
+            logger.info(f"Retomados {len(video_ids)} videos de trabajos interrumpidos")
+
+    def submit(self, url: str, quality: str, user: str, audio_format: Optional[str] = None,
+               audio_bitrate: Optional[int] = None, priority: int = PRIORITY_BACKGROUND) -> Dict[str, Any]:
+        """Encolar un trabajo de descarga y devolverlo sin esperar.
+
+        Con audio_format el archivo descargado se convierte después en la
+        etapa de conversión, con la prioridad indicada.
+        """
+        if self._queue is None:
+            raise RuntimeError("La cola de descargas no está iniciada")
+        self._prune()
+
+        job_id = uuid.uuid4().hex
+        job = {
+            'job_id': job_id,
+            'status': JOB_QUEUED,
+            'url': url,
+            'quality': quality,
+            'audio_format': audio_format,
+            'audio_bitrate': audio_bitrate,
+            'user': user,
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            '_finished_ts': None,
+            '_priority': priority,
+            '_attempts': 0,
+        }
+        if self._queue.full():
+            raise JobQueueFullError("Cola de descargas llena")
+
+        # Primero el diario: un trabajo aceptado sobrevive a un reinicio
+        if self.store is not None:
+            self.store.save_job(job, self.owner)
+        self._enqueue(job, {'job_id': job_id, 'status': JOB_QUEUED})
+        return job
+
+    def _enqueue(self, job: Dict[str, Any], state: Dict[str, Any]):
+        """Registrar un trabajo en este proceso y ponerlo en la cola"""
+        job_id = job['job_id']
+        self.jobs[job_id] = job
+        self._events[job_id] = asyncio.Event()
+        channel = ProgressChannel(
+            asyncio.get_running_loop(),
+            settings.progress_interval,
+            on_publish=self._progress_saver(job_id)
+        )
+        channel.publish(state)
+        self._channels[job_id] = channel
+        self._queue.put_nowait(job_id)
+
+    def _progress_saver(self, job_id: str):
+        if self.store is None:
+            return None
+        return lambda state: self.store.save_job_progress(job_id, state)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Obtener un trabajo por su id (también si lo ejecuta otro worker)"""
+        job = self.jobs.get(job_id)
+        if job is None and self.store is not None:
+            stored = self.store.get_job(job_id)
+            if stored is not None:
+                job = stored[0]
+        return job
+
+    def progress(self, job_id: str) -> Optional[ProgressChannel]:
+        """Canal de progreso de un trabajo"""
+        return self._channels.get(job_id)
+
+    async def subscribe(self, job_id: str, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Cambios de progreso de un trabajo (None = keepalive).
+
+        Si el trabajo es de este proceso se usa su canal; si lo ejecuta otro
+        worker se consulta el store cada progress_interval segundos.
+        """
+        channel = self._channels.get(job_id)
+        if channel is not None:
+            async for state in channel.subscribe(keepalive):
+                yield state
+            return
+
+        seen = None
+        idle = 0.0
+        while self.store is not None:
+            stored = self.store.get_job(job_id)
+            if stored is None:
+                return
+            job, progress, updated_at = stored
+            if updated_at != seen:
+                seen, idle = updated_at, 0.0
+                yield progress
+            if job['status'] in (JOB_COMPLETED, JOB_FAILED):
+                return
+            await asyncio.sleep(settings.progress_interval)
+            idle += settings.progress_interval
+            if idle >= keepalive:
+                idle = 0.0
+                yield None
+
+    async def wait(self, job_id: str) -> Dict[str, Any]:
+        """Esperar a que un trabajo termine"""
+        event = self._events.get(job_id)
+        if event is not None:
+            await event.wait()
+        return self.jobs[job_id]
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self, n: int):
+        """Consumir trabajos de la cola de uno en uno"""
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]):
+        job['status'] = JOB_RUNNING
+        job['started_at'] = datetime.now().isoformat()
+        self._save(job)
+        channel = self._channels[job['job_id']]
+        channel.publish({'status': JOB_RUNNING})
+        interrupted = False
+        try:
+            result = await downloader.download_video(
+                job['url'], job['quality'], on_progress=channel.publish_threadsafe
+            )
+            if job['audio_format']:
+                # La descarga ya liberó su hilo: la conversión espera en su cola
+                channel.publish({'stage': 'transcoding', 'audio_format': job['audio_format']})
+                result = await transcoder.transcode(
+                    result['filename'], job['audio_format'], job['audio_bitrate'],
+                    priority=job['_priority']
+                )
+            job['result'] = result
+            job['status'] = JOB_COMPLETED
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Parada del servidor: el trabajo sigue "running" en el
+                # diario y lo retoma el próximo proceso que arranque
+                interrupted = True
+            else:
+                job['status'] = JOB_FAILED
+                job['error'] = "Trabajo cancelado"
+            raise
+        except Exception as e:
+            logger.error(f"Trabajo {job['job_id']} falló: {str(e)}")
+            job['status'] = JOB_FAILED
+            job['error'] = str(e)
+        finally:
+            if not interrupted:
+                self._finish(job, channel)
+
+    def _finish(self, job: Dict[str, Any], channel: ProgressChannel):
+        """Cerrar un trabajo terminado (bien o mal)"""
+        job['finished_at'] = datetime.now().isoformat()
+        job['_finished_ts'] = time.time()
+        channel.close({
+            'status': job['status'],
+            'stage': 'finished',
+            'filename': job['result']['filename'] if job['result'] else None,
+            'error': job['error'],
+        })
+        # Después del progreso final: quien sondea el store y ve el
+        # estado terminado ya tiene el último evento
+        self._save(job)
+        event = self._events.pop(job['job_id'], None)
+        if event is not None:
+            event.set()
+
+    def _save(self, job: Dict[str, Any]):
+        if self.store is None:
+            return
+        try:
+            self.store.save_job(job, self.owner)
+        except Exception as e:
+            logger.error(f"No se pudo guardar el trabajo {job['job_id']}: {str(e)}")
+
+    def _prune(self):
+        """Olvidar trabajos terminados hace más de retention_seconds"""
+        limit = time.time() - self.retention_seconds
+        if self.store is not None:
+            self.store.prune_jobs(limit)
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['_finished_ts'] is not None and job['_finished_ts'] < limit
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+            self._channels.pop(job_id, None)
+
+
+# Instancia global
+job_manager = JobManager(
+    workers=settings.download_workers,
+    queue_size=settings.job_queue_size,
+    retention_seconds=settings.job_retention_seconds,
+    store=state_store,
+    max_attempts=settings.job_max_attempts,
+)
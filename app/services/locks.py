@@ -0,0 +1,76 @@
+import os
+import asyncio
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: un único proceso, los cerrojos no hacen falta
+    fcntl = None
+
+
+class FileLock:
+    """Cerrojo exclusivo entre procesos (flock sobre un archivo).
+
+    El sistema operativo lo libera si el proceso muere. Cada instancia abre
+    su propio descriptor, así que dos instancias sobre el mismo archivo se
+    excluyen también dentro del mismo proceso.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def locked(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Tomar el cerrojo; sin blocking devuelve False si está ocupado"""
+        if fcntl is None:
+            self._fd = -1
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is not None and fd >= 0:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    async def acquire_async(self):
+        """Esperar el cerrojo en un hilo sin bloquear el event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(None, self.acquire)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # El hilo seguirá esperando: soltar el cerrojo en cuanto lo tome
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.release())
+            raise
+
+
+class KeyLocks:
+    """Cerrojos por (id de video, formato) en un directorio compartido"""
+
+    def __init__(self, lock_dir: Path):
+        self.lock_dir = lock_dir
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def for_key(self, key: Tuple[str, str]) -> FileLock:
+        video_id, fmt = key
+        safe_fmt = "".join(c if c.isalnum() else "_" for c in fmt)
+        return FileLock(self.lock_dir / f"{video_id}-{safe_fmt}.lock")
+
+    def named(self, name: str) -> FileLock:
+        return FileLock(self.lock_dir / f"{name}.lock")
@@ -0,0 +1,269 @@
+import math
+import time
+import asyncio
+import threading
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.core.config import settings
+from app.services.downloader import downloader, DownloadAborted
+from app.services.jobs import job_manager
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre comprobaciones de tráfico de usuarios durante una descarga anticipada
+YIELD_CHECK_INTERVAL = 0.5
+
+
+class CountMinSketch:
+    """Count-min sketch con decaimiento exponencial.
+
+    Cada suma pesa el doble que una hecha half_life segundos antes. En vez
+    de envejecer todos los contadores, las sumas nuevas se escalan por un
+    factor que crece con el tiempo y las estimaciones se dividen por él; al
+    hacerse grande se reescala la tabla entera.
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, half_life: float = 3600.0):
+        self.width = width
+        self.depth = depth
+        self._rate = math.log(2) / half_life
+        self._rows = [[0.0] * width for _ in range(depth)]
+        self._epoch = time.monotonic()
+
+    def _scale(self, now: float) -> float:
+        scale = math.exp(self._rate * (now - self._epoch))
+        if scale > 1e6:
+            for row in self._rows:
+                for i, value in enumerate(row):
+                    row[i] = value / scale
+            self._epoch, scale = now, 1.0
+        return scale
+
+    def _cells(self, key: str):
+        return [hash((n, key)) % self.width for n in range(self.depth)]
+
+    def add(self, key: str, count: float = 1.0) -> float:
+        """Sumar y devolver la estimación actualizada"""
+        now = time.monotonic()
+        scale = self._scale(now)
+        estimate = math.inf
+        for row, cell in zip(self._rows, self._cells(key)):
+            row[cell] += count * scale
+            estimate = min(estimate, row[cell])
+        return estimate / scale
+
+    def estimate(self, key: str) -> float:
+        """Cuenta decaída estimada (nunca por debajo de la real)"""
+        scale = self._scale(time.monotonic())
+        return min(row[cell] for row, cell in zip(self._rows, self._cells(key))) / scale
+
+
+class PopularityTracker:
+    """Popularidad reciente de los videos pedidos a /video/info y a las
+    descargas, y de las calidades descargadas.
+
+    El sketch cuenta todos los videos en memoria fija; solo se recuerda la
+    URL de los candidatos a más populares (unos pocos por cada top_k).
+    """
+
+    def __init__(self, top_k: int, half_life: float):
+        self.top_k = top_k
+        self.sketch = CountMinSketch(half_life=half_life)
+        self._candidates: Dict[str, str] = {}
+        self._qualities: set = set()
+
+    def record(self, url: str, quality: Optional[str] = None):
+        """Anotar una petición de un video (y la calidad, si es una descarga)"""
+        video_id = downloader.extract_video_id(url)
+        if not video_id:
+            return
+        self.sketch.add(video_id)
+        if quality is not None:
+            self.sketch.add(f"quality:{quality}")
+            self._qualities.add(quality)
+        self._candidates[video_id] = url
+        if len(self._candidates) > self.top_k * 4:
+            coldest = min(self._candidates, key=self.sketch.estimate)
+            del self._candidates[coldest]
+
+    def top(self, n: int, min_score: float = 0.0) -> List[Tuple[str, str, float]]:
+        """Videos más populares: (id, URL, puntuación)"""
+        scored = [
+            (video_id, url, self.sketch.estimate(video_id))
+            for video_id, url in self._candidates.items()
+        ]
+        scored.sort(key=lambda item: item[2], reverse=True)
+        return [item for item in scored[:n] if item[2] >= min_score]
+
+    def top_qualities(self, n: int) -> List[str]:
+        """Calidades más descargadas"""
+        return sorted(
+            self._qualities, key=lambda q: self.sketch.estimate(f"quality:{q}"), reverse=True
+        )[:n]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'candidates': len(self._candidates),
+            'top': [
+                {'video_id': video_id, 'score': round(score, 2)}
+                for video_id, _, score in self.top(self.top_k)
+            ],
+            'qualities': {
+                q: round(self.sketch.estimate(f"quality:{q}"), 2) for q in self.top_qualities(len(self._qualities))
+            },
+        }
+
+
+class Prefetcher:
+    """Trabajo de baja prioridad sobre los videos más populares.
+
+    Cada intervalo, si no hay tráfico de usuarios (descargas en curso o en
+    cola, extracciones esperando hilo), renueva la información de los top_k
+    videos antes de que caduque en el caché y descarga los que falten en las
+    calidades más pedidas, de uno en uno. Una descarga anticipada se corta
+    en cuanto llega trabajo de un usuario salvo que sea un usuario esperando
+    esa misma descarga: el event loop lo comprueba cada
+    YIELD_CHECK_INTERVAL segundos y activa un evento que el hook de progreso
+    (hilo de descarga) consulta en el siguiente bloque. El .part se conserva
+    y se retoma más tarde (o enseguida, si un usuario se sumó a la descarga
+    justo cuando se cortaba).
+
+    Con varios workers solo trabaja el que tiene el cerrojo "prefetch", con
+    la popularidad que ve su parte del tráfico.
+    """
+
+    def __init__(self, tracker: PopularityTracker, enabled: bool, interval: int, top_k: int,
+                 min_score: float, qualities: int, refresh_margin: int):
+        self.tracker = tracker
+        self.enabled = enabled
+        self.interval = interval
+        self.top_k = top_k
+        self.min_score = min_score
+        self.qualities = qualities
+        self.refresh_margin = refresh_margin
+        self._task: Optional[asyncio.Task] = None
+        self._leader = downloader.locks.named("prefetch")
+        # Lo activa el event loop y lo lee el hook de progreso
+        self._user_traffic = threading.Event()
+        self.refreshed = 0
+        self.downloaded = 0
+        self.yielded = 0
+        self.failed = 0
+
+    async def start(self):
+        if self.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._leader.release()
+
+    def user_busy(self, own_downloads: int = 0) -> bool:
+        """Si hay trabajo de usuarios en curso o esperando (own_downloads:
+        descargas propias, que hacen como mucho una extracción cada una).
+        Solo desde el event loop"""
+        return (
+            downloader.executor_queue_depths()['download'] > 0
+            or downloader.active_extractions > own_downloads
+            or job_manager.queue_depth > 0
+            or len(downloader.in_flight_keys()) > own_downloads
+        )
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if not self._leader.locked and not self._leader.acquire(blocking=False):
+                    continue
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error en prefetch: {str(e)}")
+
+    async def run_once(self):
+        """Una pasada: renovar información y descargar lo que falte"""
+        popular = self.tracker.top(self.top_k, self.min_score)
+        for video_id, url, _ in popular:
+            if self.user_busy():
+                return
+            remaining = downloader.info_cache.ttl_remaining(video_id)
+            if remaining is not None and remaining > self.refresh_margin:
+                continue
+            try:
+                await downloader.extract_info_async(url, refresh=True)
+                self.refreshed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Prefetch: no se pudo renovar {video_id}: {str(e)}")
+
+        for quality in self.tracker.top_qualities(self.qualities):
+            for video_id, url, _ in popular:
+                if self.user_busy():
+                    return
+                if downloader.has_download(url, quality):
+                    continue
+                await self._download(video_id, url, quality)
+
+    async def _watch_user_traffic(self, url: str, quality: str):
+        """Activar el evento de ceder mientras haya trabajo de usuarios y nadie
+        más espere esta descarga"""
+        while True:
+            if self.user_busy(own_downloads=1) and downloader.waiters(url, quality) <= 1:
+                self._user_traffic.set()
+            else:
+                self._user_traffic.clear()
+            await asyncio.sleep(YIELD_CHECK_INTERVAL)
+
+    async def _download(self, video_id: str, url: str, quality: str):
+        def on_progress(d):
+            # Hilo de descarga: solo lee el evento, el estado lo mira el event
+            # loop. Si un usuario ya espera esta descarga no se cede aunque el
+            # evento siga activo hasta la siguiente comprobación
+            if self._user_traffic.is_set() and downloader.waiters(url, quality) <= 1:
+                raise DownloadAborted("Prefetch interrumpido por tráfico de usuarios")
+
+        watcher = asyncio.create_task(self._watch_user_traffic(url, quality))
+        try:
+            await downloader.download_video(url, quality, on_progress=on_progress)
+            self.downloaded += 1
+            logger.info(f"Prefetch: {video_id} descargado en {quality}")
+        except DownloadAborted:
+            self.yielded += 1
+            logger.info(f"Prefetch: {video_id} cedido a peticiones de usuarios")
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Prefetch: no se pudo descargar {video_id}: {str(e)}")
+        finally:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+            self._user_traffic.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Popularidad y contadores del prefetch"""
+        return {
+            'enabled': self.enabled,
+            **self.tracker.stats(),
+            'refreshed': self.refreshed,
+            'downloaded': self.downloaded,
+            'yielded': self.yielded,
+            'failed': self.failed,
+        }
+
+
+# Instancias globales
+popularity_tracker = PopularityTracker(
+    top_k=settings.prefetch_top_k,
+    half_life=settings.prefetch_half_life,
+)
+prefetcher = Prefetcher(
+    popularity_tracker,
+    enabled=settings.prefetch_enabled,
+    interval=settings.prefetch_interval,
+    top_k=settings.prefetch_top_k,
+    min_score=settings.prefetch_min_score,
+    qualities=settings.prefetch_qualities,
+    refresh_margin=settings.prefetch_refresh_margin,
+)
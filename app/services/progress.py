@@ -0,0 +1,115 @@
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, Any, AsyncIterator, Callable
+
+
+def normalize_progress(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducir un evento de progress_hooks / postprocessor_hooks de yt-dlp a
+    los campos que se envían al cliente (sin el info_dict completo)"""
+    if 'postprocessor' in raw:
+        return {
+            'stage': 'postprocessing',
+            'postprocessor': raw.get('postprocessor'),
+            'postprocessor_status': raw.get('status'),
+        }
+
+    event = {
+        'stage': 'downloading' if raw.get('status') == 'downloading' else 'downloaded',
+        'downloaded_bytes': raw.get('downloaded_bytes'),
+        'total_bytes': raw.get('total_bytes') or raw.get('total_bytes_estimate'),
+        'speed': raw.get('speed'),
+        'eta': raw.get('eta'),
+    }
+    if raw.get('fragment_count') is not None:
+        event['fragment_index'] = raw.get('fragment_index')
+        event['fragment_count'] = raw.get('fragment_count')
+    return event
+
+
+class ProgressChannel:
+    """Estado de progreso de un trabajo con difusión a suscriptores.
+
+    Los hilos de descarga publican con publish_threadsafe: solo se guarda el
+    último evento y se programa como mucho una entrega al event loop cada
+    min_interval segundos, así que un flujo rápido de hooks no lo satura.
+    on_publish recibe cada estado entregado (p. ej. para guardarlo).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, min_interval: float,
+                 on_publish: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.min_interval = min_interval
+        self.on_publish = on_publish
+        self.state: Dict[str, Any] = {}
+        self.version = 0
+        self.closed = False
+        self._loop = loop
+        self._changed = asyncio.Event()
+        self._lock = threading.Lock()
+        self._pending: Optional[Dict[str, Any]] = None
+        self._scheduled = False
+        self._last_emit = 0.0
+
+    def publish_threadsafe(self, raw: Dict[str, Any]):
+        """Publicar un evento de yt-dlp desde el hilo de descarga"""
+        event = normalize_progress(raw)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.update(event)
+            else:
+                self._pending = event
+            if self._scheduled:
+                return
+            self._scheduled = True
+            delay = max(0.0, self._last_emit + self.min_interval - time.monotonic())
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, self._flush)
+
+    def _flush(self):
+        with self._lock:
+            event, self._pending = self._pending, None
+            self._scheduled = False
+            self._last_emit = time.monotonic()
+        if event:
+            self.publish(event)
+
+    def publish(self, event: Dict[str, Any]):
+        """Actualizar el estado desde el event loop y despertar suscriptores"""
+        self.state.update(event)
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+        if self.on_publish is not None:
+            try:
+                self.on_publish(dict(self.state))
+            except Exception:
+                # El progreso es informativo: un fallo al guardarlo no
+                # interrumpe la descarga
+                pass
+
+    def close(self, event: Optional[Dict[str, Any]] = None):
+        """Publicar el estado final; los suscriptores terminan tras recibirlo"""
+        # Entregar lo que quedara pendiente de los hilos antes del final
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending:
+            self.state.update(pending)
+        self.closed = True
+        self.publish(event or {})
+
+    async def subscribe(self, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Iterar sobre los cambios de estado (None = sin cambios, keepalive)"""
+        seen = -1
+        while True:
+            if self.version != seen:
+                seen = self.version
+                yield dict(self.state)
+            if self.closed and seen == self.version:
+                return
+            changed = self._changed
+            # Publicado mientras el suscriptor no leía: se entrega sin esperar
+            if self.version != seen:
+                continue
+            try:
+                await asyncio.wait_for(changed.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield None
@@ -0,0 +1,295 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+from collections import Counter
+from typing import Optional, Dict, Any, Set, Tuple, Iterator
+
+from app.core.config import settings
+from app.core.state import state_store
+from app.services.downloader import downloader, is_partial_file
+
+logger = logging.getLogger(__name__)
+
+# Intervalos de comprobación que dura un pin compartido sin renovarse: si el
+# proceso que lo puso muere, el archivo vuelve a poder desalojarse
+PIN_LEASE_INTERVALS = 4
+
+
+class StorageManager:
+    """Mantiene el directorio de descargas dentro de su presupuesto.
+
+    Cada intervalo comprueba el uso (bytes indexados más archivos sin indexar)
+    y el espacio libre del disco; si se supera STORAGE_MAX_BYTES o queda menos
+    de STORAGE_MIN_FREE_BYTES, borra primero los archivos sin indexar (no se
+    pueden servir) y después los indexados menos usados recientemente. Nunca
+    toca descargas en curso, archivos fijados (pin) ni archivos parciales.
+
+    Antes de borrar un archivo sin indexar se vuelve a comprobar en disco y
+    en el índice (el escaneo puede tener un intervalo de antigüedad): se
+    respeta si se indexó entretanto, si pertenece a un video que se está
+    descargando (intermedios .fNNN.ext de yt-dlp, archivos recién renombrados
+    que aún calculan su checksum) o si cambió hace menos de
+    STORAGE_UNTRACKED_GRACE segundos.
+
+    Los pins se guardan también en el estado compartido, con un plazo que
+    cada proceso renueva en cada intervalo, así que el desalojo respeta los
+    archivos que sirve cualquier worker.
+
+    Los parciales (.part, fragmentos) se conservan para retomar descargas
+    interrumpidas; el escaneo borra los que llevan más de PARTIAL_FILE_TTL
+    segundos sin cambios (una descarga activa los modifica continuamente).
+
+    El directorio se recorre con os.scandir por tandas de STORAGE_SCAN_BATCH
+    entradas en cada intervalo, en lugar de listarlo entero cada vez.
+
+    Con varios workers solo trabaja el que tiene el cerrojo "storage"; si
+    ese proceso muere, el cerrojo se libera y lo toma otro.
+    """
+
+    def __init__(self, max_bytes: int, min_free_bytes: int, interval: int, scan_batch: int,
+                 partial_ttl: int, untracked_grace: int, store=None):
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.interval = interval
+        self.scan_batch = scan_batch
+        self.partial_ttl = partial_ttl
+        self.untracked_grace = untracked_grace
+        self.store = store
+        self.download_dir = downloader.download_dir
+        self.owner = uuid.uuid4().hex
+        self._pins: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+        self._leader = downloader.locks.named("storage")
+        # Escaneo incremental: iterador en curso y resultados parcial y anterior
+        self._scan: Optional[Iterator[os.DirEntry]] = None
+        self._scanning: Dict[str, Tuple[int, float]] = {}
+        self._untracked: Dict[str, Tuple[int, float]] = {}
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.orphans_removed = 0
+        self.last_usage = 0
+        self.last_free = 0
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._leader.release()
+
+    @property
+    def pin_lease(self) -> float:
+        return self.interval * PIN_LEASE_INTERVALS
+
+    def pin(self, filename: str):
+        """Proteger un archivo del desalojo mientras se usa"""
+        self._pins[filename] += 1
+        if self._pins[filename] == 1 and self.store is not None:
+            self.store.pin_files(self.owner, [filename], time.time() + self.pin_lease)
+
+    def unpin(self, filename: str):
+        self._pins[filename] -= 1
+        if self._pins[filename] <= 0:
+            del self._pins[filename]
+            if self.store is not None:
+                self.store.unpin_file(self.owner, filename)
+
+    def protected(self) -> Set[str]:
+        """Archivos fijados en este momento por este o cualquier otro proceso"""
+        protected = set(self._pins)
+        if self.store is not None:
+            protected |= self.store.pinned_files()
+        return protected
+
+    def _renew_pins(self, filenames: Set[str]):
+        if filenames and self.store is not None:
+            self.store.pin_files(self.owner, list(filenames), time.time() + self.pin_lease)
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                # Todos los procesos renuevan sus pins, sean o no el que desaloja
+                await loop.run_in_executor(None, self._renew_pins, set(self._pins))
+                if not self._leader.locked and not self._leader.acquire(blocking=False):
+                    await asyncio.sleep(self.interval)
+                    continue
+                # Instantáneas tomadas en el event loop, donde cambian
+                protected = set(self._pins)
+                busy = downloader.in_flight_keys()
+                await loop.run_in_executor(None, self.run_once, protected, busy)
+            except Exception as e:
+                logger.error(f"Error en gestor de almacenamiento: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def run_once(self, protected: Set[str], busy: Set[Tuple[str, str]]):
+        """Avanzar el escaneo y desalojar hasta volver al presupuesto"""
+        self._scan_step()
+        usage = downloader.index.stats()['bytes'] + sum(size for size, _ in self._untracked.values())
+        free = shutil.disk_usage(self.download_dir).free
+        self.last_usage, self.last_free = usage, free
+
+        excess = max(0, usage - self.max_bytes) if self.max_bytes > 0 else 0
+        missing = max(0, self.min_free_bytes - free)
+        needed = max(excess, missing)
+        if needed <= 0:
+            return
+
+        # Pins de los demás workers
+        if self.store is not None:
+            protected = protected | self.store.pinned_files()
+        busy_ids = {video_id for video_id, _ in busy}
+
+        # Primero los archivos sin indexar, del más antiguo al más nuevo
+        for name in sorted(self._untracked, key=lambda name: self._untracked[name][1]):
+            if needed <= 0:
+                return
+            if name in protected:
+                continue
+            # Los nombres siguen la plantilla título-id-calidad...
+            if any(f'-{video_id}-' in name for video_id in busy_ids):
+                continue
+            size = self._evictable_size(name)
+            if size is None:
+                continue
+            if self._delete(self.download_dir / name, size):
+                del self._untracked[name]
+                needed -= size
+
+        # Después los indexados, del menos al más recientemente servido
+        offset = 0
+        while needed > 0:
+            batch = downloader.index.least_recently_used(limit=100, offset=offset)
+            if not batch:
+                break
+            for record in batch:
+                if needed <= 0:
+                    break
+                key = (record['video_id'], record['format'])
+                if record['filename'] in protected or key in busy:
+                    offset += 1
+                    continue
+                # Otro worker puede estar descargando la misma clave
+                lock = downloader.locks.for_key(key)
+                if not lock.acquire(blocking=False):
+                    offset += 1
+                    continue
+                try:
+                    if self._delete(record['filepath'], record['size']):
+                        # Con copia en el almacén de objetos la entrada se conserva
+                        if record['remote_key']:
+                            downloader.index.mark_remote(record['filename'], record['remote_key'])
+                        else:
+                            downloader.index.remove(record['filename'])
+                        needed -= record['size']
+                    else:
+                        offset += 1
+                finally:
+                    lock.release()
+
+    def _scan_step(self):
+        """Procesar hasta scan_batch entradas del directorio"""
+        if self._scan is None:
+            self._scan = os.scandir(self.download_dir)
+            self._scanning = {}
+        for _ in range(self.scan_batch):
+            try:
+                entry = next(self._scan)
+            except StopIteration:
+                self._scan.close()
+                self._scan = None
+                self._untracked = self._scanning
+                return
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if is_partial_file(entry.name):
+                self._collect_partial(entry)
+                continue
+            if downloader.index.get_by_filename(entry.name) is not None:
+                continue
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            self._scanning[entry.name] = (info.st_size, max(info.st_mtime, info.st_ctime))
+
+    def _evictable_size(self, name: str) -> Optional[int]:
+        """Tamaño actual de un archivo sin indexar del escaneo, o None si no
+        se puede desalojar (lo olvida si ya no existe o se indexó)"""
+        try:
+            info = os.stat(self.download_dir / name, follow_symlinks=False)
+        except FileNotFoundError:
+            del self._untracked[name]
+            return None
+        if downloader.index.get_by_filename(name) is not None:
+            del self._untracked[name]
+            return None
+        # yt-dlp pone como mtime la fecha del servidor; el renombrado al
+        # terminar sí cambia ctime
+        if time.time() - max(info.st_mtime, info.st_ctime) < self.untracked_grace:
+            return None
+        return info.st_size
+
+    def _collect_partial(self, entry: os.DirEntry):
+        """Borrar un archivo parcial huérfano"""
+        try:
+            info = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        if time.time() - info.st_mtime < self.partial_ttl:
+            return
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            logger.error(f"No se pudo borrar {entry.name}: {str(e)}")
+            return
+        self.orphans_removed += 1
+        logger.info(f"Parcial huérfano eliminado: {entry.name}")
+
+    def _delete(self, path, size: int) -> bool:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"No se pudo borrar {path}: {str(e)}")
+            return False
+        self.evictions += 1
+        self.evicted_bytes += size
+        self.last_usage -= size
+        logger.info(f"Archivo desalojado: {os.path.basename(str(path))}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso del disco y desalojos"""
+        return {
+            'usage_bytes': self.last_usage,
+            'max_bytes': self.max_bytes,
+            'free_bytes': self.last_free,
+            'min_free_bytes': self.min_free_bytes,
+            'untracked_files': len(self._untracked),
+            'pinned_files': len(self._pins),
+            'evictions': self.evictions,
+            'evicted_bytes': self.evicted_bytes,
+            'orphaned_partials_removed': self.orphans_removed,
+        }
+
+
+# Instancia global
+storage_manager = StorageManager(
+    max_bytes=settings.storage_max_bytes,
+    min_free_bytes=settings.storage_min_free_bytes,
+    interval=settings.storage_check_interval,
+    scan_batch=settings.storage_scan_batch,
+    partial_ttl=settings.partial_file_ttl,
+    untracked_grace=settings.storage_untracked_grace,
+    store=state_store,
+)
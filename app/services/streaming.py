@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator
+
+import anyio
+
+from app.core.config import settings
+from app.core.metrics import SERVED_BYTES
+from app.services.downloader import downloader
+from app.services.tiering import tiered_storage
+
+logger = logging.getLogger(__name__)
+
+
+class DownloadStream:
+    """Envía al cliente los bytes de una descarga mientras yt-dlp la escribe.
+
+    La descarga es la normal del downloader (se comparte con peticiones
+    idénticas y queda indexada en disco al terminar); aquí solo se lee el
+    archivo a medida que crece. Solo se lee un bloque cuando el cliente ha
+    consumido el anterior, así que el búfer en memoria es de un bloque.
+    """
+
+    chunk_size = 256 * 1024
+    poll_interval = 0.1
+
+    def __init__(self, url: str, quality: str):
+        self.url = url
+        self.quality = quality
+        self.path: Optional[str] = None
+        # Nombre final: yt-dlp renombra el .part al terminar
+        self.final_path: Optional[str] = None
+        self.filename: Optional[str] = None
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self) -> str:
+        """Lanzar la descarga y esperar a que exista el archivo a leer.
+
+        Devuelve el nombre final del archivo. Si la descarga falla antes de
+        escribir nada, propaga el error (aún se puede responder con un código
+        de error HTTP).
+        """
+        self._loop = asyncio.get_running_loop()
+        # Solo formatos de archivo único: uno que hay que unir no se puede
+        # leer mientras se descarga
+        self._task = asyncio.create_task(
+            downloader.download_video(
+                self.url, self.quality, on_progress=self._on_progress, single_file=True
+            )
+        )
+        self._task.add_done_callback(self._on_done)
+
+        await asyncio.wait_for(self._ready.wait(), settings.stream_start_timeout)
+        if self.path is None:
+            # Terminó sin pasar por los hooks: error o archivo ya descargado
+            artifact = await self._resolve()
+            self.path = artifact['filepath']
+            self.filename = artifact['filename']
+        return self.filename
+
+    async def _resolve(self) -> Dict[str, Any]:
+        """Archivo indexado de la descarga terminada (trayéndolo del almacén
+        de objetos si hace falta)"""
+        result = await self._task
+        artifact = downloader.get_artifact(result['filename'])
+        if artifact is None:
+            raise FileNotFoundError(result['filename'])
+        return await tiered_storage.ensure_local(artifact)
+
+    def _on_done(self, task: asyncio.Task):
+        # Marcar la excepción como recuperada aunque el cliente ya se haya ido
+        if not task.cancelled():
+            task.exception()
+        self._ready.set()
+
+    def _on_progress(self, progress: Dict[str, Any]):
+        """Hook de yt-dlp (hilo de descarga): anotar el archivo en escritura"""
+        if self.path is not None:
+            return
+        path = progress.get('tmpfilename') or progress.get('filename')
+        if not path:
+            return
+        self.path = path
+        self.final_path = progress.get('filename')
+        self.filename = Path(progress.get('filename') or path).name
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def _open(self):
+        """Abrir el archivo en escritura o, si yt-dlp ya lo renombró (descarga
+        corta o event loop ocupado), el final o el que quedó indexado"""
+        for path in (self.path, self.final_path):
+            if path is None:
+                continue
+            try:
+                file = await anyio.open_file(path, mode="rb")
+            except FileNotFoundError:
+                continue
+            self.path = path
+            return file
+        artifact = await self._resolve()
+        self.path = artifact['filepath']
+        return await anyio.open_file(self.path, mode="rb")
+
+    async def iter_bytes(self) -> AsyncIterator[bytes]:
+        """Leer el archivo mientras crece hasta que la descarga termina"""
+        # El descriptor abierto sigue siendo válido cuando yt-dlp renombra
+        # el .part al nombre final
+        file = await self._open()
+        try:
+            while True:
+                chunk = await file.read(self.chunk_size)
+                if chunk:
+                    SERVED_BYTES.inc(len(chunk), kind="stream")
+                    yield chunk
+                    continue
+                if self._task.done():
+                    # Vaciar lo escrito entre la última lectura y el final
+                    chunk = await file.read(self.chunk_size)
+                    if chunk:
+                        SERVED_BYTES.inc(len(chunk), kind="stream")
+                        yield chunk
+                        continue
+                    if self._task.exception() is not None:
+                        raise self._task.exception()
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            await file.aclose()
@@ -0,0 +1,301 @@
+import os
+import time
+import asyncio
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, Set, Tuple
+from urllib.parse import quote
+
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.services.downloader import downloader
+from app.services.storage import storage_manager
+
+logger = logging.getLogger(__name__)
+
+
+class ObjectStore:
+    """Cliente de un almacén compatible con S3 (AWS, MinIO...).
+
+    boto3 solo se importa al conectar, así que no hace falta instalarlo si
+    el almacén no está activado. Por encima de part_size las subidas y
+    bajadas se hacen por partes, con concurrency partes a la vez.
+    """
+
+    def __init__(self, endpoint_url: str, region: str, bucket: str, prefix: str,
+                 access_key: str, secret_key: str, part_size: int, concurrency: int):
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.bucket = bucket
+        self.prefix = prefix
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self._client = None
+        self._transfer = None
+
+    def connect(self):
+        """Crear el cliente (lanza ImportError si falta boto3)"""
+        if self._client is None:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            self._transfer = TransferConfig(
+                multipart_threshold=self.part_size,
+                multipart_chunksize=self.part_size,
+                max_concurrency=self.concurrency,
+            )
+            # Sin claves, boto3 usa sus credenciales por defecto (entorno, rol...)
+            self._client = boto3.client(
+                's3',
+                endpoint_url=self.endpoint_url or None,
+                region_name=self.region,
+                aws_access_key_id=self.access_key or None,
+                aws_secret_access_key=self.secret_key or None,
+            )
+        return self._client
+
+    def key_for(self, filename: str) -> str:
+        return f"{self.prefix}{filename}"
+
+    def upload(self, filepath: str, key: str, checksum: str):
+        """Subir un archivo (por partes si es grande)"""
+        self.connect().upload_file(
+            filepath, self.bucket, key,
+            Config=self._transfer,
+            ExtraArgs={
+                'ContentType': mimetypes.guess_type(filepath)[0] or 'application/octet-stream',
+                'Metadata': {'sha256': checksum},
+            }
+        )
+
+    def download(self, key: str, filepath: str):
+        """Bajar un objeto a un archivo local"""
+        self.connect().download_file(self.bucket, key, filepath, Config=self._transfer)
+
+    def presigned_url(self, key: str, filename: str, ttl: int) -> str:
+        """URL firmada de descarga, con el nombre de archivo para el cliente
+        (codificado como en ArtifactResponse si no es ASCII seguro)"""
+        quoted = quote(filename)
+        if quoted != filename:
+            disposition = f"attachment; filename*=utf-8''{quoted}"
+        else:
+            disposition = f'attachment; filename="{filename}"'
+        return self.connect().generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': key,
+                'ResponseContentDisposition': disposition,
+            },
+            ExpiresIn=ttl
+        )
+
+
+class TieredStorage:
+    """Archivos calientes en disco y fríos en el almacén de objetos.
+
+    Cada intervalo, el worker con el cerrojo "tiering" sube por partes los
+    archivos que llevan cold_after segundos sin usarse, los borra del disco y
+    deja su entrada en el índice con la clave del objeto. Esos archivos se
+    sirven con una redirección a una URL firmada, sin que sus bytes pasen por
+    la API. Si la conversión o el streaming necesitan uno en disco, se trae
+    de vuelta (y vuelve a estar caliente).
+    """
+
+    def __init__(self, store: ObjectStore, enabled: bool, cold_after: int, interval: int,
+                 url_ttl: int):
+        self.store = store
+        self.enabled = enabled
+        self.cold_after = cold_after
+        self.interval = interval
+        self.url_ttl = url_ttl
+        # Un hilo: las subidas van de una en una (cada una ya va por partes)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tiering")
+        self._task: Optional[asyncio.Task] = None
+        self._leader = downloader.locks.named("tiering")
+        self._fetches: Dict[str, asyncio.Future] = {}
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.fetched = 0
+        self.fetched_bytes = 0
+        self.redirects = 0
+        self.failed = 0
+
+    async def start(self):
+        if not self.enabled:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.store.connect)
+        except ImportError:
+            logger.error("OBJECT_STORE_ENABLED requiere boto3 (pip install boto3); almacén desactivado")
+            self.enabled = False
+            return
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Almacén de objetos activado: {self.store.bucket}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._leader.release()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                if not self._leader.locked and not self._leader.acquire(blocking=False):
+                    await asyncio.sleep(self.interval)
+                    continue
+                # Instantáneas tomadas en el event loop, donde cambian
+                protected = storage_manager.protected()
+                busy = downloader.in_flight_keys()
+                await loop.run_in_executor(self._executor, self.offload_once, protected, busy)
+            except Exception as e:
+                logger.error(f"Error moviendo archivos al almacén de objetos: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def offload_once(self, protected: Set[str], busy: Set[Tuple[str, str]]) -> int:
+        """Mover al almacén los archivos fríos; devuelve cuántos se movieron"""
+        moved = 0
+        cutoff = time.time() - self.cold_after
+        for record in downloader.index.offload_candidates(cutoff):
+            key = (record['video_id'], record['format'])
+            if record['filename'] in protected or key in busy:
+                continue
+            # Otro worker puede estar descargando o trayendo la misma clave
+            lock = downloader.locks.for_key(key)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                if self._offload(record):
+                    moved += 1
+            finally:
+                lock.release()
+        return moved
+
+    def _offload(self, record: Dict[str, Any]) -> bool:
+        filename = record['filename']
+        remote_key = record['remote_key']
+        if remote_key is None:
+            remote_key = self.store.key_for(filename)
+            start = time.perf_counter()
+            try:
+                self.store.upload(record['filepath'], remote_key, record['checksum'])
+            except FileNotFoundError:
+                return False
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error subiendo {filename}: {str(e)}")
+                return False
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage='offload')
+            self.uploaded += 1
+            self.uploaded_bytes += record['size']
+
+        # Si se usó mientras se subía sigue caliente: se conserva en disco
+        current = downloader.index.get_by_filename(filename)
+        if current is None:
+            return False
+        if current['last_access'] != record['last_access']:
+            downloader.index.mark_remote(filename, remote_key, keep_local=True)
+            return False
+        # Primero el índice: desde aquí se sirve con la URL firmada
+        downloader.index.mark_remote(filename, remote_key)
+        try:
+            os.unlink(record['filepath'])
+        except FileNotFoundError:
+            pass
+        logger.info(f"Archivo movido al almacén de objetos: {filename}")
+        return True
+
+    async def presigned_url(self, record: Dict[str, Any]) -> str:
+        """URL firmada para servir un archivo que solo está en el almacén"""
+        if not self.enabled:
+            raise FileNotFoundError(record['filename'])
+        url = await asyncio.get_running_loop().run_in_executor(
+            None, self.store.presigned_url, record['remote_key'], record['filename'], self.url_ttl
+        )
+        self.redirects += 1
+        return url
+
+    async def ensure_local(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Devolver el registro de un archivo que está en disco, trayéndolo
+        del almacén si hace falta (una sola vez aunque lo pidan varios)"""
+        if record['local']:
+            return record
+        if not self.enabled:
+            raise FileNotFoundError(record['filename'])
+        filename = record['filename']
+        future = self._fetches.get(filename)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(record))
+            self._fetches[filename] = future
+            future.add_done_callback(lambda f: self._fetches.pop(filename, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        lock = downloader.locks.for_key((record['video_id'], record['format']))
+        await lock.acquire_async()
+        try:
+            # Otro worker pudo traerlo mientras se esperaba el cerrojo
+            current = downloader.index.get_by_filename(record['filename'])
+            if current is not None and current['local'] and Path(current['filepath']).is_file():
+                return current
+            await asyncio.get_running_loop().run_in_executor(None, self._download, record)
+            return downloader.index.get_by_filename(record['filename']) or record
+        finally:
+            lock.release()
+
+    def _download(self, record: Dict[str, Any]):
+        """Bajar el objeto junto a su ruta original (con .part hasta terminar)"""
+        target = Path(record['filepath'])
+        partial = target.with_name(target.name + '.part')
+        start = time.perf_counter()
+        try:
+            self.store.download(record['remote_key'], str(partial))
+            os.replace(partial, target)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='fetch')
+        downloader.index.mark_local(record['filename'])
+        self.fetched += 1
+        self.fetched_bytes += record['size']
+        logger.info(f"Archivo traído del almacén de objetos: {record['filename']}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del almacén de objetos"""
+        return {
+            'enabled': self.enabled,
+            'bucket': self.store.bucket if self.enabled else None,
+            'cold_after_seconds': self.cold_after,
+            'uploaded': self.uploaded,
+            'uploaded_bytes': self.uploaded_bytes,
+            'fetched': self.fetched,
+            'fetched_bytes': self.fetched_bytes,
+            'redirects': self.redirects,
+            'failed': self.failed,
+        }
+
+
+# Instancia global
+tiered_storage = TieredStorage(
+    store=ObjectStore(
+        endpoint_url=settings.object_store_endpoint_url,
+        region=settings.object_store_region,
+        bucket=settings.object_store_bucket,
+        prefix=settings.object_store_prefix,
+        access_key=settings.object_store_access_key,
+        secret_key=settings.object_store_secret_key,
+        part_size=settings.object_store_part_size,
+        concurrency=settings.object_store_concurrency,
+    ),
+    enabled=settings.object_store_enabled,
+    cold_after=settings.object_store_cold_after,
+    interval=settings.object_store_check_interval,
+    url_ttl=settings.object_store_url_ttl,
+)
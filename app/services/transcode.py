@@ -0,0 +1,224 @@
+import os
+import time
+import asyncio
+import itertools
+import shutil
+import logging
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.services.downloader import downloader
+from app.services.formats import ffmpeg_available
+from app.services.storage import storage_manager
+from app.services.tiering import tiered_storage
+
+logger = logging.getLogger(__name__)
+
+# Códecs de salida: extensión, argumentos de ffmpeg y bitrate por defecto (kbps)
+AUDIO_FORMATS = {
+    'mp3': {'ext': 'mp3', 'args': ['-c:a', 'libmp3lame'], 'bitrate': 192},
+    'opus': {'ext': 'opus', 'args': ['-c:a', 'libopus'], 'bitrate': 128},
+    'm4a': {'ext': 'm4a', 'args': ['-c:a', 'aac'], 'bitrate': 160},
+}
+MIN_AUDIO_BITRATE = 32
+MAX_AUDIO_BITRATE = 320
+
+# Prioridades (menor = antes). También suben el nice del proceso ffmpeg
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+# Sin nice(1) (p. ej. en Windows) ffmpeg se ejecuta con la prioridad normal
+NICE_BINARY = shutil.which('nice')
+
+
+class TranscodeError(Exception):
+    """ffmpeg no pudo convertir el archivo"""
+
+
+class Transcoder:
+    """Etapa de conversión de audio separada de las descargas.
+
+    Las conversiones esperan en una cola con prioridad y las atiende un
+    número fijo de procesos ffmpeg (uno por núcleo por defecto), con nice
+    según la prioridad: un hilo de descarga nunca se queda ocupado
+    codificando. Los resultados se indexan como un archivo más, con la clave
+    (checksum del original, códec, bitrate), así que se reutilizan, se
+    sirven y se desalojan igual que las descargas.
+    """
+
+    def __init__(self, workers: int, nice: int):
+        self.workers = workers
+        self.nice = nice
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcode")
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._order = itertools.count()
+        self.running = 0
+        self.completed = 0
+        self.cache_hits = 0
+        self.failed = 0
+
+    async def start(self):
+        """Arrancar los workers (se llama al iniciar la aplicación)"""
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Detener los workers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def cache_key(self, source: Dict[str, Any], audio_format: str, bitrate: int) -> Tuple[str, str]:
+        """Clave en el índice del archivo convertido"""
+        return source['video_id'], f"transcode:{source['checksum'][:16]}:{audio_format}:{bitrate}"
+
+    async def transcode(self, filename: str, audio_format: str, bitrate: Optional[int] = None,
+                        priority: int = PRIORITY_INTERACTIVE) -> Dict[str, Any]:
+        """Convertir un archivo descargado; devuelve el resultado como una
+        descarga (mismos campos que download_video)"""
+        if self._queue is None:
+            raise RuntimeError("La cola de conversión no está iniciada")
+        if not ffmpeg_available():
+            raise TranscodeError("ffmpeg no está instalado")
+        source = downloader.get_artifact(filename)
+        if source is None:
+            raise TranscodeError(f"Archivo no encontrado: {filename}")
+        # ffmpeg lee del disco: si el original está en el almacén se trae
+        source = await tiered_storage.ensure_local(source)
+        bitrate = bitrate or AUDIO_FORMATS[audio_format]['bitrate']
+        key = self.cache_key(source, audio_format, bitrate)
+
+        result = downloader.completed_download(key)
+        if result is not None:
+            self.cache_hits += 1
+            return dict(result)
+
+        # Conversión idéntica en curso: se espera a la misma
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            future.add_done_callback(lambda f: self._inflight.pop(key, None))
+            self._queue.put_nowait((priority, next(self._order), key, source, audio_format, bitrate, future))
+        return dict(await asyncio.shield(future))
+
+    async def _worker(self):
+        while True:
+            priority, _, key, source, audio_format, bitrate, future = await self._queue.get()
+            try:
+                if future.done():
+                    continue
+                try:
+                    result = await self._run(priority, key, source, audio_format, bitrate)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, priority: int, key: Tuple[str, str], source: Dict[str, Any],
+                   audio_format: str, bitrate: int) -> Dict[str, Any]:
+        # Cerrojo entre procesos, como las descargas: otro worker puede
+        # estar haciendo la misma conversión
+        lock = downloader.locks.for_key(key)
+        await lock.acquire_async()
+        # El original no se desaloja mientras se lee
+        storage_manager.pin(source['filename'])
+        self.running += 1
+        try:
+            result = downloader.completed_download(key)
+            if result is not None:
+                self.cache_hits += 1
+                return result
+            loop = asyncio.get_running_loop()
+            record = await loop.run_in_executor(
+                self._executor, self._convert, key, source, audio_format, bitrate, priority
+            )
+            self.completed += 1
+            return downloader.result_from_record(record)
+        finally:
+            self.running -= 1
+            storage_manager.unpin(source['filename'])
+            lock.release()
+
+    def _convert(self, key: Tuple[str, str], source: Dict[str, Any], audio_format: str,
+                 bitrate: int, priority: int) -> Dict[str, Any]:
+        """Ejecutar ffmpeg (en un hilo del pool) e indexar el resultado"""
+        spec = AUDIO_FORMATS[audio_format]
+        stem = Path(source['filename']).stem
+        target = downloader.download_dir / f"{stem}-{bitrate}k.{spec['ext']}"
+        # Nombre temporal con .part: la limpieza y el desalojo no lo tocan
+        partial = target.with_name(target.name + '.part')
+        command = [
+            'ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', source['filepath'], '-vn', *spec['args'], '-b:a', f'{bitrate}k',
+            '-f', 'ipod' if spec['ext'] == 'm4a' else spec['ext'], str(partial),
+        ]
+        # nice(1) en lugar de os.nice en preexec_fn, que no es seguro entre
+        # fork y exec en un proceso con varios hilos
+        nice = self.nice + priority
+        if nice and NICE_BINARY is not None:
+            command = [NICE_BINARY, '-n', str(nice), *command]
+
+        start = time.perf_counter()
+        try:
+            completed = subprocess.run(command, capture_output=True)
+            if completed.returncode != 0:
+                error = completed.stderr.decode(errors='replace').strip().splitlines()
+                raise TranscodeError(error[-1] if error else f"ffmpeg terminó con código {completed.returncode}")
+            os.replace(partial, target)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage='transcode')
+
+        record = {
+            'video_id': key[0],
+            'format': key[1],
+            'filename': target.name,
+            'filepath': str(target.resolve()),
+            'size': os.path.getsize(target),
+            'checksum': downloader.file_checksum(str(target)),
+            'title': source['title'],
+            'duration': source['duration'],
+            'uploader': source['uploader'],
+        }
+        downloader.index.add(record)
+        logger.info(f"Convertido a {audio_format} {bitrate}k: {target.name}")
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de la etapa de conversión"""
+        return {
+            'workers': self.workers,
+            'queued': self.queue_depth,
+            'running': self.running,
+            'completed': self.completed,
+            'cache_hits': self.cache_hits,
+            'failed': self.failed,
+            'ffmpeg': ffmpeg_available(),
+        }
+
+
+# Instancia global
+transcoder = Transcoder(
+    workers=settings.transcode_workers,
+    nice=settings.transcode_nice,
+)
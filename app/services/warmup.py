@@ -0,0 +1,71 @@
+import time
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+from app.core.users import user_store
+from app.services.downloader import downloader
+
+logger = logging.getLogger(__name__)
+
+
+def _load_jwt():
+    from jose import jwt  # noqa: F401
+
+
+class Warmup:
+    """Calentamiento en segundo plano tras el arranque.
+
+    La aplicación acepta conexiones en cuanto se importa; lo que es lento la
+    primera vez (yt-dlp y su extractor, passlib y los hashes de usuarios,
+    jose) se carga después en un hilo. /health responde desde el principio
+    (liveness) y /ready solo cuando el calentamiento ha terminado.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _plan(self) -> List[Tuple[str, Callable[[], Any]]]:
+        return [
+            ("users", user_store.users),
+            ("jwt", _load_jwt),
+            ("yt_dlp", downloader.warm_up),
+        ]
+
+    def start(self):
+        """Lanzar el calentamiento sin esperarlo"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        for name, step in self._plan():
+            start = time.perf_counter()
+            try:
+                await loop.run_in_executor(None, step)
+            except Exception as e:
+                self.error = f"{name}: {str(e)}"
+                logger.error(f"Error en el calentamiento ({name}): {str(e)}")
+                return
+            self.steps[name] = round((time.perf_counter() - start) * 1000, 1)
+        self.ready = True
+        logger.info(f"Calentamiento completado: {self.steps}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'status': 'ready' if self.ready else ('failed' if self.error else 'warming_up'),
+            'warmup_ms': dict(self.steps),
+            'error': self.error,
+        }
+
+
+# Instancia global
+warmup = Warmup()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de extracción: hilos frente a pool de procesos
+
+Lanza extracciones (sin caché) con 1, 4 y 16 trabajos concurrentes en cada
+motor y mide la latencia, el throughput y el retraso del event loop mientras
+tanto (con hilos, el Python de yt-dlp compite por el GIL con el loop).
+
+Necesita red para las URLs de YouTube; cualquier URL que yt-dlp sepa extraer
+sirve (p. ej. una página local con un <video> para una prueba sin red).
+
+    python benchmarks/bench_engine.py --jobs 32 --url https://www.youtube.com/watch?v=VIDEO_ID
+"""
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DEFAULT_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def thread_extract(url: str, socket_timeout: int):
+    import yt_dlp
+    from app.services.extraction import extract_raw, ydl_options
+    with yt_dlp.YoutubeDL(ydl_options(socket_timeout)) as ydl:
+        return extract_raw(ydl, url)
+
+async def measure(engine: str, urls, jobs: int, concurrency: int, socket_timeout: int):
+    from app.services.extraction import ProcessExtractor
+
+    threads = ThreadPoolExecutor(max_workers=concurrency)
+    extractor = None
+    if engine == "process":
+        extractor = ProcessExtractor(concurrency, max_tasks_per_child=0, socket_timeout=socket_timeout)
+        call = extractor.extract
+    else:
+        call = lambda url: thread_extract(url, socket_timeout)
+
+    loop = asyncio.get_running_loop()
+    try:
+        # Calentamiento: arranque de procesos e imports fuera de la medición
+        await asyncio.gather(*[
+            loop.run_in_executor(threads, call, urls[n % len(urls)]) for n in range(concurrency)
+        ])
+
+        latencies = []
+        lags = []
+        done = asyncio.Event()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(n: int):
+            async with semaphore:
+                start = time.perf_counter()
+                await loop.run_in_executor(threads, call, urls[n % len(urls)])
+                latencies.append(time.perf_counter() - start)
+
+        async def probe():
+            # Retraso del event loop: cuánto se pasa un sleep de 10 ms
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - start - 0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*[one(n) for n in range(jobs)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+    finally:
+        threads.shutdown(wait=False)
+        if extractor is not None:
+            extractor.shutdown()
+    return latencies, lags, elapsed
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark del motor de extracción")
+    parser.add_argument("--url", action="append", help="URL a extraer (repetible)")
+    parser.add_argument("--jobs", type=int, default=32, help="Extracciones por medición")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--engine", choices=["thread", "process"], nargs="+", default=["thread", "process"])
+    parser.add_argument("--socket-timeout", type=int, default=30)
+    args = parser.parse_args()
+    urls = args.url or [DEFAULT_URL]
+
+    print("⚙️  Benchmark del motor de extracción")
+    print("=" * 72)
+    print(f"{'Motor':<8} {'Conc.':>5} {'Extr./s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Loop p95 ms':>12}")
+    for concurrency in args.concurrency:
+        for engine in args.engine:
+            latencies, lags, elapsed = asyncio.run(
+                measure(engine, urls, args.jobs, concurrency, args.socket_timeout)
+            )
+            print(
+                f"{engine:<8} {concurrency:>5} {args.jobs / elapsed:>8.1f} "
+                f"{statistics.median(latencies) * 1000:>8.1f} "
+                f"{percentile(latencies, 95) * 1000:>8.1f} "
+                f"{percentile(latencies, 99) * 1000:>8.1f} "
+                f"{percentile(lags, 95) * 1000 if lags else 0.0:>12.1f}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de login: latencia de /auth/login en proceso (sin servidor)
+
+Mide p50/p95/p99 con N logins concurrentes y, a la vez, la latencia de
+/health para comprobar que bcrypt no bloquea el event loop. Sale con código 1
+si el p95 del login supera el presupuesto, para usarlo en CI.
+
+    python benchmarks/bench_login.py --requests 40 --concurrency 2 --budget-ms 1000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run(requests_total: int, concurrency: int):
+    import httpx
+    from app.main import app
+    from app.core.config import settings
+    
+    latencies = []
+    health_latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    credentials = {"username": settings.api_username, "password": settings.api_password}
+    
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login():
+                async with semaphore:
+                    start = time.perf_counter()
+                    response = await client.post("/auth/login", json=credentials)
+                    latencies.append(time.perf_counter() - start)
+                    assert response.status_code == 200, response.text
+            
+            async def health(done: asyncio.Event):
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await client.get("/health")
+                    health_latencies.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.05)
+            
+            # Un login de calentamiento fuera de la medición
+            await client.post("/auth/login", json=credentials)
+            done = asyncio.Event()
+            probe = asyncio.create_task(health(done))
+            start = time.perf_counter()
+            await asyncio.gather(*[login() for _ in range(requests_total)])
+            elapsed = time.perf_counter() - start
+            done.set()
+            await probe
+    return latencies, health_latencies, elapsed
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de /auth/login")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("LOGIN_P95_BUDGET_MS", 1000)))
+    args = parser.parse_args()
+    
+    # El rate limit por defecto cortaría el benchmark
+    os.environ.setdefault("RATE_LIMIT_REQUESTS", "100000")
+    
+    latencies, health_latencies, elapsed = asyncio.run(run(args.requests, args.concurrency))
+    p95 = percentile(latencies, 95) * 1000
+    print("🔐 Benchmark de login")
+    print("=" * 40)
+    print(f"Peticiones:   {args.requests} (concurrencia {args.concurrency})")
+    print(f"Throughput:   {args.requests / elapsed:.1f} logins/s")
+    print(f"p50:          {statistics.median(latencies) * 1000:.1f} ms")
+    print(f"p95:          {p95:.1f} ms")
+    print(f"p99:          {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"/health p95:  {percentile(health_latencies, 95) * 1000:.1f} ms (durante los logins)")
+    print(f"Presupuesto:  p95 <= {args.budget_ms:.0f} ms")
+    
+    if p95 > args.budget_ms:
+        print("✗ Presupuesto de latencia superado")
+        sys.exit(1)
+    print("✓ Dentro del presupuesto")
+
+if __name__ == "__main__":
+    main()
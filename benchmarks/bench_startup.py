@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque: importación de la aplicación y tiempo hasta servir
+
+Mide en procesos nuevos (mediana de N repeticiones):
+  - import:  tiempo de `import app.main`
+  - health:  desde lanzar uvicorn hasta el primer 200 de /health (liveness)
+  - ready:   desde lanzar uvicorn hasta el primer 200 de /ready (calentamiento)
+
+Sale con código 1 si la importación o el tiempo hasta /health superan su
+presupuesto, para detectar regresiones en CI (p. ej. un import pesado nuevo
+en el camino de arranque).
+
+    python benchmarks/bench_startup.py --runs 5 --import-budget-ms 800 --health-budget-ms 2500
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - start)"
+)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def measure_import() -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return False
+
+def measure_serving(timeout: float):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + timeout
+        if not wait_for(f"http://127.0.0.1:{port}/health", deadline):
+            raise RuntimeError("El servidor no respondió a /health")
+        health = time.perf_counter() - start
+        if not wait_for(f"http://127.0.0.1:{port}/ready", deadline):
+            raise RuntimeError("El servidor no llegó a estar listo (/ready)")
+        ready = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return health, ready
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de arranque")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--import-budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 800)))
+    parser.add_argument("--health-budget-ms", type=float,
+                        default=float(os.getenv("STARTUP_HEALTH_BUDGET_MS", 2500)))
+    args = parser.parse_args()
+
+    # El rate limit por defecto podría cortar el sondeo de /health
+    os.environ.setdefault("RATE_LIMIT_REQUESTS", "100000")
+
+    imports = [measure_import() for _ in range(args.runs)]
+    serving = [measure_serving(args.timeout) for _ in range(args.runs)]
+    import_ms = statistics.median(imports) * 1000
+    health_ms = statistics.median(health for health, _ in serving) * 1000
+    ready_ms = statistics.median(ready for _, ready in serving) * 1000
+
+    print("⏱️  Benchmark de arranque")
+    print("=" * 40)
+    print(f"Repeticiones:     {args.runs}")
+    print(f"import app.main:  {import_ms:.0f} ms (presupuesto {args.import_budget_ms:.0f} ms)")
+    print(f"Hasta /health:    {health_ms:.0f} ms (presupuesto {args.health_budget_ms:.0f} ms)")
+    print(f"Hasta /ready:     {ready_ms:.0f} ms")
+
+    failed = False
+    if import_ms > args.import_budget_ms:
+        print("✗ La importación supera el presupuesto")
+        failed = True
+    if health_ms > args.health_budget_ms:
+        print("✗ El tiempo hasta /health supera el presupuesto")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✓ Dentro del presupuesto")
+
+if __name__ == "__main__":
+    main()
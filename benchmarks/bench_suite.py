@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks sin red: auth, info, descarga y servicio de archivos
+
+Usa el sustituto local de YouTube (fake_youtube.py) y la aplicación ASGI en
+proceso con httpx, con la concurrencia indicada. Para cada escenario mide
+latencia p50/p95/p99, throughput y bytes/s, y guarda los resultados en JSON
+para poder comparar ejecuciones entre commits.
+
+Escenarios:
+  - auth:     POST /auth/login
+  - info:     POST /video/info con videos distintos (sin caché)
+  - download: POST /video/download con videos distintos (descarga completa)
+  - file:     GET /video/download/{filename} de los archivos ya descargados
+
+    python benchmarks/bench_suite.py --requests 50 --concurrency 8 --media-mb 4
+    python benchmarks/bench_suite.py --scenario info download --output results.json
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCENARIOS = ["auth", "info", "download", "file"]
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summarize(latencies, elapsed, total_bytes, errors, first_error=None):
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "first_error": first_error,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "bytes": total_bytes,
+        "bytes_per_s": round(total_bytes / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+async def drive(requests_total, concurrency, call):
+    """Ejecutar call(n) requests_total veces con la concurrencia dada.
+    call devuelve los bytes transferidos o lanza una excepción"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    counters = {"bytes": 0, "errors": 0, "first_error": None}
+
+    async def one(n):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                counters["bytes"] += await call(n)
+            except Exception as e:
+                counters["errors"] += 1
+                counters["first_error"] = counters["first_error"] or repr(e)
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(n) for n in range(requests_total)])
+    elapsed = time.perf_counter() - start
+    return summarize(latencies, elapsed, counters["bytes"], counters["errors"], counters["first_error"])
+
+async def run(args, fake):
+    import httpx
+    from app.main import app
+    from app.core.config import settings
+    from app.services.warmup import warmup
+
+    credentials = {"username": settings.api_username, "password": settings.api_password}
+    results = {}
+    filenames = []
+
+    async with app.router.lifespan_context(app):
+        # Medir con el servidor ya caliente, como una réplica en servicio
+        while not warmup.ready:
+            if warmup.error:
+                raise RuntimeError(warmup.error)
+            await asyncio.sleep(0.05)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            response = await client.post("/auth/login", json=credentials)
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            async def auth(n):
+                response = await client.post("/auth/login", json=credentials)
+                response.raise_for_status()
+                return len(response.content)
+
+            async def info(n):
+                response = await client.post(
+                    "/video/info", json={"url": fake.video_url(n)}, headers=headers
+                )
+                response.raise_for_status()
+                return len(response.content)
+
+            async def download(n):
+                response = await client.post(
+                    "/video/download",
+                    json={"url": fake.video_url(args.requests + n), "quality": args.quality},
+                    headers=headers
+                )
+                response.raise_for_status()
+                filenames.append(response.json()["filename"])
+                # La respuesta no incluye el tamaño: es el del video simulado
+                return fake.media_bytes
+
+            async def serve(n):
+                if not filenames:
+                    raise RuntimeError("No hay archivos descargados")
+                response = await client.get(
+                    f"/video/download/{filenames[n % len(filenames)]}", headers=headers
+                )
+                response.raise_for_status()
+                return len(response.content)
+
+            calls = {"auth": auth, "info": info, "download": download, "file": serve}
+            for scenario in SCENARIOS:
+                if scenario not in args.scenario:
+                    continue
+                if scenario == "file" and not filenames:
+                    # Archivos que servir aunque no se haya medido la descarga
+                    await drive(min(args.requests, args.concurrency), args.concurrency, download)
+                results[scenario] = await drive(args.requests, args.concurrency, calls[scenario])
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Suite de benchmarks sin red")
+    parser.add_argument("--requests", type=int, default=50, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--media-mb", type=float, default=4, help="Tamaño del video simulado")
+    parser.add_argument("--quality", default="best")
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--output", help="Archivo JSON de resultados "
+                        "(por defecto benchmarks/results/<fecha>-<commit>.json)")
+    args = parser.parse_args()
+
+    # Datos aislados en un directorio temporal; sin rate limit y con hilos
+    # (el extractor simulado solo existe en este proceso)
+    workdir = Path(tempfile.mkdtemp(prefix="bench-suite-"))
+    os.environ.update({
+        "DOWNLOAD_DIR": str(workdir / "downloads"),
+        "INDEX_DB_PATH": str(workdir / "downloads.db"),
+        "STATE_DB_PATH": str(workdir / "state.db"),
+        "USERS_FILE": str(workdir / "users.json"),
+        "RATE_LIMIT_REQUESTS": "1000000",
+        "RATE_LIMIT_STORAGE_URI": "memory://",
+        "EXTRACT_ENGINE": "thread",
+        "STORAGE_MAX_BYTES": "0",
+        "STORAGE_MIN_FREE_BYTES": "0",
+    })
+
+    from fake_youtube import FakeYouTube
+    try:
+        with FakeYouTube(media_bytes=int(args.media_mb * 1024 * 1024), root=str(workdir / "media")) as fake:
+            results = asyncio.run(run(args, fake))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "media_bytes": int(args.media_mb * 1024 * 1024),
+            "quality": args.quality,
+        },
+        "results": results,
+    }
+
+    print("📈 Suite de benchmarks (sin red)")
+    print("=" * 78)
+    print(f"{'Escenario':<10} {'Pet.':>5} {'Err.':>5} {'Pet./s':>8} {'MB/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for scenario, result in results.items():
+        print(
+            f"{scenario:<10} {result['requests']:>5} {result['errors']:>5} "
+            f"{result['throughput_rps']:>8.1f} {result['bytes_per_s'] / 1024 / 1024:>8.1f} "
+            f"{result['p50_ms'] or 0:>9.1f} {result['p95_ms'] or 0:>9.1f} {result['p99_ms'] or 0:>9.1f}"
+        )
+
+    output = Path(args.output) if args.output else (
+        ROOT / "benchmarks" / "results"
+        / f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'local'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"\nResultados guardados en {output}")
+
+if __name__ == "__main__":
+    main()
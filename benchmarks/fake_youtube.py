@@ -0,0 +1,124 @@
+"""
+Sustituto local de YouTube para benchmarks sin red
+
+Sirve un archivo de medios generado desde un servidor HTTP en 127.0.0.1 y
+reemplaza la extracción del extractor de YouTube de yt-dlp por un info dict
+cuyos formatos apuntan a ese servidor. El resto de yt-dlp (selección de
+formatos, descarga HTTP, hooks, nombres de archivo) funciona como con
+YouTube, así que se mide el camino real de la aplicación.
+
+Solo afecta al proceso actual: con EXTRACT_ENGINE=process los workers de
+extracción no verían el reemplazo, por eso los benchmarks usan hilos.
+
+    with FakeYouTube(media_bytes=4 * 1024 * 1024) as fake:
+        url = fake.video_url(1)
+"""
+import os
+import tempfile
+import threading
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeYouTube:
+    """Servidor de medios local y extractor de YouTube simulado"""
+
+    def __init__(self, media_bytes: int = 2 * 1024 * 1024, duration: int = 60,
+                 root: Optional[str] = None):
+        self.media_bytes = media_bytes
+        self.duration = duration
+        self.root = Path(root or tempfile.mkdtemp(prefix="fake-youtube-"))
+        self.extractions = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._patched = {}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def video_id(self, n: int) -> str:
+        """Id de 11 caracteres, como los de YouTube"""
+        return f"bench{n:06d}"[:11]
+
+    def video_url(self, n: int) -> str:
+        return f"https://www.youtube.com/watch?v={self.video_id(n)}"
+
+    def info(self, video_id: str) -> Dict[str, Any]:
+        """Info dict sin procesar, con la forma del de YouTube"""
+        media = f"{self.base_url}/media.mp4"
+        common = {'url': media, 'protocol': 'http', 'filesize': self.media_bytes}
+        return {
+            'id': video_id,
+            'title': f"Benchmark {video_id}",
+            'duration': self.duration,
+            'uploader': "bench",
+            'view_count': 0,
+            'upload_date': "20240101",
+            'description': "Video de benchmark",
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+            'formats': [
+                {**common, 'format_id': '18', 'ext': 'mp4', 'width': 640, 'height': 360,
+                 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'tbr': 500},
+                {**common, 'format_id': '22', 'ext': 'mp4', 'width': 1280, 'height': 720,
+                 'vcodec': 'avc1.64001F', 'acodec': 'mp4a.40.2', 'tbr': 1500},
+                {**common, 'format_id': '140', 'ext': 'm4a', 'vcodec': 'none',
+                 'acodec': 'mp4a.40.2', 'tbr': 128},
+            ],
+        }
+
+    def start(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        media = self.root / "media.mp4"
+        if not media.exists() or media.stat().st_size != self.media_bytes:
+            media.write_bytes(os.urandom(self.media_bytes))
+
+        handler = functools.partial(_QuietHandler, directory=str(self.root))
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._patch()
+        return self
+
+    def stop(self):
+        self._unpatch()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _patch(self):
+        from yt_dlp.extractor.youtube import YoutubeIE, YoutubeBaseInfoExtractor
+        fake = self
+
+        def real_extract(ie, url):
+            fake.extractions += 1
+            return fake.info(ie._match_id(url))
+
+        self._patched = {
+            (YoutubeIE, '_real_extract'): YoutubeIE.__dict__.get('_real_extract'),
+            (YoutubeBaseInfoExtractor, '_real_initialize'):
+                YoutubeBaseInfoExtractor.__dict__.get('_real_initialize'),
+        }
+        YoutubeIE._real_extract = real_extract
+        # Sin preferencias ni consentimiento: no hay nada que inicializar
+        YoutubeBaseInfoExtractor._real_initialize = lambda ie: None
+
+    def _unpatch(self):
+        for (cls, name), original in self._patched.items():
+            if original is not None:
+                setattr(cls, name, original)
+        self._patched = {}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
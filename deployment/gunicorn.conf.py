@@ -0,0 +1,39 @@
+# Configuración de gunicorn para ejecutar la API con varios workers uvicorn
+#
+#   gunicorn -c deployment/gunicorn.conf.py app.main:app
+#
+# Cada worker es un proceso con su propio event loop, pools de hilos y GIL,
+# así que la extracción (Python puro) escala con los núcleos. Lo que deben
+# ver todos los workers vive en disco en la misma máquina:
+#   - INDEX_DB_PATH: índice de archivos descargados
+#   - STATE_DB_PATH: trabajos, caché de información y tokens revocados
+#   - DOWNLOAD_DIR/.locks: cerrojos para no descargar dos veces lo mismo
+#   - RATE_LIMIT_STORAGE_URI: debe ser sqlite:///... (o redis://), nunca memory://
+import os
+import multiprocessing
+
+from app.core.config import settings
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+# WORKERS del entorno o de .env; sin él, uno por núcleo. Se exporta para que
+# cada worker vea el mismo número (BANDWIDTH_LIMIT y las conexiones para
+# fragmentos se dividen entre ellos)
+if "workers" in settings.model_fields_set:
+    workers = settings.workers
+else:
+    workers = multiprocessing.cpu_count()
+    os.environ["WORKERS"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Cada worker importa la aplicación por su cuenta: las conexiones SQLite y
+# los pools de hilos no se heredan de un proceso padre
+preload_app = False
+
+# Las descargas largas mantienen la petición abierta (POST /video/download,
+# /video/stream, SSE); el timeout solo vigila que el worker siga vivo
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
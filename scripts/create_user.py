@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Script para crear o actualizar usuarios de la API (hash bcrypt)
+"""
+import sys
+import json
+import getpass
+import argparse
+from pathlib import Path
+
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Crear o actualizar un usuario de la API")
+    parser.add_argument("username", nargs="?", help="Nombre de usuario")
+    parser.add_argument("--file", default="data/users.json", help="Archivo de usuarios (USERS_FILE)")
+    parser.add_argument("--hash", action="store_true",
+                        help="Solo imprimir el hash (para API_PASSWORD_HASH)")
+    args = parser.parse_args()
+    
+    password = getpass.getpass("Contraseña: ")
+    if password != getpass.getpass("Repite la contraseña: "):
+        print("✗ Las contraseñas no coinciden")
+        sys.exit(1)
+    hashed = pwd_context.hash(password)
+    
+    if args.hash:
+        print(f"API_PASSWORD_HASH={hashed}")
+        return
+    if not args.username:
+        parser.error("falta el nombre de usuario")
+    
+    users_file = Path(args.file)
+    users = json.loads(users_file.read_text(encoding="utf-8")) if users_file.exists() else {}
+    users[args.username] = hashed
+    users_file.parent.mkdir(parents=True, exist_ok=True)
+    users_file.write_text(json.dumps(users, indent=2), encoding="utf-8")
+    print(f"✓ Usuario {args.username} guardado en {users_file}")
+
+if __name__ == "__main__":
+    main()
@@ -5,22 +5,21 @@ Versión actualizada para la nueva estructura de carpetas
 """
 import os
 import sys
+import importlib.util
 from pathlib import Path
 
+REQUIRED_MODULES = ["fastapi", "uvicorn", "yt_dlp", "jose", "passlib"]
+
 def check_requirements():
-    """Verificar que los requisitos estén instalados"""
-    try:
-        import fastapi
-        import uvicorn
-        import yt_dlp
-        import jose
-        import passlib
-        print("✓ Todas las dependencias están instaladas")
-        return True
-    except ImportError as e:
-        print(f"✗ Falta instalar dependencias: {e}")
+    """Verificar que los requisitos estén instalados (sin importarlos: el
+    servidor los carga después y algunos tardan en importarse)"""
+    missing = [name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"✗ Falta instalar dependencias: {', '.join(missing)}")
         print("Ejecuta: pip install -r requirements.txt")
         return False
+    print("✓ Todas las dependencias están instaladas")
+    return True
 
 def setup_environment():
     """Configurar el entorno"""
@@ -62,6 +61,7 @@ def main():
     print("\n📋 Configuración:")
     print("- Puerto: 8000")
     print("- Host: 0.0.0.0")
+    print(f"- Workers: {os.getenv('WORKERS', '1')}")
     print("- Documentación: http://localhost:8000/docs")
     print("- Health check: http://localhost:8000/health")
     
@@ -80,14 +80,18 @@ def main():
     # Importar y ejecutar
     try:
         import uvicorn
-        from app.main import app
         from app.core.config import settings
         
+        if settings.workers > 1 and settings.rate_limit_storage_uri.startswith("memory://"):
+            print("⚠️  Con varios workers RATE_LIMIT_STORAGE_URI debe ser sqlite:///... o redis://")
+        
         uvicorn.run(
             "app.main:app",
             host=settings.host,
             port=settings.port,
-            reload=settings.debug
+            reload=settings.debug,
+            # reload y workers son incompatibles en uvicorn
+            workers=1 if settings.debug else settings.workers
         )
     except KeyboardInterrupt:
         print("\n\n👋 Servidor detenido por el usuario")
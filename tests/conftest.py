@@ -0,0 +1,58 @@
+"""
+Fixtures de pytest: la aplicación en proceso sobre datos temporales y el
+sustituto local de YouTube de los benchmarks (sin red)
+
+test_api.py es un script manual contra un servidor en marcha
+(python tests/test_api.py) y no se recoge.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# Antes de importar la aplicación: la configuración se lee al importarla
+DATA_DIR = Path(tempfile.mkdtemp(prefix="ytdl-tests-"))
+os.environ.update({
+    "DOWNLOAD_DIR": str(DATA_DIR / "downloads"),
+    "INDEX_DB_PATH": str(DATA_DIR / "downloads.db"),
+    "STATE_DB_PATH": str(DATA_DIR / "state.db"),
+    "USERS_FILE": str(DATA_DIR / "users.json"),
+    "API_USERNAME": "admin",
+    "API_PASSWORD": "password123",
+    "RATE_LIMIT_REQUESTS": "100000",
+    "RATE_LIMIT_STORAGE_URI": "memory://",
+    "WORKERS": "1",
+    "EXTRACT_ENGINE": "thread",
+    "PREFETCH_ENABLED": "False",
+    "OBJECT_STORE_ENABLED": "False",
+})
+
+collect_ignore = ["test_api.py"]
+
+
+@pytest.fixture(scope="session")
+def fake_youtube():
+    from fake_youtube import FakeYouTube
+    with FakeYouTube(media_bytes=256 * 1024, root=str(DATA_DIR / "fake-youtube")) as fake:
+        yield fake
+
+
+@pytest.fixture(scope="session")
+def client(fake_youtube):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/auth/login", json={"username": "admin", "password": "password123"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
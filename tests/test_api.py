@@ -73,6 +73,35 @@ def test_download(token, url, quality="360p"):
         print(f"✗ Error en descarga: {response.text}")
         return None
 
+def test_download_job(token, url, quality="360p"):
+    """Probar descarga encolada y consulta de estado"""
+    print(f"\n🧾 Probando descarga encolada en calidad {quality}...")
+    headers = {"Authorization": f"Bearer {token}"}
+    data = {
+        "url": url,
+        "quality": quality
+    }
+    
+    response = requests.post(f"{BASE_URL}/video/jobs", json=data, headers=headers)
+    print(f"Status: {response.status_code}")
+    if response.status_code != 202:
+        print(f"✗ Error encolando: {response.text}")
+        return None
+    
+    job_id = response.json()["job_id"]
+    print(f"✓ Trabajo encolado: {job_id}")
+    while True:
+        job = requests.get(f"{BASE_URL}/video/jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            break
+        time.sleep(1)
+    
+    if job["status"] == "completed":
+        print(f"✓ Archivo: {job['result']['filename']}")
+        return job["result"]["filename"]
+    print(f"✗ Error en trabajo: {job['error']}")
+    return None
+
 def main():
     """Función principal de testing"""
     print("🧪 Iniciando tests de la API")
@@ -100,6 +129,12 @@ def main():
     # if filename:
     #     print(f"✓ Archivo descargado: {filename}")
     
+    # Test 5: Descarga encolada y consulta de estado
+    filename = test_download_job(token, test_url, "360p")
+    if not filename:
+        print("❌ Descarga encolada falló")
+        return
+    
     print("\n🎉 Todos los tests pasaron exitosamente!")
     print("=" * 50)
 
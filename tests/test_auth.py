@@ -0,0 +1,101 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+
+from app.core import auth
+from app.core.auth import TokenCache, create_access_token, decode_token, revoke_token, verify_token
+from app.core.state import StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def test_cached_token_expires_at_exp(monkeypatch):
+    cache = TokenCache(max_entries=4)
+    now = time.time()
+    cache.set("token", "admin", now + 10, "jti")
+    assert cache.get("token") == "admin"
+
+    monkeypatch.setattr(time, "time", lambda: now + 10)
+    assert cache.get("token") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_token_stops_validating_at_exp():
+    token = create_access_token({"sub": "admin"}, expires_delta=timedelta(seconds=1))
+    exp = decode_token(token)["exp"]
+    assert verify_token(token) == "admin"
+    assert auth.token_cache.get(token) == "admin"
+
+    # El token se verifica con segundos enteros: se espera a pasar el exp
+    while int(time.time()) <= exp:
+        time.sleep(0.1)
+    assert verify_token(token) is None
+    assert auth.token_cache.get(token) is None
+
+
+def test_revoked_token_is_rejected():
+    token = create_access_token({"sub": "admin"}, expires_delta=timedelta(minutes=5))
+    assert verify_token(token) == "admin"
+    assert revoke_token(token)
+    assert verify_token(token) is None
+    # Un token revocado no se puede volver a revocar
+    assert not revoke_token(token)
+
+
+def test_logout_revokes_token(client):
+    response = client.post("/auth/login", json={"username": "admin", "password": "password123"})
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    assert client.get("/stats", headers=headers).status_code == 200
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+    assert client.get("/stats", headers=headers).status_code == 401
+    assert client.post("/auth/logout", headers=headers).status_code == 401
+
+
+def test_revocation_reaches_other_workers(store):
+    worker_a = TokenCache(max_entries=4, store=store)
+    worker_b = TokenCache(max_entries=4, store=store)
+    worker_a.set("token", "admin", time.time() + 60, "jti-1")
+
+    worker_b.revoke("jti-1", time.time() + 60)
+    assert worker_b.is_revoked("jti-1")
+    # Hasta sincronizar, el otro worker aún no lo sabe
+    assert worker_a.get("token") == "admin"
+
+    worker_a._sync()
+    assert worker_a.get("token") is None
+    assert worker_a.is_revoked("jti-1")
+
+
+def test_background_sync(store, monkeypatch):
+    monkeypatch.setattr(TokenCache, "sync_interval", 0.01)
+    worker_a = TokenCache(max_entries=4, store=store)
+    worker_b = TokenCache(max_entries=4, store=store)
+
+    async def run():
+        await worker_a.start()
+        worker_a.set("token", "admin", time.time() + 60, "jti-2")
+        worker_b.revoke("jti-2", time.time() + 60)
+        for _ in range(100):
+            if worker_a.get("token") is None:
+                break
+            await asyncio.sleep(0.01)
+        await worker_a.stop()
+
+    asyncio.run(run())
+    assert worker_a.get("token") is None
+    assert worker_a.is_revoked("jti-2")
+
+
+def test_sync_keeps_local_revocations(store):
+    cache = TokenCache(max_entries=4, store=store)
+    # Revocada aquí pero aún no visible en la lectura del store
+    cache._revoked["local"] = time.time() + 60
+    cache._sync()
+    assert cache.is_revoked("local")
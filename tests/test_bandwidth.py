@@ -0,0 +1,93 @@
+import time
+
+from app.services.bandwidth import BandwidthLease, BandwidthScheduler, is_fragmented
+
+
+def test_leases_share_limit_and_connections():
+    scheduler = BandwidthScheduler(limit=1200, max_connections=8, max_fragments=4)
+    first = scheduler.acquire()
+    assert (first.ratelimit, first.fragments) == (1200, 4)
+
+    second = scheduler.acquire()
+    third = scheduler.acquire()
+    for lease in (first, second, third):
+        assert (lease.ratelimit, lease.fragments) == (400, 2)
+
+    scheduler.release(second)
+    for lease in (first, third):
+        assert (lease.ratelimit, lease.fragments) == (600, 4)
+    # Liberar dos veces no cambia el reparto
+    scheduler.release(second)
+    assert scheduler.stats()['active'] == 2
+
+    scheduler.release(first)
+    assert (third.ratelimit, third.fragments) == (1200, 4)
+    scheduler.release(third)
+    assert scheduler.stats()['active'] == 0
+
+
+def test_limit_is_split_between_workers():
+    scheduler = BandwidthScheduler(limit=1200, max_connections=8, max_fragments=8, workers=4)
+    assert scheduler.limit == 300
+    assert scheduler.max_connections == 2
+    first = scheduler.acquire()
+    second = scheduler.acquire()
+    for lease in (first, second):
+        assert (lease.ratelimit, lease.fragments) == (150, 1)
+
+
+def test_unlimited_and_minimums():
+    scheduler = BandwidthScheduler(limit=0, max_connections=1, max_fragments=4, workers=2)
+    leases = [scheduler.acquire() for _ in range(3)]
+    # Sin límite no hay ratelimit y siempre queda al menos una conexión
+    assert all(lease.ratelimit is None and lease.fragments == 1 for lease in leases)
+
+    scheduler = BandwidthScheduler(limit=2, max_connections=4, max_fragments=4)
+    leases = [scheduler.acquire() for _ in range(3)]
+    assert all(lease.ratelimit == 1 for lease in leases)
+
+
+def test_rebalance_updates_live_params():
+    scheduler = BandwidthScheduler(limit=1000, max_connections=4, max_fragments=4)
+    lease = scheduler.acquire()
+    params = {}
+    lease.attach(params)
+    # Descarga HTTP: se regula desde el hook, no con el ratelimit de yt-dlp
+    assert params == {'concurrent_fragment_downloads': 4, 'ratelimit': None}
+
+    lease.fragmented = True
+    other = scheduler.acquire()
+    assert params == {'concurrent_fragment_downloads': 2, 'ratelimit': 250}
+
+    scheduler.release(other)
+    assert params == {'concurrent_fragment_downloads': 4, 'ratelimit': 250}
+    scheduler.release(lease)
+    # Una parte devuelta ya no toca las opciones
+    scheduler.acquire()
+    assert params['ratelimit'] == 250
+
+
+def test_progress_hook_paces_to_share(monkeypatch):
+    clock = [100.0]
+    slept = []
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(time, "sleep", slept.append)
+
+    lease = BandwidthLease()
+    lease.ratelimit = 1000
+    lease.on_progress({'status': 'downloading', 'filename': 'a.mp4', 'downloaded_bytes': 0})
+    lease.on_progress({'status': 'downloading', 'filename': 'a.mp4', 'downloaded_bytes': 1000})
+    assert slept == [1.0]
+
+    # Un reparto nuevo afecta solo a los bytes siguientes
+    clock[0] += 1.0
+    lease.ratelimit = 2000
+    lease.on_progress({'status': 'downloading', 'filename': 'a.mp4', 'downloaded_bytes': 2000})
+    assert slept == [1.0, 0.5]
+
+
+def test_is_fragmented():
+    assert is_fragmented({'protocol': 'm3u8_native'})
+    assert is_fragmented({'protocol': 'https+http_dash_segments'})
+    assert is_fragmented({'protocol': 'https', 'fragments': [{}]})
+    assert not is_fragmented({'protocol': 'https'})
@@ -0,0 +1,45 @@
+import json
+
+from app.api import video
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_download_batch(client, auth_headers, fake_youtube, monkeypatch):
+    charged = []
+    monkeypatch.setattr(video, "charge", lambda request, kind, units: charged.append((kind, units)))
+    urls = [fake_youtube.video_url(70), fake_youtube.video_url(71),
+            fake_youtube.video_url(70), "https://example.com/otro"]
+    response = client.post("/video/download/batch", json={"urls": urls}, headers=auth_headers)
+    assert response.status_code == 200
+    lines = ndjson(response)
+    assert lines[0] == {'url': "https://example.com/otro", 'ok': False,
+                        'error': "URL de YouTube no válida"}
+    assert sorted(line['video_id'] for line in lines[1:]) == [
+        fake_youtube.video_id(70), fake_youtube.video_id(71)]
+    assert all(line['ok'] for line in lines[1:])
+    # Solo se cobran los videos válidos y distintos
+    assert charged == [("batch_download_item", 2)]
+
+
+def test_invalid_batch_is_not_charged_per_item(client, auth_headers, monkeypatch):
+    charged = []
+    monkeypatch.setattr(video, "charge", lambda request, kind, units: charged.append((kind, units)))
+    response = client.post("/video/download/batch", json={"urls": ["no es una url"]},
+                           headers=auth_headers)
+    assert response.status_code == 200
+    assert ndjson(response)[0]['ok'] is False
+    assert charged == [("batch_download_item", 0)]
+
+
+def test_batch_larger_than_budget_is_rejected(client, auth_headers, fake_youtube, monkeypatch):
+    charged = []
+    monkeypatch.setattr(video, "charge", lambda request, kind, units: charged.append((kind, units)))
+    monkeypatch.setattr(video.settings, "rate_limit_requests", 3)
+    urls = [fake_youtube.video_url(n) for n in range(72, 75)]
+    response = client.post("/video/download/batch", json={"urls": urls}, headers=auth_headers)
+    assert response.status_code == 400
+    assert "Máximo 2 videos" in response.json()['detail']
+    assert charged == []
@@ -0,0 +1,92 @@
+import time
+
+from app.services.cache import InfoCache
+
+
+class FakeStore:
+    """Segundo nivel en memoria con la interfaz de StateStore"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def cache_get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry
+
+    def cache_set(self, key, value, expires_at):
+        self.entries[key] = (value, expires_at)
+
+
+def test_hit_after_set():
+    cache = InfoCache(max_entries=4, ttl_seconds=60)
+    assert cache.get("abc") is None
+    cache.set("abc", {"id": "abc"})
+    assert cache.get("abc") == {"id": "abc"}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_expired_entry_is_a_miss(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = InfoCache(max_entries=4, ttl_seconds=10)
+    cache.set("abc", {"id": "abc"})
+
+    now[0] += 9.5
+    assert cache.get("abc") == {"id": "abc"}
+    assert cache.ttl_remaining("abc") == 0.5
+
+    now[0] += 1
+    assert cache.get("abc") is None
+    assert cache.ttl_remaining("abc") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used():
+    cache = InfoCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"id": "a"})
+    cache.set("b", {"id": "b"})
+    cache.get("a")
+    cache.set("c", {"id": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disabled_cache_stores_nothing():
+    cache = InfoCache(max_entries=0, ttl_seconds=60)
+    cache.set("a", {"id": "a"})
+    assert cache.get("a") is None
+
+
+def test_shared_store_fills_memory_level():
+    store = FakeStore()
+    InfoCache(max_entries=4, ttl_seconds=60, store=store).set("abc", {"id": "abc"})
+
+    other = InfoCache(max_entries=4, ttl_seconds=60, store=store)
+    assert other.get("abc") == {"id": "abc"}
+    assert other.stats()["shared_hits"] == 1
+    # La segunda vez ya está en memoria
+    assert other.get("abc") == {"id": "abc"}
+    assert other.stats()["hits"] == 1
+
+
+def test_shared_entry_keeps_its_expiry():
+    store = FakeStore()
+    store.cache_set("abc", {"id": "abc"}, time.time() + 5)
+    cache = InfoCache(max_entries=4, ttl_seconds=60, store=store)
+    assert cache.get("abc") is not None
+    assert cache.ttl_remaining("abc") <= 5
+
+
+def test_info_requests_reuse_cached_extraction(client, auth_headers, fake_youtube):
+    url = fake_youtube.video_url(2)
+    before = fake_youtube.extractions
+    for _ in range(3):
+        response = client.post("/video/info", json={"url": url}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["title"] == f"Benchmark {fake_youtube.video_id(2)}"
+    assert fake_youtube.extractions == before + 1
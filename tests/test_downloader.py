@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services import popularity
+from app.services.downloader import DownloadAborted, downloader
+from app.services.popularity import PopularityTracker, Prefetcher
+
+
+class YdlRuns(list):
+    """Ejecuciones de yt-dlp; cada una espera a que se abra la compuerta
+    (gate) para poder intercalar peticiones mientras tanto"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+
+@pytest.fixture
+def ydl_runs(monkeypatch, fake_youtube):
+    runs = YdlRuns()
+    original = downloader._download_with_ydl
+
+    def counted(info, ydl_opts, index_format):
+        runs.append(info['id'])
+        runs.gate.wait(timeout=10)
+        return original(info, ydl_opts, index_format)
+
+    monkeypatch.setattr(downloader, "_download_with_ydl", counted)
+    return runs
+
+
+async def until_in_flight(key):
+    while key not in downloader.in_flight_keys():
+        await asyncio.sleep(0.01)
+
+
+def test_identical_downloads_share_one_run(fake_youtube, ydl_runs):
+    url = fake_youtube.video_url(40)
+    key = (fake_youtube.video_id(40), "negotiated:best")
+
+    async def run():
+        coalesced = downloader.coalesced_downloads
+        tasks = [asyncio.ensure_future(downloader.download_video(url, "best")) for _ in range(3)]
+        await until_in_flight(key)
+        await asyncio.sleep(0.05)
+        ydl_runs.gate.set()
+        results = await asyncio.gather(*tasks)
+        return results, downloader.coalesced_downloads - coalesced
+
+    results, coalesced = asyncio.run(run())
+    assert ydl_runs == [fake_youtube.video_id(40)]
+    assert coalesced == 2
+    assert len({result['filename'] for result in results}) == 1
+    assert key not in downloader.in_flight_keys()
+
+    # Una vez descargado se reutiliza sin volver a ejecutar yt-dlp
+    asyncio.run(downloader.download_video(url, "best"))
+    assert len(ydl_runs) == 1
+
+
+def test_cancelled_waiter_leaves_download_running(fake_youtube, ydl_runs):
+    url = fake_youtube.video_url(41)
+    key = (fake_youtube.video_id(41), "negotiated:best")
+
+    async def run():
+        first = asyncio.ensure_future(downloader.download_video(url, "best"))
+        second = asyncio.ensure_future(downloader.download_video(url, "best"))
+        await until_in_flight(key)
+        await asyncio.sleep(0.05)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        assert key in downloader.in_flight_keys()
+        ydl_runs.gate.set()
+        return first, await second
+
+    first, result = asyncio.run(run())
+    assert first.cancelled()
+    assert len(ydl_runs) == 1
+    record = downloader.index.get(*key)
+    assert record is not None
+    assert record['filename'] == result['filename']
+    assert Path(record['filepath']).is_file()
+
+
+def test_aborted_by_other_waiter_is_retried(fake_youtube, ydl_runs):
+    """Una petición que se suma a una descarga que otra corta (un prefetch
+    que cede) la retoma en vez de fallar"""
+    url = fake_youtube.video_url(42)
+    key = (fake_youtube.video_id(42), "negotiated:best")
+
+    def yield_download(d):
+        if d.get('status') == 'downloading':
+            raise DownloadAborted("cedida")
+
+    async def run():
+        prefetch = asyncio.ensure_future(downloader.download_video(url, "best", on_progress=yield_download))
+        await until_in_flight(key)
+        user = asyncio.ensure_future(downloader.download_video(url, "best"))
+        await asyncio.sleep(0.05)
+        ydl_runs.gate.set()
+        return await asyncio.gather(prefetch, user, return_exceptions=True)
+
+    aborted, result = asyncio.run(run())
+    assert isinstance(aborted, DownloadAborted)
+    assert result['filename'].endswith(".mp4")
+    assert ydl_runs == [fake_youtube.video_id(42)] * 2
+    assert downloader.index.get(*key) is not None
+
+
+def test_prefetch_does_not_yield_to_its_own_waiter(fake_youtube, ydl_runs, monkeypatch):
+    """El evento de ceder sigue activo hasta la siguiente comprobación, pero
+    con un usuario esperando la misma descarga el hook ya no corta"""
+    url = fake_youtube.video_url(43)
+    key = (fake_youtube.video_id(43), "negotiated:best")
+    prefetcher = Prefetcher(PopularityTracker(top_k=4, half_life=60), enabled=True, interval=60,
+                            top_k=4, min_score=0, qualities=1, refresh_margin=0)
+    monkeypatch.setattr(prefetcher, "user_busy", lambda own_downloads=0: True)
+    monkeypatch.setattr(popularity, "YIELD_CHECK_INTERVAL", 60)
+
+    async def run():
+        prefetch = asyncio.ensure_future(prefetcher._download(fake_youtube.video_id(43), url, "best"))
+        await until_in_flight(key)
+        assert prefetcher._user_traffic.is_set()
+        user = asyncio.ensure_future(downloader.download_video(url, "best"))
+        await asyncio.sleep(0.05)
+        ydl_runs.gate.set()
+        await prefetch
+        return await user
+
+    result = asyncio.run(run())
+    assert result['filename'].endswith(".mp4")
+    assert (prefetcher.downloaded, prefetcher.yielded) == (1, 0)
+    assert ydl_runs == [fake_youtube.video_id(43)]
@@ -0,0 +1,114 @@
+import pytest
+
+from app.services import formats
+from app.services.formats import estimate_size, fallback_plan, formats_table, negotiate
+
+INFO = {
+    'duration': 100,
+    'formats': [
+        {'format_id': '18', 'ext': 'mp4', 'height': 360, 'vcodec': 'avc1.42001E',
+         'acodec': 'mp4a.40.2', 'filesize': 10_000_000},
+        {'format_id': '137', 'ext': 'mp4', 'height': 1080, 'vcodec': 'avc1.640028',
+         'acodec': 'none', 'filesize': 80_000_000},
+        {'format_id': '136', 'ext': 'mp4', 'height': 720, 'vcodec': 'avc1.4d401f',
+         'acodec': 'none', 'filesize': 40_000_000},
+        {'format_id': '248', 'ext': 'webm', 'height': 1080, 'vcodec': 'vp9',
+         'acodec': 'none', 'filesize': 70_000_000},
+        {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2',
+         'abr': 128, 'filesize': 2_000_000},
+        {'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus',
+         'abr': 160, 'filesize': 2_500_000},
+        # Storyboard: ni video ni audio
+        {'format_id': 'sb0', 'ext': 'mhtml', 'vcodec': 'none', 'acodec': 'none'},
+    ],
+}
+
+
+@pytest.fixture
+def ffmpeg(monkeypatch):
+    monkeypatch.setattr(formats, "ffmpeg_available", lambda: True)
+
+
+@pytest.fixture
+def no_ffmpeg(monkeypatch):
+    monkeypatch.setattr(formats, "ffmpeg_available", lambda: False)
+
+
+def test_best_prefers_highest_remux(ffmpeg):
+    plan = negotiate(INFO, 'best')
+    assert plan['format'] == '137+140'
+    assert plan['mode'] == 'remux'
+    assert plan['container'] == 'mp4'
+    assert plan['height'] == 1080
+    assert plan['estimated_bytes'] == 82_000_000
+    assert plan['estimated_cpu_seconds'] > 0
+
+
+def test_quality_caps_height(ffmpeg):
+    assert negotiate(INFO, '720p')['format'] == '136+140'
+    assert negotiate(INFO, '360p')['format'] == '18'
+
+
+def test_single_file_never_remuxes(ffmpeg):
+    plan = negotiate(INFO, 'best', single_file=True)
+    assert plan['format'] == '18'
+    assert plan['mode'] == 'single'
+    assert plan['cpu_cost'] == 'none'
+
+
+def test_without_ffmpeg_only_single_files(no_ffmpeg):
+    assert negotiate(INFO, 'best')['format'] == '18'
+
+
+def test_max_bytes_lowers_the_choice(ffmpeg):
+    assert negotiate(INFO, 'best', max_bytes=50_000_000)['format'] == '136+140'
+    assert negotiate(INFO, 'best', max_bytes=1_000) is None
+
+
+def test_worst_picks_lowest(ffmpeg):
+    assert negotiate(INFO, 'worst')['format'] == '18'
+
+
+def test_audio_picks_best_bitrate(ffmpeg):
+    plan = negotiate(INFO, 'audio')
+    assert plan['format'] == '251'
+    assert plan['container'] == 'webm'
+    assert negotiate(INFO, 'audio', max_bytes=2_200_000)['format'] == '140'
+
+
+def test_no_formats():
+    assert negotiate({'formats': []}, 'best') is None
+    assert negotiate({}, 'audio') is None
+
+
+def test_estimate_size_from_bitrate():
+    assert estimate_size({'tbr': 1000}, 8) == 1_000_000
+    assert estimate_size({'filesize_approx': 123.4}, None) == 123
+    assert estimate_size({'tbr': 1000}, None) is None
+
+
+def test_formats_table_skips_storyboards():
+    table = formats_table(INFO)
+    assert table['columns'][0] == 'format_id'
+    assert [row[0] for row in table['rows']] == ['18', '137', '136', '248', '140', '251']
+    assert table['rows'][4][2] == 'audio only'
+
+
+def test_fallback_plan():
+    plan = fallback_plan('720p', 'best[height<=720]')
+    assert plan['format'] == 'best[height<=720]'
+    assert plan['mode'] == 'single'
+    assert plan['estimated_bytes'] is None
+
+
+def test_plan_endpoint(client, auth_headers, fake_youtube):
+    response = client.post(
+        "/video/plan",
+        json={"url": fake_youtube.video_url(4), "quality": "480p"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan['format'] == '18'
+    assert plan['mode'] == 'single'
+    assert plan['estimated_bytes'] == fake_youtube.media_bytes
@@ -0,0 +1,47 @@
+from app.models.schemas import VideoInfo
+from app.services.downloader import DEFAULT_INFO_FIELDS
+from app.services.formats import FORMAT_COLUMNS
+
+
+def info(client, auth_headers, url, fields=None):
+    body = {"url": url} if fields is None else {"url": url, "fields": fields}
+    return client.post("/video/info", json=body, headers=auth_headers)
+
+
+def test_only_requested_fields(client, auth_headers, fake_youtube):
+    url = fake_youtube.video_url(80)
+    response = info(client, auth_headers, url, ["title", "video_id", "title"])
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {'title', 'video_id'}
+    assert body['video_id'] == fake_youtube.video_id(80)
+    assert isinstance(body['title'], str)
+
+    # Sin fields, los de siempre (sin la tabla de formatos)
+    response = info(client, auth_headers, url)
+    assert response.status_code == 200
+    assert set(response.json()) == set(DEFAULT_INFO_FIELDS)
+
+
+def test_unknown_fields_are_rejected(client, auth_headers, fake_youtube):
+    extractions = fake_youtube.extractions
+    response = info(client, auth_headers, fake_youtube.video_url(81), ["title", "likes"])
+    assert response.status_code == 400
+    assert "likes" in response.json()['detail']
+    # Se rechaza sin consultar YouTube
+    assert fake_youtube.extractions == extractions
+
+
+def test_formats_table(client, auth_headers, fake_youtube):
+    response = info(client, auth_headers, fake_youtube.video_url(82), ["formats"])
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {'formats'}
+    table = VideoInfo.model_validate(body).formats
+    assert table.columns == list(FORMAT_COLUMNS)
+    rows = {row[0]: dict(zip(table.columns, row)) for row in table.rows}
+    assert set(rows) == {"18", "22", "140"}
+    assert rows["140"]['resolution'] == "audio only"
+    assert rows["140"]['vcodec'] is None
+    assert rows["22"]['resolution'].endswith("x720")
+    assert all(row['filesize'] == fake_youtube.media_bytes for row in rows.values())
@@ -0,0 +1,111 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.state import StateStore
+from app.services.downloader import downloader
+from app.services.jobs import JOB_FAILED, JOB_QUEUED, JobManager
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def make_job(n: int, attempts: int = 0, status: str = "running"):
+    return {
+        'job_id': uuid.uuid4().hex,
+        'status': status,
+        'url': f"https://www.youtube.com/watch?v=journal{n:04d}",
+        'quality': "best",
+        'audio_format': None,
+        'audio_bitrate': None,
+        'user': "admin",
+        'created_at': f"2024-01-01T00:00:0{n}",
+        'started_at': None,
+        'finished_at': None,
+        'result': None,
+        'error': None,
+        '_finished_ts': None,
+        '_priority': 0,
+        '_attempts': attempts,
+    }
+
+
+def recover(manager: JobManager):
+    """Arrancar el gestor sin workers (los trabajos se quedan en la cola)"""
+    async def run():
+        await manager.start()
+        await manager.stop()
+    asyncio.run(run())
+
+
+def test_jobs_of_dead_owner_are_requeued(store):
+    job = make_job(1)
+    store.save_job(job, owner="gone")
+
+    manager = JobManager(workers=0, queue_size=10, retention_seconds=60, store=store)
+    recover(manager)
+
+    assert manager.recovered_jobs == 1
+    assert manager.jobs[job['job_id']]['status'] == JOB_QUEUED
+    stored, progress, _ = store.get_job(job['job_id'])
+    assert stored['status'] == JOB_QUEUED
+    assert stored['_attempts'] == 1
+    assert progress['resumed'] is True
+    assert store.unfinished_jobs()[0][1] == manager.owner
+
+
+def test_jobs_past_max_attempts_fail(store):
+    job = make_job(1, attempts=2)
+    store.save_job(job, owner="gone")
+
+    manager = JobManager(workers=0, queue_size=10, retention_seconds=60, store=store,
+                         max_attempts=2)
+    recover(manager)
+
+    assert manager.recovered_jobs == 0
+    assert job['job_id'] not in manager.jobs
+    stored, _, _ = store.get_job(job['job_id'])
+    assert stored['status'] == JOB_FAILED
+    assert stored['error'] == "Trabajo interrumpido demasiadas veces"
+    assert stored['_finished_ts'] is not None
+    assert store.unfinished_jobs() == []
+
+
+def test_jobs_of_live_owner_are_kept(store):
+    owner = uuid.uuid4().hex
+    lock = downloader.locks.named(f"owner-{owner}")
+    lock.acquire()
+    try:
+        job = make_job(1)
+        store.save_job(job, owner=owner)
+        manager = JobManager(workers=0, queue_size=10, retention_seconds=60, store=store)
+        recover(manager)
+        assert manager.recovered_jobs == 0
+        assert store.unfinished_jobs()[0][1] == owner
+    finally:
+        lock.release()
+
+
+def test_recovery_stops_when_queue_is_full(store):
+    jobs = [make_job(n) for n in range(3)]
+    for job in jobs:
+        store.save_job(job, owner="gone")
+
+    manager = JobManager(workers=0, queue_size=2, retention_seconds=60, store=store)
+    recover(manager)
+
+    assert manager.recovered_jobs == 2
+    # El último sigue en el diario para otro worker
+    assert [owner for _, owner in store.unfinished_jobs()] == [manager.owner] * 2 + ["gone"]
+
+
+def test_claim_job_has_one_winner(store):
+    job = make_job(1)
+    store.save_job(job, owner="gone")
+    assert store.claim_job(job['job_id'], "gone", "first")
+    assert not store.claim_job(job['job_id'], "gone", "second")
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, Registry, SharedMetrics, merge_snapshots
+from app.core.state import ARCHIVED_METRICS_OWNER, StateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+def worker(monkeypatch, store) -> SharedMetrics:
+    """Métricas de un worker: registro propio con un contador y un histograma"""
+    registry = Registry()
+    monkeypatch.setattr(metrics, "registry", registry)
+    Counter("test_requests_total", "Peticiones", ("endpoint",))
+    Histogram("test_seconds", "Duración", buckets=(1.0,))
+    return SharedMetrics(registry, store=store, interval=1)
+
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    raise AssertionError(f"{name} no aparece en las métricas")
+
+
+def metric(shared: SharedMetrics, name: str):
+    return next(metric for metric in shared.registry._metrics if metric.name == name)
+
+
+def test_merge_snapshots_sums_samples():
+    first = {"requests": [[["info"], [2.0]], [["download"], [1.0]]], "seconds": [[[], [1, 0, 0.5, 1]]]}
+    second = {"requests": [[["info"], [3.0]]], "seconds": [[[], [0, 2, 7.0, 2]]]}
+
+    merged = merge_snapshots(first, second)
+    assert sorted(merged["requests"]) == [[["download"], [1.0]], [["info"], [5.0]]]
+    assert merged["seconds"] == [[[], [1, 2, 7.5, 3]]]
+    # Las instantáneas de entrada no se modifican
+    assert first["requests"][0] == [["info"], [2.0]]
+
+
+def test_totals_from_two_workers_are_summed(monkeypatch, store):
+    worker_a = worker(monkeypatch, store)
+    worker_b = worker(monkeypatch, store)
+    metric(worker_a, "test_requests_total").inc(3, endpoint="info")
+    metric(worker_b, "test_requests_total").inc(2, endpoint="info")
+    metric(worker_b, "test_seconds").observe(0.5)
+    metric(worker_b, "test_seconds").observe(4)
+
+    worker_a.publish()
+    worker_b.publish()
+    for shared in (worker_a, worker_b):
+        text = shared.render()
+        assert sample(text, 'test_requests_total{endpoint="info"}') == 5
+        assert sample(text, 'test_seconds_bucket{le="1"}') == 1
+        assert sample(text, 'test_seconds_bucket{le="+Inf"}') == 2
+        assert sample(text, "test_seconds_count") == 2
+
+
+def test_stale_worker_is_archived_without_lowering_totals(monkeypatch, store):
+    worker_a = worker(monkeypatch, store)
+    worker_b = worker(monkeypatch, store)
+    metric(worker_a, "test_requests_total").inc(3, endpoint="info")
+    metric(worker_b, "test_requests_total").inc(2, endpoint="info")
+    worker_a.publish()
+    worker_b.publish()
+
+    # El worker B deja de publicar; A publica pasado el plazo
+    now = time.time() + worker_a.interval * worker_a.stale_intervals + 1
+    monkeypatch.setattr(time, "time", lambda: now)
+    worker_a.publish()
+    owners = {row['owner'] for row in store._query("SELECT owner FROM metrics")}
+    assert owners == {worker_a.owner, ARCHIVED_METRICS_OWNER}
+    assert sample(worker_a.render(), 'test_requests_total{endpoint="info"}') == 5
+
+    # Un worker nuevo que lo sustituye suma a lo archivado
+    worker_c = worker(monkeypatch, store)
+    metric(worker_c, "test_requests_total").inc(1, endpoint="info")
+    worker_c.publish()
+    assert sample(worker_a.render(), 'test_requests_total{endpoint="info"}') == 6
+
+    # Archivar otra vez no cuenta dos veces lo ya archivado
+    later = now + worker_a.interval * worker_a.stale_intervals + 1
+    monkeypatch.setattr(time, "time", lambda: later)
+    worker_a.publish()
+    assert sample(worker_a.render(), 'test_requests_total{endpoint="info"}') == 6
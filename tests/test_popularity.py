@@ -0,0 +1,81 @@
+import random
+import time
+from collections import Counter
+
+import pytest
+
+from app.services.popularity import CountMinSketch, PopularityTracker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_estimate_never_below_true_count(clock):
+    # Tabla pequeña: muchas colisiones
+    sketch = CountMinSketch(width=64, depth=4)
+    rng = random.Random(1)
+    counts = Counter(f"video{rng.randrange(500)}" for _ in range(5000))
+    for key, count in counts.items():
+        sketch.add(key, count)
+
+    total = sum(counts.values())
+    for key, count in counts.items():
+        estimate = sketch.estimate(key)
+        assert count - 1e-6 <= estimate <= total + 1e-6
+    assert sketch.estimate("never-seen") <= total
+
+
+def test_exact_without_collisions(clock):
+    sketch = CountMinSketch(width=4096, depth=4)
+    assert sketch.add("a") == pytest.approx(1.0)
+    assert sketch.add("a", 2) == pytest.approx(3.0)
+    assert sketch.estimate("a") == pytest.approx(3.0)
+
+
+def test_counts_halve_every_half_life(clock):
+    sketch = CountMinSketch(half_life=60)
+    sketch.add("a", 8)
+    clock[0] += 60
+    assert sketch.estimate("a") == pytest.approx(4.0)
+    clock[0] += 120
+    assert sketch.estimate("a") == pytest.approx(1.0)
+    # Lo reciente pesa más que lo antiguo
+    sketch.add("b", 2)
+    assert sketch.estimate("b") > sketch.estimate("a")
+
+
+def test_rescale_keeps_estimates(clock):
+    sketch = CountMinSketch(half_life=1)
+    sketch.add("a", 1024)
+    # Factor de escala por encima de 1e6: se reescala la tabla
+    clock[0] += 25
+    assert sketch.estimate("a") == pytest.approx(1024 / 2 ** 25)
+    assert sketch._epoch == clock[0]
+    sketch.add("a", 1)
+    assert sketch.estimate("a") == pytest.approx(1 + 1024 / 2 ** 25)
+
+
+def test_tracker_ranks_videos_and_qualities(clock):
+    tracker = PopularityTracker(top_k=2, half_life=3600)
+    url = "https://www.youtube.com/watch?v={}"
+    for video_id, hits in (("aaaaaaaaaaa", 5), ("bbbbbbbbbbb", 3), ("ccccccccccc", 1)):
+        for _ in range(hits):
+            tracker.record(url.format(video_id), quality="720p" if video_id == "aaaaaaaaaaa" else "best")
+    tracker.record("no es una url")
+
+    top = tracker.top(2)
+    assert [video_id for video_id, _, _ in top] == ["aaaaaaaaaaa", "bbbbbbbbbbb"]
+    assert top[0][1] == url.format("aaaaaaaaaaa")
+    assert tracker.top(3, min_score=2) == top
+    assert tracker.top_qualities(2) == ["720p", "best"]
+
+
+def test_tracker_keeps_few_candidates(clock):
+    tracker = PopularityTracker(top_k=1, half_life=3600)
+    for n in range(10):
+        tracker.record(f"https://www.youtube.com/watch?v=video{n:06d}")
+    assert tracker.stats()['candidates'] <= 4
@@ -0,0 +1,115 @@
+import asyncio
+import json
+import threading
+
+from app.services.progress import ProgressChannel, normalize_progress
+
+
+def downloading(n: int) -> dict:
+    return {'status': 'downloading', 'downloaded_bytes': n, 'total_bytes': 100,
+            'speed': 10.0, 'eta': 1, 'info_dict': {'formats': ['...']}}
+
+
+def test_normalize_progress():
+    assert normalize_progress(downloading(5)) == {
+        'stage': 'downloading', 'downloaded_bytes': 5, 'total_bytes': 100, 'speed': 10.0, 'eta': 1,
+    }
+    assert normalize_progress({'status': 'finished', 'total_bytes_estimate': 7})['total_bytes'] == 7
+    assert normalize_progress({'postprocessor': 'Merger', 'status': 'started'}) == {
+        'stage': 'postprocessing', 'postprocessor': 'Merger', 'postprocessor_status': 'started',
+    }
+
+
+def test_thread_events_are_coalesced():
+    async def run():
+        published = []
+        channel = ProgressChannel(asyncio.get_running_loop(), 0.2, on_publish=published.append)
+
+        def hooks():
+            for n in range(1, 101):
+                channel.publish_threadsafe(downloading(n))
+
+        thread = threading.Thread(target=hooks)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.5)
+        return channel, published
+
+    channel, published = asyncio.run(run())
+    # Cien hooks, como mucho una entrega por intervalo
+    assert 1 <= channel.version <= 2
+    assert channel.state['downloaded_bytes'] == 100
+    assert published[-1]['downloaded_bytes'] == 100
+    assert 'info_dict' not in channel.state
+
+
+def test_slow_subscriber_sees_latest_state():
+    async def run():
+        channel = ProgressChannel(asyncio.get_running_loop(), 0)
+        channel.publish({'stage': 'queued'})
+        subscription = channel.subscribe()
+        first = await subscription.__anext__()
+        # El suscriptor no lee mientras se publican varios estados
+        for n in range(1, 6):
+            channel.publish(normalize_progress(downloading(n)))
+        second = await subscription.__anext__()
+        await subscription.aclose()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {'stage': 'queued'}
+    assert second['stage'] == 'downloading'
+    assert second['downloaded_bytes'] == 5
+
+
+def test_late_subscriber_gets_final_state():
+    async def run():
+        channel = ProgressChannel(asyncio.get_running_loop(), 0)
+        channel.publish({'stage': 'downloading'})
+        channel.close({'status': 'completed', 'stage': 'finished'})
+        return [state async for state in channel.subscribe()]
+
+    assert asyncio.run(run()) == [{'status': 'completed', 'stage': 'finished'}]
+
+
+def test_close_delivers_pending_thread_events():
+    async def run():
+        channel = ProgressChannel(asyncio.get_running_loop(), 60)
+        channel.publish_threadsafe(downloading(1))
+        await asyncio.sleep(0.05)
+        channel.publish_threadsafe(downloading(2))
+        channel.close({'stage': 'finished'})
+        return channel.state
+
+    state = asyncio.run(run())
+    assert state['downloaded_bytes'] == 2
+    assert state['stage'] == 'finished'
+
+
+def test_keepalive_while_idle():
+    async def run():
+        channel = ProgressChannel(asyncio.get_running_loop(), 0)
+        subscription = channel.subscribe(keepalive=0.05)
+        states = [await subscription.__anext__(), await subscription.__anext__()]
+        await subscription.aclose()
+        return states
+
+    assert asyncio.run(run()) == [{}, None]
+
+
+def test_job_events_stream_ends_on_completion(client, auth_headers, fake_youtube):
+    response = client.post("/video/jobs", json={"url": fake_youtube.video_url(60)},
+                           headers=auth_headers)
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+
+    events = []
+    with client.stream("GET", f"/video/jobs/{job_id}/events", headers=auth_headers) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        for line in stream.iter_lines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: "):]))
+
+    assert events[-1]['status'] == 'completed'
+    assert events[-1]['stage'] == 'finished'
+    assert events[-1]['filename'].endswith(".mp4")
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+
+from app.core import rate_limit
+from app.core.rate_limit import SQLiteStorage, _parse_costs, charge, endpoint_cost
+
+
+def make_request(host="10.0.0.1"):
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": [],
+                    "client": (host, 1234)})
+
+
+def test_parse_costs():
+    assert _parse_costs("default=1, download=10,info=2,,broken") == {
+        "default": 1, "download": 10, "info": 2,
+    }
+
+
+def test_endpoint_cost_falls_back_to_default(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ENDPOINT_COSTS", {"default": 3, "download": 10})
+    assert endpoint_cost("download") == 10
+    assert endpoint_cost("unknown") == 3
+    monkeypatch.setattr(rate_limit, "ENDPOINT_COSTS", {})
+    assert endpoint_cost("unknown") == 1
+
+
+def test_charge_spends_shared_budget(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ENDPOINT_COSTS", {"default": 1, "download": 40})
+    monkeypatch.setattr(rate_limit, "API_LIMIT", "100 per 60 second")
+    request = make_request("10.0.0.2")
+    charge(request, "download", 2)
+    charge(request, "download", 0)
+    with pytest.raises(HTTPException) as exc:
+        charge(request, "download", 1)
+    assert exc.value.status_code == 429
+    # Otro cliente tiene su propio presupuesto
+    charge(make_request("10.0.0.3"), "download", 2)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}")
+    assert isinstance(storage, SQLiteStorage)
+    return storage
+
+
+def test_sqlite_storage_counts_and_expires(storage, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    assert storage.incr("k", expiry=10) == 1
+    assert storage.incr("k", expiry=10, amount=5) == 6
+    assert storage.get("k") == 6
+    assert storage.get_expiry("k") == 1010.0
+
+    now[0] += 10
+    assert storage.get("k") == 0
+    # Una ventana vencida empieza de nuevo
+    assert storage.incr("k", expiry=10, amount=2) == 2
+    assert storage.get_expiry("k") == 1020.0
+
+
+def test_sqlite_storage_elastic_expiry(storage, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    storage.incr("k", expiry=10)
+    now[0] += 5
+    storage.incr("k", expiry=10, elastic_expiry=True)
+    assert storage.get_expiry("k") == 1015.0
+
+
+def test_sqlite_storage_clear_and_reset(storage):
+    storage.incr("a", expiry=60)
+    storage.incr("b", expiry=60)
+    storage.clear("a")
+    assert storage.get("a") == 0
+    assert storage.get("b") == 1
+    assert storage.reset() == 1
+    assert storage.get("b") == 0
+    assert storage.check()
+
+
+def test_sqlite_storage_is_shared_between_instances(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    first, second = SQLiteStorage(uri), SQLiteStorage(uri)
+    limit = parse("10 per 60 second")
+    assert FixedWindowRateLimiter(first).hit(limit, "user:a", cost=6)
+    assert FixedWindowRateLimiter(second).get_window_stats(limit, "user:a").remaining == 4
+    assert not FixedWindowRateLimiter(second).hit(limit, "user:a", cost=6)
+    assert not FixedWindowRateLimiter(first).test(limit, "user:a")
+
+
+def test_rejected_charge_spends_nothing(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ENDPOINT_COSTS", {"default": 1, "download": 40})
+    monkeypatch.setattr(rate_limit, "API_LIMIT", "100 per 60 second")
+    request = make_request("10.0.0.4")
+    with pytest.raises(HTTPException):
+        charge(request, "download", 3)
+    # El intento de 120 no se cobró: siguen quedando 100
+    charge(request, "download", 2)
+
+
+def test_units_per_window(monkeypatch):
+    monkeypatch.setattr(rate_limit, "ENDPOINT_COSTS", {"default": 1, "batch_download_item": 2, "free": 0})
+    monkeypatch.setattr(rate_limit.settings, "rate_limit_requests", 121)
+    assert rate_limit.units_per_window("batch_download_item", "default") == 60
+    assert rate_limit.units_per_window("free", "default") is None
@@ -0,0 +1,148 @@
+import re
+
+import pytest
+
+from app.api.responses import ArtifactResponse
+
+parse_range = ArtifactResponse._parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 100)]),
+    ("bytes=100-", [(100, 1000)]),
+    ("bytes=-100", [(900, 1000)]),
+    ("bytes=-5000", [(0, 1000)]),
+    ("bytes=900-5000", [(900, 1000)]),
+    ("bytes=0-9, 20-29", [(0, 10), (20, 30)]),
+    # Solapados y contiguos se fusionan
+    ("bytes=0-9,5-19,20-29", [(0, 30)]),
+    ("bytes=50-59, 0-9", [(0, 10), (50, 60)]),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["items=0-9", "bytes=", "bytes=abc", "bytes=9-0", "bytes=x-9"])
+def test_invalid_range_is_ignored(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=2000-2999", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    assert parse_range(header, 1000) == []
+
+
+@pytest.fixture(scope="module")
+def artifact(client, auth_headers, fake_youtube):
+    """Un archivo descargado del sustituto local y su contenido"""
+    response = client.post(
+        "/video/download",
+        json={"url": fake_youtube.video_url(3), "quality": "best"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    url = f"/video/download/{response.json()['filename']}"
+    full = client.get(url, headers=auth_headers)
+    assert full.status_code == 200
+    return url, full.content, full.headers
+
+
+def test_full_file(artifact):
+    _, body, headers = artifact
+    assert headers["accept-ranges"] == "bytes"
+    assert int(headers["content-length"]) == len(body) > 0
+    assert headers["etag"].startswith('"')
+
+
+def test_single_range(client, auth_headers, artifact):
+    url, body, _ = artifact
+    response = client.get(url, headers={**auth_headers, "Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == body[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(body)}"
+
+
+def test_suffix_range(client, auth_headers, artifact):
+    url, body, _ = artifact
+    response = client.get(url, headers={**auth_headers, "Range": "bytes=-16"})
+    assert response.status_code == 206
+    assert response.content == body[-16:]
+
+
+def test_multiple_ranges(client, auth_headers, artifact):
+    url, body, _ = artifact
+    response = client.get(url, headers={**auth_headers, "Range": "bytes=0-3, 100-107"})
+    assert response.status_code == 206
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    boundary = content_type.split("boundary=")[1].encode()
+    parts = response.content.split(b"--" + boundary)
+    assert parts[-1] == b"--\r\n"
+    payloads = []
+    for part in parts[1:-1]:
+        head, _, payload = part.partition(b"\r\n\r\n")
+        payloads.append((re.search(rb"Content-Range: bytes (\d+)-(\d+)", head).groups(),
+                         payload.removesuffix(b"\r\n")))
+    assert payloads == [
+        ((b"0", b"3"), body[0:4]),
+        ((b"100", b"107"), body[100:108]),
+    ]
+
+
+def test_unsatisfiable_returns_416(client, auth_headers, artifact):
+    url, body, _ = artifact
+    response = client.get(url, headers={**auth_headers, "Range": f"bytes={len(body)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(body)}"
+
+
+def test_if_none_match_returns_304(client, auth_headers, artifact):
+    url, _, headers = artifact
+    response = client.get(url, headers={**auth_headers, "If-None-Match": headers["etag"]})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == headers["etag"]
+
+    weak = client.get(url, headers={**auth_headers, "If-None-Match": f'W/{headers["etag"]}'})
+    assert weak.status_code == 304
+
+    other = client.get(url, headers={**auth_headers, "If-None-Match": '"otra"'})
+    assert other.status_code == 200
+
+
+def test_if_modified_since_returns_304(client, auth_headers, artifact):
+    url, _, headers = artifact
+    response = client.get(url, headers={**auth_headers, "If-Modified-Since": headers["last-modified"]})
+    assert response.status_code == 304
+
+
+def test_if_range(client, auth_headers, artifact):
+    url, body, headers = artifact
+    matching = client.get(url, headers={
+        **auth_headers, "Range": "bytes=0-9", "If-Range": headers["etag"],
+    })
+    assert matching.status_code == 206
+    assert matching.content == body[:10]
+
+    # Si el archivo cambió se sirve entero
+    stale = client.get(url, headers={
+        **auth_headers, "Range": "bytes=0-9", "If-Range": '"otra"',
+    })
+    assert stale.status_code == 200
+    assert stale.content == body
+
+    # Las etiquetas débiles nunca coinciden
+    weak = client.get(url, headers={
+        **auth_headers, "Range": "bytes=0-9", "If-Range": f'W/{headers["etag"]}',
+    })
+    assert weak.status_code == 200
+
+
+def test_head_sends_no_body(client, auth_headers, artifact):
+    url, body, _ = artifact
+    response = client.head(url, headers={**auth_headers, "Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "10"
+    assert response.content == b""
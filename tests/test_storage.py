@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+from app.core.state import StateStore
+from app.services.downloader import downloader
+from app.services.storage import StorageManager
+
+
+@pytest.fixture
+def state(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch, state):
+    """Gestor sobre un directorio propio, con presupuesto para lo indexado
+    y 1000 bytes más (los indexados de otras pruebas no se tocan)"""
+    monkeypatch.setattr(downloader.index, "least_recently_used", lambda limit, offset: [])
+    manager = StorageManager(
+        max_bytes=downloader.index.stats()['bytes'] + 1000, min_free_bytes=0, interval=60,
+        scan_batch=1000, partial_ttl=3600, untracked_grace=600, store=state,
+    )
+    manager.download_dir = tmp_path / "downloads"
+    manager.download_dir.mkdir()
+    return manager
+
+
+def write(manager, name: str, size: int = 800):
+    path = manager.download_dir / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def later(monkeypatch, seconds: float):
+    now = time.time() + seconds
+    monkeypatch.setattr(time, "time", lambda: now)
+
+
+def test_old_untracked_files_are_evicted_first(manager, monkeypatch):
+    old = write(manager, "Viejo-aaaaaaaaaaa-best.mp4")
+    new = write(manager, "Nuevo-bbbbbbbbbbb-best.mp4")
+    manager._scan_step()
+    later(monkeypatch, 3600)
+    manager._untracked[new.name] = (800, time.time())
+
+    manager.run_once(set(), set())
+    assert not old.exists()
+    assert new.exists()
+    assert manager.evictions == 1
+
+
+def test_recent_untracked_files_wait_for_grace(manager, monkeypatch):
+    first = write(manager, "Uno-aaaaaaaaaaa-best.mp4")
+    second = write(manager, "Dos-bbbbbbbbbbb-best.mp4")
+    manager._scan_step()
+
+    manager.run_once(set(), set())
+    assert first.exists() and second.exists()
+
+    later(monkeypatch, 601)
+    manager.run_once(set(), set())
+    assert manager.evictions == 1
+
+
+def test_busy_and_pinned_files_are_kept(manager, monkeypatch, state):
+    intermediate = write(manager, "Video-ccccccccccc-best.f137.mp4")
+    pinned = write(manager, "Otro-ddddddddddd-best.mp4")
+    manager._scan_step()
+    later(monkeypatch, 3600)
+
+    # Pin de otro worker, en el estado compartido
+    other = StorageManager(max_bytes=0, min_free_bytes=0, interval=60, scan_batch=1,
+                           partial_ttl=3600, untracked_grace=600, store=state)
+    other.pin(pinned.name)
+    manager.run_once(set(), {("ccccccccccc", "best")})
+    assert intermediate.exists() and pinned.exists()
+
+    other.unpin(pinned.name)
+    manager.run_once(set(), {("ccccccccccc", "best")})
+    assert not pinned.exists()
+    assert intermediate.exists()
+
+
+def test_files_gone_or_indexed_since_scan_are_forgotten(manager, monkeypatch):
+    gone = write(manager, "Borrado-eeeeeeeeeee-best.mp4")
+    write(manager, "Indexado-fffffffffff-best.mp4")
+    manager._scan_step()
+    gone.unlink()
+    monkeypatch.setattr(downloader.index, "get_by_filename",
+                        lambda name: {'filename': name} if name.startswith("Indexado") else None)
+    later(monkeypatch, 3600)
+
+    manager.run_once(set(), set())
+    assert manager._untracked == {}
+    assert manager.evictions == 0
+
+
+def test_expired_pins_are_not_shared(state, monkeypatch):
+    manager = StorageManager(max_bytes=0, min_free_bytes=0, interval=60, scan_batch=1,
+                             partial_ttl=3600, untracked_grace=600, store=state)
+    manager.pin("video.mp4")
+    assert state.pinned_files() == {"video.mp4"}
+    later(monkeypatch, manager.pin_lease + 1)
+    assert state.pinned_files() == set()
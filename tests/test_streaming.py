@@ -0,0 +1,46 @@
+import asyncio
+from pathlib import Path
+
+from app.services.streaming import DownloadStream
+
+
+async def read_all(stream: DownloadStream) -> bytes:
+    return b"".join([chunk async for chunk in stream.iter_bytes()])
+
+
+def test_stream_after_rename(fake_youtube):
+    """La descarga termina (y el .part se renombra) antes de abrir el archivo"""
+    async def run():
+        stream = DownloadStream(fake_youtube.video_url(50), "best")
+        await stream.start()
+        written = stream.path
+        await stream._task
+        return stream, written, await read_all(stream)
+
+    stream, written, body = asyncio.run(run())
+    assert written.endswith(".part")
+    assert not Path(written).exists()
+    assert len(body) == fake_youtube.media_bytes
+    assert body == Path(stream.path).read_bytes()
+
+
+def test_stream_while_downloading(fake_youtube):
+    async def run():
+        stream = DownloadStream(fake_youtube.video_url(51), "best")
+        filename = await stream.start()
+        return filename, await read_all(stream)
+
+    filename, body = asyncio.run(run())
+    assert filename.endswith(".mp4")
+    assert len(body) == fake_youtube.media_bytes
+
+
+def test_stream_of_completed_download(client, auth_headers, fake_youtube):
+    url = fake_youtube.video_url(52)
+    first = client.post("/video/stream", json={"url": url}, headers=auth_headers)
+    assert first.status_code == 200
+    # Ya indexado: se sirve el archivo sin pasar por los hooks
+    second = client.post("/video/stream", json={"url": url}, headers=auth_headers)
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert len(second.content) == fake_youtube.media_bytes
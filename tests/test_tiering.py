@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.services.downloader import downloader
+from app.services.tiering import ObjectStore, TieredStorage
+
+
+class FakeS3Client:
+    """Lo único de boto3 que usa presigned_url"""
+
+    def __init__(self):
+        self.params = None
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        self.params = Params
+        return f"https://objects.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+
+class MemoryObjectStore(ObjectStore):
+    """Almacén de objetos en memoria en lugar de S3/MinIO"""
+
+    def __init__(self):
+        super().__init__(endpoint_url="", region="us-east-1", bucket="tests", prefix="media/",
+                         access_key="", secret_key="", part_size=1024, concurrency=1)
+        self._client = FakeS3Client()
+        self.objects = {}
+        self.on_upload = None
+
+    def upload(self, filepath, key, checksum):
+        with open(filepath, 'rb') as f:
+            self.objects[key] = f.read()
+        if self.on_upload is not None:
+            self.on_upload()
+
+    def download(self, key, filepath):
+        with open(filepath, 'wb') as f:
+            f.write(self.objects[key])
+
+
+@pytest.fixture
+def store():
+    return MemoryObjectStore()
+
+
+@pytest.fixture
+def tiering(store):
+    tiering = TieredStorage(store=store, enabled=True, cold_after=60, interval=60, url_ttl=300)
+    yield tiering
+    asyncio.run(tiering.stop())
+
+
+@pytest.fixture
+def add_file(monkeypatch):
+    """Crear archivos en disco indexados con la fecha de último acceso
+    indicada (se quitan del índice y del disco al terminar)"""
+    added = []
+
+    def add(n: int, last_access: float) -> dict:
+        file = _add_file(monkeypatch, n, last_access)
+        added.append(file)
+        return file
+
+    yield add
+    for file in added:
+        downloader.index.remove(file['filename'])
+        file['path'].unlink(missing_ok=True)
+
+
+def _add_file(monkeypatch, n: int, last_access: float) -> dict:
+    video_id = f"tier{n:07d}"
+    filename = f"Tier test-{video_id}-best.mp4"
+    path = downloader.download_dir / filename
+    data = os.urandom(4096)
+    path.write_bytes(data)
+    with monkeypatch.context() as m:
+        m.setattr(time, "time", lambda: last_access)
+        downloader.index.add({
+            'video_id': video_id, 'format': 'best', 'filename': filename,
+            'filepath': str(path), 'size': len(data),
+            'checksum': hashlib.sha256(data).hexdigest(),
+        })
+    return {'filename': filename, 'path': path, 'data': data}
+
+
+def test_cold_file_moves_to_store_and_back(add_file, store, tiering):
+    cold = add_file(1, time.time() - 3600)
+
+    assert tiering.offload_once(set(), set()) == 1
+    assert not cold['path'].exists()
+    record = downloader.index.get_by_filename(cold['filename'])
+    assert record['local'] == 0
+    assert record['remote_key'] == f"media/{cold['filename']}"
+    assert store.objects[record['remote_key']] == cold['data']
+
+    record = asyncio.run(tiering.ensure_local(record))
+    assert record['local'] == 1
+    assert cold['path'].read_bytes() == cold['data']
+    assert not cold['path'].with_name(cold['path'].name + '.part').exists()
+    assert (tiering.uploaded, tiering.fetched) == (1, 1)
+
+    # Traído de vuelta vuelve a estar caliente
+    assert tiering.offload_once(set(), set()) == 0
+
+
+def test_recent_protected_and_busy_files_stay(add_file, tiering):
+    recent = add_file(2, time.time())
+    pinned = add_file(3, time.time() - 3600)
+    busy = add_file(4, time.time() - 3600)
+
+    moved = tiering.offload_once({pinned['filename']}, {("tier0000004", "best")})
+    assert moved == 0
+    for file in (recent, pinned, busy):
+        assert file['path'].exists()
+        assert downloader.index.get_by_filename(file['filename'])['remote_key'] is None
+
+
+def test_file_used_during_upload_stays_local(add_file, store, tiering):
+    file = add_file(5, time.time() - 3600)
+    store.on_upload = lambda: downloader.index.touch(file['filename'])
+
+    assert tiering.offload_once(set(), set()) == 0
+    assert file['path'].exists()
+    record = downloader.index.get_by_filename(file['filename'])
+    assert record['local'] == 1
+    assert record['remote_key'] == f"media/{file['filename']}"
+
+
+def test_presigned_url(store, tiering):
+    record = {'filename': "video.mp4", 'remote_key': "media/video.mp4"}
+    url = asyncio.run(tiering.presigned_url(record))
+    assert url == "https://objects.test/tests/media/video.mp4?expires=300"
+    assert store._client.params['ResponseContentDisposition'] == 'attachment; filename="video.mp4"'
+    assert tiering.redirects == 1
+
+
+def test_presigned_url_encodes_filename(store):
+    store.presigned_url("media/x", 'Canción "en vivo".mp4', 60)
+    assert store._client.params['ResponseContentDisposition'] == (
+        "attachment; filename*=utf-8''Canci%C3%B3n%20%22en%20vivo%22.mp4"
+    )
+
+
+def test_disabled_store_raises(store):
+    tiering = TieredStorage(store=store, enabled=False, cold_after=60, interval=60, url_ttl=300)
+    record = {'filename': "video.mp4", 'remote_key': "media/video.mp4", 'local': 0}
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(tiering.ensure_local(record))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(tiering.presigned_url(record))